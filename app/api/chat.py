@@ -1,18 +1,42 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import ChatMessage, ChatResponse, InterviewBooking, BookingResponse
-from app.services.rag_service import RAGService
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+import json
+import time
+from app.api.dependencies import get_rag_service, get_embedding_service, get_tenant_id
+from app.models.schemas import (
+    ChatMessage, ChatResponse, ChatBatchQuery, ChatBatchResponse, InterviewBooking, BookingResponse,
+    CacheStatsResponse, SearchFilters
+)
+from app.services.embedding_service import EmbeddingService
+from app.services.rag_service import RAGService, CHAT_BATCH_MAX_QUERIES
+from app.services.search_service import payload_filters
+from app.services.vector_store import Filters
 
 router = APIRouter()
-rag_service = RAGService()
+
+def scope_filters(scope: SearchFilters | None) -> Filters | None:
+    if scope is None:
+        return None
+    return payload_filters(
+        scope.document_ids,
+        scope.filename,
+        scope.chunking_strategy.value if scope.chunking_strategy else None,
+        scope.uploaded_after,
+        scope.uploaded_before
+    )
 
 @router.post("/query", response_model=ChatResponse)
-async def chat_query(message: ChatMessage):
+async def chat_query(message: ChatMessage, rag_service: RAGService = Depends(get_rag_service),
+                     tenant_id: str = Depends(get_tenant_id)):
     """Handle conversational RAG queries"""
     try:
         if not message.session_id:
             raise HTTPException(status_code=400, detail="Session ID is required")
         
-        result = rag_service.process_query(message.message, message.session_id)
+        search_mode = message.search_mode.value if message.search_mode else None
+        filters = scope_filters(message.filters)
+        result = await rag_service.process_query(message.message, message.session_id, search_mode, filters, tenant_id)
         
         return ChatResponse(
             response=result["response"],
@@ -23,11 +47,81 @@ async def chat_query(message: ChatMessage):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/query-stream")
+async def chat_query_stream(message: ChatMessage, rag_service: RAGService = Depends(get_rag_service),
+                            tenant_id: str = Depends(get_tenant_id)):
+    """Stream a RAG answer as Server-Sent Events: sources first, then the response text as it is generated.
+    
+    The Server-Timing header reports how long history lookup and search took before the first byte.
+    """
+    started = time.perf_counter()
+    if not message.session_id:
+        raise HTTPException(status_code=400, detail="Session ID is required")
+    
+    try:
+        search_mode = message.search_mode.value if message.search_mode else None
+        prepared = await rag_service.prepare_query(
+            message.message, message.session_id, search_mode, scope_filters(message.filters), tenant_id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+    ttfb_ms = (time.perf_counter() - started) * 1000
+    
+    async def events():
+        yield sse_event("sources", {"session_id": message.session_id, "sources": prepared["sources"]})
+        try:
+            async for text in rag_service.stream_answer(prepared):
+                yield sse_event("delta", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error processing query: {str(e)}"})
+            return
+        yield sse_event("done", {"response": prepared["response"], "booking_id": prepared["booking_id"]})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Server-Timing": f"ttfb;dur={ttfb_ms:.1f};desc=\"history and search\"",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # keep reverse proxies from buffering the stream
+        },
+        # Chat memory is written once the stream has closed
+        background=BackgroundTask(rag_service.remember, prepared)
+    )
+
+@router.post("/query-batch", response_model=ChatBatchResponse)
+async def chat_query_batch(batch: ChatBatchQuery, rag_service: RAGService = Depends(get_rag_service),
+                           tenant_id: str = Depends(get_tenant_id)):
+    """Answer many (session_id, message) pairs in one request, for evaluation and offline traffic"""
+    if len(batch.queries) > CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"A batch holds at most {CHAT_BATCH_MAX_QUERIES} queries")
+    if any(not item.session_id for item in batch.queries):
+        raise HTTPException(status_code=400, detail="Session ID is required")
+    
+    try:
+        search_mode = batch.search_mode.value if batch.search_mode else None
+        results = await rag_service.process_batch(
+            [(item.session_id, item.message) for item in batch.queries],
+            search_mode, scope_filters(batch.filters), tenant_id
+        )
+        
+        return ChatBatchResponse(results=[
+            ChatResponse(response=result["response"], session_id=item.session_id, sources=result["sources"])
+            for item, result in zip(batch.queries, results)
+        ])
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing query batch: {str(e)}")
+
 @router.post("/book-interview", response_model=BookingResponse)
-async def book_interview(booking: InterviewBooking):
+async def book_interview(booking: InterviewBooking, rag_service: RAGService = Depends(get_rag_service)):
     """Direct interview booking endpoint"""
     try:
-        booking_id = rag_service.store_booking(booking.dict(), "direct_booking")
+        booking_id = await rag_service.store_booking(booking.dict(), "direct_booking")
         
         return BookingResponse(
             booking_id=booking_id,
@@ -36,4 +130,13 @@ async def book_interview(booking: InterviewBooking):
         )
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error booking interview: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error booking interview: {str(e)}")
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+async def cache_stats(embedding_service: EmbeddingService = Depends(get_embedding_service)):
+    """Hit/miss counters of this worker's query embedding and search result caches"""
+    result_cache = embedding_service.result_cache
+    return CacheStatsResponse(
+        query_embeddings=embedding_service.query_embedding_cache.stats(),
+        search_results=result_cache.stats() if result_cache else {"enabled": False}
+    )
\ No newline at end of file
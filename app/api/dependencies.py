@@ -0,0 +1,37 @@
+from fastapi import Header, HTTPException, Request
+
+from app.services.container import ServiceContainer
+from app.services.document_ingestion import DocumentIngestionService
+from app.services.embedding_service import EmbeddingService
+from app.services.ingestion_queue import IngestionQueue
+from app.services.rag_service import RAGService
+from app.services.tenant_service import TenantService
+from app.services.tenants import DEFAULT_TENANT, validate_tenant_id
+
+def get_container(request: Request) -> ServiceContainer:
+    """Return the service container created by the app lifespan"""
+    return request.app.state.container
+
+def get_embedding_service(request: Request) -> EmbeddingService:
+    return get_container(request).embedding_service
+
+def get_ingestion_service(request: Request) -> DocumentIngestionService:
+    return get_container(request).ingestion_service
+
+def get_ingestion_queue(request: Request) -> IngestionQueue:
+    return get_container(request).ingestion_queue
+
+def get_rag_service(request: Request) -> RAGService:
+    return get_container(request).rag_service
+
+def get_tenant_service(request: Request) -> TenantService:
+    return get_container(request).tenant_service
+
+def get_tenant_id(x_tenant_id: str | None = Header(default=None)) -> str:
+    """Tenant named by the X-Tenant-ID header, which a trusted gateway is expected to set"""
+    if x_tenant_id is None:
+        return DEFAULT_TENANT
+    try:
+        return validate_tenant_id(x_tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
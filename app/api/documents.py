@@ -1,18 +1,61 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks, Depends, Response
+import contextlib
 import os
 
-from app.models.schemas import DocumentResponse, ChunkingStrategy
+from app.api.dependencies import get_ingestion_service, get_ingestion_queue, get_tenant_id, get_tenant_service
+from app.models.database import IngestionJob
+from app.models.schemas import (
+    DocumentResponse, ChunkingStrategy, VocabularyResponse, IngestionJobResponse
+)
 from app.services.document_ingestion import DocumentIngestionService
+from app.services.ingestion_queue import IngestionQueue, QueueFullError, INGESTION_POLL_INTERVAL
+from app.services.tenant_service import TenantService
+from app.services.tenants import TenantQuotaError
 
 router = APIRouter()
-ingestion_service = DocumentIngestionService()
 
-@router.post("/upload", response_model=DocumentResponse)
+def _job_response(job: IngestionJob) -> IngestionJobResponse:
+    document = None
+    if job.status == "completed":
+        chunk_count = job.chunk_count or 0
+        reused = job.reused_chunk_count or 0
+        document = DocumentResponse(
+            document_id=job.document_id,
+            filename=job.filename,
+            chunk_count=chunk_count,
+            status=job.document_status or ("partial" if job.error else "processed"),
+            reused_chunks=reused,
+            embedded_chunks=chunk_count - reused,
+            removed_chunks=job.removed_chunk_count or 0
+        )
+    return IngestionJobResponse(
+        job_id=job.id,
+        filename=job.filename,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress or 0.0,
+        stage_timings=job.stage_timings or {},
+        document=document,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
+@router.post("/upload", response_model=IngestionJobResponse, status_code=202)
 async def upload_document(
+    response: Response,
     file: UploadFile = File(...),
-    chunking_strategy: ChunkingStrategy = Form(default=ChunkingStrategy.FIXED_SIZE)
+    chunking_strategy: ChunkingStrategy = Form(default=ChunkingStrategy.FIXED_SIZE),
+    ingestion_service: DocumentIngestionService = Depends(get_ingestion_service),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue),
+    tenant_service: TenantService = Depends(get_tenant_service),
+    tenant_id: str = Depends(get_tenant_id)
 ):
-    """Upload and process document"""
+    """Upload a document and queue it for processing in the caller's tenant.
+    
+    Re-uploading identical content completes immediately with status 200; a changed file
+    with the name of a stored document is queued as a new version of that document.
+    """
     
     # Validate file type
     allowed_extensions = {'.pdf', '.txt'}
@@ -24,18 +67,83 @@ async def upload_document(
             detail=f"File type not supported. Allowed types: {', '.join(allowed_extensions)}"
         )
     
+    # The saved upload is removed on every path that does not hand it to a queued job
+    file_path = None
     try:
-        file_content = await file.read()
+        # Starlette spools uploads to a temporary file, which is copied to disk in chunks
+        file_path, document_id, file_size, content_hash = await ingestion_service.save_upload(file.file, file.filename)
+        
+        existing = await ingestion_service.find_existing(tenant_id, file.filename, content_hash, chunking_strategy.value)
+        if existing is not None and existing.content_hash == content_hash:
+            os.remove(file_path)
+            file_path = None
+            job = await ingestion_queue.record_unchanged(existing, file.filename, file_size, content_hash)
+            response.status_code = 200
+            return _job_response(job)
+        if existing is not None:
+            document_id = existing.id
         
-        result = await ingestion_service.process_document(
-            file_content, 
-            file.filename, 
-            chunking_strategy.value
+        await tenant_service.check_upload(tenant_id, file_size)
+        
+        job = await ingestion_queue.enqueue(
+            document_id,
+            file.filename,
+            file_path,
+            file_size,
+            chunking_strategy.value,
+            tenant_id,
+            content_hash
         )
+        file_path = None
         
-        return DocumentResponse(**result)
+        return _job_response(job)
         
+    except TenantQuotaError as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=429, detail=f"Tenant quota exceeded: {str(e)}", headers=headers)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Ingestion queue is full: {str(e)}",
+            headers={"Retry-After": str(max(1, round(INGESTION_POLL_INTERVAL)))}
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing document: {str(e)}")
     finally:
-        await file.close()
\ No newline at end of file
+        if file_path is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(file_path)
+        await file.close()
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: str,
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue),
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """Report the stage, progress and per-stage timings of an ingestion job"""
+    job = await ingestion_queue.get_job(job_id)
+    if job is None or job.tenant_id != tenant_id:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return _job_response(job)
+
+@router.post("/vocabulary/refit", response_model=VocabularyResponse)
+async def refit_vocabulary(
+    background_tasks: BackgroundTasks,
+    ingestion_service: DocumentIngestionService = Depends(get_ingestion_service)
+):
+    """Refit the embedding vocabulary over the corpus and re-embed stale vectors"""
+    try:
+        version = await ingestion_service.refit_vocabulary()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refitting vocabulary: {str(e)}")
+    
+    background_tasks.add_task(ingestion_service.embedding_service.reembed_stale_vectors)
+    
+    return VocabularyResponse(
+        version=version,
+        vocabulary_size=len(ingestion_service.embedding_service.vectorizer.vocabulary),
+        status="reembedding"
+    )
\ No newline at end of file
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Depends
+
+from app.api.dependencies import get_tenant_id, get_tenant_service
+from app.models.schemas import TenantUsageResponse, TenantDropResponse
+from app.services.tenant_service import TenantService
+from app.services.tenants import validate_tenant_id
+
+router = APIRouter()
+
+def _tenant_id(tenant_id: str, caller: str) -> str:
+    """The tenant named in the path, which must be the caller's own tenant from X-Tenant-ID"""
+    try:
+        validate_tenant_id(tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if tenant_id != caller:
+        raise HTTPException(status_code=403, detail="Tenants can only be managed with their own X-Tenant-ID")
+    return tenant_id
+
+@router.get("/{tenant_id}", response_model=TenantUsageResponse)
+async def tenant_usage(tenant_id: str, tenant_service: TenantService = Depends(get_tenant_service),
+                       caller: str = Depends(get_tenant_id)):
+    """Documents, chunks and vectors stored for a tenant"""
+    try:
+        return TenantUsageResponse(**await tenant_service.usage(_tenant_id(tenant_id, caller)))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading tenant usage: {str(e)}")
+
+@router.delete("/{tenant_id}", response_model=TenantDropResponse)
+async def drop_tenant(tenant_id: str, tenant_service: TenantService = Depends(get_tenant_service),
+                      caller: str = Depends(get_tenant_id)):
+    """Delete all of a tenant's documents, vectors and pending uploads"""
+    try:
+        return TenantDropResponse(**await tenant_service.drop(_tenant_id(tenant_id, caller)))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error dropping tenant: {str(e)}")
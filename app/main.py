@@ -1,17 +1,35 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 import os
 from dotenv import load_dotenv
 
-from app.api import documents, chat
-from app.models.database import create_tables
+from app.api import documents, chat, tenants
+from app.api.dependencies import get_container
+from app.services.container import ServiceContainer
+from app.utils.metrics import latest_metrics
+from app.utils.request_context import RequestContextMiddleware, configure_logging
 
 load_dotenv()
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One set of clients per worker; Qdrant connects in the background
+    container = ServiceContainer()
+    await container.start()
+    app.state.container = container
+    try:
+        yield
+    finally:
+        await container.stop()
 
 app = FastAPI(
     title="RAG Backend API",
     description="Document Ingestion and Conversational RAG System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -22,18 +40,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the request ID is set before anything else logs and the timing covers the whole request
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(documents.router, prefix="/api/v1/documents", tags=["Document Ingestion"])
 app.include_router(chat.router, prefix="/api/v1/chat", tags=["Conversational RAG"])
-
-@app.on_event("startup")
-async def startup_event():
-    await create_tables()
+app.include_router(tenants.router, prefix="/api/v1/tenants", tags=["Tenants"])
 
 @app.get("/")
 async def root():
     return {"message": "RAG Backend API is running"}
 
 @app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+async def health_check(container: ServiceContainer = Depends(get_container)):
+    readiness = await container.readiness()
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={"status": "healthy" if readiness["ready"] else "starting", **readiness}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker, or for all workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    body, content_type = latest_metrics()
+    # The content type already names its charset, which media_type would append again
+    return Response(content=body, headers={"Content-Type": content_type})
@@ -1,17 +1,58 @@
-from sqlalchemy import create_engine, Column, String, Text, DateTime, JSON, Integer
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from sqlalchemy import Column, String, Text, DateTime, JSON, Integer, Float, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.sql import func
+import logging
 import os
 
+from app.utils.metrics import instrument_engine
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+logger = logging.getLogger(__name__)
+
+# Rows written before multi-tenancy belong to this tenant
+DEFAULT_TENANT = "default"
+
 Base = declarative_base()
 
+# Full-text index over document_chunks.chunk_text. It is an external-content table:
+# FTS5 keeps only the postings and reads the text from the chunk rows, so each
+# chunk's text is stored once in the database. Triggers keep the postings in step
+# with the rows. The chunk rows have no INTEGER PRIMARY KEY, so after a VACUUM,
+# which may renumber their rowids, run INSERT INTO chunk_fts(chunk_fts) VALUES('rebuild').
+# SQLAlchemy has no model type for FTS5 virtual tables.
+CHUNK_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5("
+    "chunk_text, content='document_chunks', content_rowid='rowid', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS chunk_fts_insert AFTER INSERT ON document_chunks BEGIN "
+    "INSERT INTO chunk_fts (rowid, chunk_text) VALUES (new.rowid, new.chunk_text); END",
+    "CREATE TRIGGER IF NOT EXISTS chunk_fts_delete AFTER DELETE ON document_chunks BEGIN "
+    "INSERT INTO chunk_fts (chunk_fts, rowid, chunk_text) VALUES ('delete', old.rowid, old.chunk_text); END",
+    "CREATE TRIGGER IF NOT EXISTS chunk_fts_update AFTER UPDATE OF chunk_text ON document_chunks BEGIN "
+    "INSERT INTO chunk_fts (chunk_fts, rowid, chunk_text) VALUES ('delete', old.rowid, old.chunk_text); "
+    "INSERT INTO chunk_fts (rowid, chunk_text) VALUES (new.rowid, new.chunk_text); END"
+)
+
 class Document(Base):
     __tablename__ = "documents"
     
     id = Column(String, primary_key=True, index=True)
+    tenant_id = Column(String, index=True, server_default=DEFAULT_TENANT)
     filename = Column(String, index=True)
     file_path = Column(String)
+    content_hash = Column(String, index=True)  # SHA-256 of the uploaded file
     chunking_strategy = Column(String)
     document_metadata = Column(JSON)  
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -20,11 +61,13 @@ class DocumentChunk(Base):
     __tablename__ = "document_chunks"
     
     id = Column(String, primary_key=True, index=True)
+    tenant_id = Column(String, index=True, server_default=DEFAULT_TENANT)
     document_id = Column(String, index=True)
     chunk_text = Column(Text)
+    content_hash = Column(String, index=True)  # SHA-256 of the full chunk text
     chunk_index = Column(Integer) 
     chunk_metadata = Column(JSON) 
-    embedding_id = Column(String)
+    embedding_id = Column(String, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class InterviewBooking(Base):
@@ -38,16 +81,137 @@ class InterviewBooking(Base):
     session_id = Column(String, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./rag_system.db")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(String, primary_key=True, index=True)
+    tenant_id = Column(String, index=True, server_default=DEFAULT_TENANT)
+    document_id = Column(String, index=True)
+    filename = Column(String)
+    file_path = Column(String)
+    file_size = Column(Integer)
+    content_hash = Column(String)
+    chunking_strategy = Column(String)
+    status = Column(String, index=True)  # queued, running, completed, failed
+    stage = Column(String)
+    progress = Column(Float, default=0.0)
+    stage_timings = Column(JSON)  # milliseconds spent in each stage
+    chunk_count = Column(Integer)
+    reused_chunk_count = Column(Integer)
+    removed_chunk_count = Column(Integer)
+    document_status = Column(String)  # processed, partial, updated or unchanged
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+def _async_database_url(url: str) -> str:
+    """Swap a plain SQLite URL for its aiosqlite equivalent"""
+    parsed = make_url(url)
+    if parsed.drivername == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent readers and bulk writes"""
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers in other workers proceed while a write is in progress
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # NORMAL only syncs at checkpoints, which is still crash-safe in WAL mode
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def create_database_engine(url: str) -> AsyncEngine:
+    """Create an async engine with a connection pool and, for SQLite files, tuned pragmas"""
+    parsed = make_url(url)
+    is_sqlite = parsed.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and parsed.database in (None, "", ":memory:")
+    
+    options = {}
+    if not in_memory:
+        # aiosqlite defaults to NullPool, which reopens (and re-tunes) a connection per session
+        options = dict(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+    database_engine = create_async_engine(url, **options)
+    
+    if is_sqlite and not in_memory:
+        event.listen(database_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    instrument_engine(database_engine)
+    return database_engine
+
+DATABASE_URL = _async_database_url(os.getenv("DATABASE_URL", "sqlite:///./rag_system.db"))
+engine = create_database_engine(DATABASE_URL)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """Provide a session that commits on success and rolls back on error"""
+    async with SessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+
+def _add_missing_columns(connection):
+    """Add model columns and indexes that an existing table predates.
+
+    create_all only creates missing tables, so this covers additive changes
+    such as new nullable or defaulted columns, or a newly indexed column,
+    without a migration tool.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=connection.dialect)}"
+            # SQLite only accepts constant defaults when adding a column
+            if column.server_default is not None and isinstance(column.server_default.arg, str):
+                ddl += f" DEFAULT '{column.server_default.arg}'"
+            connection.execute(text(ddl))
+            logger.info("Added column %s.%s", table.name, column.name)
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(connection)
+                logger.info("Created index %s", index.name)
+
+def create_chunk_fts(connection):
+    """Create the keyword index, replacing one that kept its own copy of the chunk text"""
+    existing = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'chunk_fts'")).scalar()
+    if existing is not None and "content=" not in existing:
+        # Its copy is the full text, where older chunk rows hold only the first 1000 characters
+        connection.execute(text(
+            "UPDATE document_chunks SET chunk_text = indexed.text "
+            "FROM (SELECT chunk_id, text FROM chunk_fts) AS indexed "
+            "WHERE indexed.chunk_id = document_chunks.embedding_id "
+            "AND length(indexed.text) > length(document_chunks.chunk_text)"
+        ))
+        connection.execute(text("DROP TABLE chunk_fts"))
+        logger.info("Rebuilding chunk_fts over the text in document_chunks")
+    for ddl in CHUNK_FTS_DDL:
+        connection.execute(text(ddl))
+    if existing is None or "content=" not in existing:
+        connection.execute(text("INSERT INTO chunk_fts (chunk_fts) VALUES ('rebuild')"))
 
 async def create_tables():
-    Base.metadata.create_all(bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        return db
-    finally:
-        db.close()
\ No newline at end of file
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(_add_missing_columns)
+        if connection.dialect.name == "sqlite":
+            await connection.run_sync(create_chunk_fts)
\ No newline at end of file
@@ -1,9 +1,12 @@
 from pydantic import BaseModel, Field
 from enum import Enum
+from typing import Any
+from datetime import datetime
 
 class ChunkingStrategy(str, Enum):
     FIXED_SIZE = "fixed_size"
     SEMANTIC = "semantic"
+    RECURSIVE = "recursive"  # paragraph-aware
 
 class DocumentUpload(BaseModel):
     chunking_strategy: ChunkingStrategy = Field(default=ChunkingStrategy.FIXED_SIZE)
@@ -12,17 +15,69 @@ class DocumentResponse(BaseModel):
     document_id: str
     filename: str
     chunk_count: int
+    status: str  # processed, partial, updated or unchanged
+    reused_chunks: int = 0  # chunks whose vectors were kept from an earlier upload
+    embedded_chunks: int = 0
+    removed_chunks: int = 0  # chunks of the earlier version no longer in the document
+
+class IngestionJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: IngestionJobStatus
+    stage: str | None = None
+    progress: float = 0.0
+    stage_timings: dict[str, float] = {}
+    document: DocumentResponse | None = None
+    error: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+class VocabularyResponse(BaseModel):
+    version: str
+    vocabulary_size: int
     status: str
 
+class SearchMode(str, Enum):
+    VECTOR = "vector"
+    KEYWORD = "keyword"
+    HYBRID = "hybrid"
+
+class SearchFilters(BaseModel):
+    document_ids: list[str] | None = None
+    filename: str | None = None
+    chunking_strategy: ChunkingStrategy | None = None
+    uploaded_after: datetime | None = None
+    uploaded_before: datetime | None = None
+
 class ChatMessage(BaseModel):
     message: str
     session_id: str
+    search_mode: SearchMode | None = None  # None uses the server's SEARCH_MODE
+    filters: SearchFilters | None = None
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
     sources: list[str] = []
 
+class ChatBatchItem(BaseModel):
+    session_id: str
+    message: str
+
+class ChatBatchQuery(BaseModel):
+    queries: list[ChatBatchItem]
+    search_mode: SearchMode | None = None
+    filters: SearchFilters | None = None  # applied to every query in the batch
+
+class ChatBatchResponse(BaseModel):
+    results: list[ChatResponse]  # in the order of the queries
+
 class InterviewBooking(BaseModel):
     name: str
     email: str
@@ -32,4 +87,22 @@ class InterviewBooking(BaseModel):
 class BookingResponse(BaseModel):
     booking_id: str
     status: str
-    details: InterviewBooking
\ No newline at end of file
+    details: InterviewBooking
+
+class CacheStatsResponse(BaseModel):
+    query_embeddings: dict[str, Any]
+    search_results: dict[str, Any]
+
+class TenantUsageResponse(BaseModel):
+    tenant_id: str
+    collection: str
+    documents: int
+    chunks: int
+    vectors: int | None = None
+    max_vectors: int | None = None
+
+class TenantDropResponse(BaseModel):
+    tenant_id: str
+    documents: int
+    chunks: int
+    cancelled_jobs: int
\ No newline at end of file
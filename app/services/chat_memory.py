@@ -1,29 +1,217 @@
-import redis
-import json
+import asyncio
+import logging
+import redis.asyncio as redis
+from redis.exceptions import WatchError
 import os
 
+from app.utils.metrics import timed_dependency
+
+try:
+    import orjson
+
+    def _dumps(message: dict[str, str]) -> bytes:
+        return orjson.dumps(message)
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(message: dict[str, str]) -> bytes:
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+CHAT_MEMORY_WINDOW = int(os.getenv("CHAT_MEMORY_WINDOW", 20))  # recent messages kept verbatim per session
+CHAT_MEMORY_TTL = int(os.getenv("CHAT_MEMORY_TTL", 3600))
+# Messages past the window that trigger compaction, and the most that may wait for it
+CHAT_COMPACTION_BATCH = int(os.getenv("CHAT_COMPACTION_BATCH", 10))
+CHAT_MEMORY_MAX_BACKLOG = int(os.getenv("CHAT_MEMORY_MAX_BACKLOG", 200))
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", 2000))
+CHAT_COMPACTION_MAX_PENDING = int(os.getenv("CHAT_COMPACTION_MAX_PENDING", 1000))
+
+def summarize_messages(summary: str, messages: list[dict[str, str]], max_chars: int = CHAT_SUMMARY_MAX_CHARS) -> str:
+    """Fold messages into a running summary: the user's words and the first sentence of each reply,
+    dropping the oldest lines once the summary is longer than max_chars"""
+    lines = summary.splitlines() if summary else []
+    for message in messages:
+        content = " ".join(message["content"].split())
+        if message["role"] == "user":
+            lines.append(f"- User: {content[:200]}")
+        else:
+            first_sentence = content.split(". ", 1)[0]
+            lines.append(f"  Assistant: {first_sentence[:200]}")
+    size = sum(len(line) + 1 for line in lines)
+    start = 0
+    while size > max_chars and start < len(lines) - 1:
+        size -= len(lines[start]) + 1
+        start += 1
+    return "\n".join(lines[start:])
+
+def create_redis_pool() -> redis.ConnectionPool:
+    """Create the Redis connection pool shared by a worker"""
+    return redis.ConnectionPool(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        db=0,
+        max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
+        decode_responses=True
+    )
+
 class ChatMemory:
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=os.getenv("REDIS_HOST", "localhost"),
-            port=int(os.getenv("REDIS_PORT", 6379)),
-            db=0,
-            decode_responses=True
-        )
-    
-    def add_message(self, session_id: str, message: dict[str, str]):
+    """Tiered per-session chat history in Redis.
+    
+    The newest messages stay verbatim in a list; once more than CHAT_COMPACTION_BATCH
+    have scrolled past the CHAT_MEMORY_WINDOW, a ChatCompactor folds them into a summary
+    string. Reads fetch the summary and the last messages in one round trip, so their
+    cost does not depend on the session's length. Messages are stored as compact JSON,
+    so histories written before the switch to orjson stay readable.
+    """
+    
+    def __init__(self, connection_pool: redis.ConnectionPool | None = None, redis_client: redis.Redis | None = None,
+                 window: int = CHAT_MEMORY_WINDOW, ttl: int = CHAT_MEMORY_TTL,
+                 compaction_batch: int = CHAT_COMPACTION_BATCH, max_backlog: int = CHAT_MEMORY_MAX_BACKLOG):
+        self.redis_client = redis_client or redis.Redis(connection_pool=connection_pool or create_redis_pool())
+        self.window = window
+        self.ttl = ttl
+        self.compaction_batch = compaction_batch
+        self.max_backlog = max_backlog
+        self.compactor = None  # set by ChatCompactor
+    
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"chat_session:{session_id}"
+    
+    @staticmethod
+    def _summary_key(session_id: str) -> str:
+        return f"chat_summary:{session_id}"
+    
+    def _queue_turn(self, pipe, session_id: str, messages: list[dict[str, str]]):
+        key = self._key(session_id)
+        pipe.rpush(key, *(_dumps(message) for message in messages))
+        # Only a backstop: compaction keeps the list near the window, this bounds it if compaction falls behind
+        pipe.ltrim(key, -(self.window + self.max_backlog), -1)
+        pipe.expire(key, self.ttl)
+        pipe.expire(self._summary_key(session_id), self.ttl)
+    
+    def _after_write(self, session_id: str, length: int):
+        if self.compactor is not None and length > self.window + self.compaction_batch:
+            self.compactor.schedule(session_id)
+    
+    @timed_dependency("redis", "chat_add_turn")
+    async def add_turn(self, session_id: str, messages: list[dict[str, str]]):
+        """Append a turn's messages and refresh the expiry in one MULTI round trip"""
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            self._queue_turn(pipe, session_id, messages)
+            length, *_ = await pipe.execute()
+        self._after_write(session_id, length)
+    
+    async def add_message(self, session_id: str, message: dict[str, str]):
         """Add message to chat history"""
-        key = f"chat_session:{session_id}"
-        self.redis_client.rpush(key, json.dumps(message))
-        self.redis_client.expire(key, 3600) 
+        await self.add_turn(session_id, [message])
+    
+    @staticmethod
+    def _history(summary: str | None, messages: list[str]) -> list[dict[str, str]]:
+        history = [_loads(msg) for msg in messages]
+        if summary:
+            history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{_loads(summary)['text']}"})
+        return history
+    
+    @timed_dependency("redis", "chat_get_messages")
+    async def get_messages(self, session_id: str, limit: int = 10) -> list[dict[str, str]]:
+        """Get chat history for session: the summary of older turns, if any, then the last limit messages"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(self._summary_key(session_id))
+            pipe.lrange(self._key(session_id), -limit, -1)
+            summary, messages = await pipe.execute()
+        return self._history(summary, messages)
+    
+    @timed_dependency("redis", "chat_get_many")
+    async def get_many(self, session_ids: list[str], limit: int = 10) -> list[list[dict[str, str]]]:
+        """Get chat histories for several sessions in one pipelined round trip"""
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                pipe.get(self._summary_key(session_id))
+                pipe.lrange(self._key(session_id), -limit, -1)
+            replies = await pipe.execute()
+        return [self._history(summary, messages) for summary, messages in zip(replies[::2], replies[1::2])]
     
-    def get_messages(self, session_id: str, limit: int = 10) -> list[dict[str, str]]:
-        """Get chat history for session"""
-        key = f"chat_session:{session_id}"
-        messages = self.redis_client.lrange(key, -limit, -1)
-        return [json.loads(msg) for msg in messages]
+    @timed_dependency("redis", "chat_add_many")
+    async def add_many(self, entries: list[tuple[str, list[dict[str, str]]]]):
+        """Append turns to several sessions in one MULTI round trip"""
+        if not entries:
+            return
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            for session_id, messages in entries:
+                self._queue_turn(pipe, session_id, messages)
+            replies = await pipe.execute()
+        # Each turn queues four commands, the first of which returns the list length
+        for (session_id, _), length in zip(entries, replies[::4]):
+            self._after_write(session_id, length)
     
-    def clear_messages(self, session_id: str):
+    @timed_dependency("redis", "chat_compact")
+    async def compact(self, session_id: str, max_attempts: int = 3) -> int:
+        """Fold the messages older than the window into the session's summary and return how many were folded"""
+        key, summary_key = self._key(session_id), self._summary_key(session_id)
+        for _ in range(max_attempts):
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                try:
+                    # A turn written meanwhile aborts the transaction, so no unsummarized message is trimmed
+                    await pipe.watch(key, summary_key)
+                    overflow = await pipe.llen(key) - self.window
+                    if overflow <= 0:
+                        return 0
+                    older = await pipe.lrange(key, 0, overflow - 1)
+                    previous = await pipe.get(summary_key)
+                    state = _loads(previous) if previous else {"text": "", "messages": 0}
+                    text = summarize_messages(state["text"], [_loads(msg) for msg in older])
+                    
+                    pipe.multi()
+                    pipe.set(summary_key, _dumps({"text": text, "messages": state["messages"] + overflow}), ex=self.ttl)
+                    pipe.ltrim(key, overflow, -1)
+                    await pipe.execute()
+                    return overflow
+                except WatchError:
+                    continue
+        return 0
+    
+    async def clear_messages(self, session_id: str):
         """Clear chat history for session"""
-        key = f"chat_session:{session_id}"
-        self.redis_client.delete(key)
\ No newline at end of file
+        await self.redis_client.delete(self._key(session_id), self._summary_key(session_id))
+
+class ChatCompactor:
+    """Background worker that compacts sessions whose history has grown past the window"""
+    
+    def __init__(self, chat_memory: ChatMemory, max_pending: int = CHAT_COMPACTION_MAX_PENDING):
+        self.chat_memory = chat_memory
+        self.max_pending = max_pending
+        self._queue = asyncio.Queue()
+        self._pending = set()
+        self._task = None
+        chat_memory.compactor = self
+    
+    async def start(self):
+        self._task = asyncio.create_task(self._worker())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    def schedule(self, session_id: str):
+        """Queue a session for compaction unless it is already waiting; never blocks the request"""
+        if self._task is None or session_id in self._pending or len(self._pending) >= self.max_pending:
+            return
+        self._pending.add(session_id)
+        self._queue.put_nowait(session_id)
+    
+    async def _worker(self):
+        while True:
+            session_id = await self._queue.get()
+            self._pending.discard(session_id)
+            try:
+                await self.chat_memory.compact(session_id)
+            except Exception as e:
+                logger.warning("Failed to compact chat session %s: %s", session_id, e)
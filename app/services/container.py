@@ -0,0 +1,152 @@
+import asyncio
+import importlib
+import logging
+import os
+from typing import Any
+
+import redis.asyncio as redis
+from sqlalchemy import text
+
+from app.models.database import engine, create_tables
+from app.services.chat_memory import ChatCompactor, ChatMemory, create_redis_pool
+from app.services.document_ingestion import DocumentIngestionService
+from app.services.embedding_service import EmbeddingService
+from app.services.ingestion_queue import IngestionQueue, create_process_pool
+from app.services.keyword_index import KeywordIndex
+from app.services.query_cache import SearchResultCache
+from app.services.rag_service import RAGService
+from app.services.reranker import RERANK_ENABLED, Reranker
+from app.services.search_service import SearchService
+from app.services.tenant_service import TenantService
+from app.services.tenants import IngestionRateLimiter
+from app.services.vector_store import VECTOR_STORE, LocalVectorStore, QdrantVectorStore
+
+logger = logging.getLogger(__name__)
+
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", 5))
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+CONNECT_BACKOFF_INITIAL = float(os.getenv("CONNECT_BACKOFF_INITIAL", 0.5))
+CONNECT_BACKOFF_MAX = float(os.getenv("CONNECT_BACKOFF_MAX", 30))
+
+class ServiceContainer:
+    """Owns the clients and services shared by every request in a worker"""
+
+    def __init__(self):
+        self.engine = engine
+        self.redis_pool = create_redis_pool()
+
+        redis_client = redis.Redis(connection_pool=self.redis_pool)
+        
+        self.embedding_service = EmbeddingService(SearchResultCache(redis_client))
+        self.keyword_index = KeywordIndex()
+        self.tenant_service = TenantService(self.embedding_service, IngestionRateLimiter(redis_client))
+        self.search_service = SearchService(self.embedding_service, self.keyword_index, Reranker() if RERANK_ENABLED else None)
+        self.process_pool = create_process_pool()
+        self.ingestion_service = DocumentIngestionService(self.embedding_service, self.process_pool)
+        self.ingestion_queue = IngestionQueue(self.ingestion_service)
+        chat_memory = ChatMemory(self.redis_pool)
+        self.chat_compactor = ChatCompactor(chat_memory)
+        self.rag_service = RAGService(self.search_service, chat_memory)
+
+        self._connect_task = None
+
+    async def start(self):
+        """Create tables, start the ingestion and chat compaction workers and open the vector store in the background"""
+        await create_tables()
+        await self.ingestion_queue.start()
+        await self.chat_compactor.start()
+        if VECTOR_STORE == "local":
+            self._connect_task = asyncio.create_task(self._open_local_store())
+        else:
+            self._connect_task = asyncio.create_task(self._connect_qdrant())
+
+    async def stop(self):
+        """Cancel pending connection attempts and release every client"""
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+            try:
+                await self._connect_task
+            except asyncio.CancelledError:
+                pass
+        await self.ingestion_queue.stop()
+        await self.chat_compactor.stop()
+        if self.process_pool is not None:
+            await asyncio.to_thread(self.process_pool.shutdown, cancel_futures=True)
+        await self.embedding_service.close()
+        await self.redis_pool.disconnect()
+        await self.engine.dispose()
+
+    async def _connect_qdrant(self):
+        """Connect to Qdrant with exponential backoff without blocking startup"""
+        delay = CONNECT_BACKOFF_INITIAL
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                client = await self._open_qdrant_client()
+                try:
+                    await self.embedding_service.attach_vector_store(QdrantVectorStore(client))
+                except Exception:
+                    await client.close()
+                    raise
+                logger.info("Connected to Qdrant")
+                break
+            except Exception as e:
+                logger.warning("Qdrant connection attempt %d failed: %s. Retrying in %.1fs", attempt, e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, CONNECT_BACKOFF_MAX)
+
+        # Vectors left over from an older vocabulary are refreshed once connected
+        await self.tenant_service.open_collections()
+        await self.embedding_service.reembed_stale_vectors()
+
+    async def _open_local_store(self):
+        """Load the in-process vector store from disk"""
+        await self.embedding_service.attach_vector_store(LocalVectorStore())
+        await self.tenant_service.open_collections()
+        await self.embedding_service.reembed_stale_vectors()
+
+    async def _open_qdrant_client(self):
+        # Importing qdrant_client is slow, so it happens off the event loop
+        await asyncio.to_thread(importlib.import_module, "qdrant_client")
+        from qdrant_client import AsyncQdrantClient
+
+        client = AsyncQdrantClient(
+            url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+            api_key=os.getenv("QDRANT_API_KEY") or None,
+            timeout=QDRANT_TIMEOUT,
+            # gRPC sends vectors as packed floats rather than JSON, which is much smaller for bulk upserts
+            prefer_grpc=QDRANT_PREFER_GRPC,
+            grpc_port=QDRANT_GRPC_PORT
+        )
+        try:
+            await client.get_collections()
+        except Exception:
+            await client.close()
+            raise
+        return client
+
+    async def readiness(self) -> dict[str, Any]:
+        """Report which backing services are reachable"""
+        redis_ready, database_ready = await asyncio.gather(self._ping_redis(), self._ping_database())
+        services = {
+            "vector_store": self.embedding_service.vector_store is not None,
+            "redis": redis_ready,
+            "database": database_ready
+        }
+        return {"ready": all(services.values()), "services": services}
+
+    async def _ping_redis(self) -> bool:
+        try:
+            return bool(await self.rag_service.chat_memory.redis_client.ping())
+        except Exception:
+            return False
+
+    async def _ping_database(self) -> bool:
+        try:
+            async with self.engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
@@ -1,72 +1,479 @@
+import asyncio
+from concurrent.futures import Executor
+from datetime import datetime, timezone
+import hashlib
+import logging
+import threading
+import time
 import uuid
-from typing import Any
+from typing import Any, Awaitable, BinaryIO, Callable, Iterator
 import os
+import weakref
 
-from app.utils.file_processing import extract_text_from_pdf, extract_text_from_txt, save_uploaded_file
-from app.utils.chunking import get_chunking_strategy
+from sqlalchemy import select, delete, insert, update, bindparam
+
+from app.utils.file_processing import iter_document_text, save_uploaded_stream
+from app.utils.chunking import get_streaming_chunker
 from app.services.embedding_service import EmbeddingService
-from app.models.database import get_db, Document, DocumentChunk
+from app.models.database import DEFAULT_TENANT, SessionLocal, session_scope, Document, DocumentChunk
+from app.utils.metrics import CHUNKS_TOTAL, DOCUMENTS_TOTAL, observe_stage, stage
+
+logger = logging.getLogger(__name__)
+
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", 256))
+INGESTION_PIPELINE_DEPTH = int(os.getenv("INGESTION_PIPELINE_DEPTH", 2))
+
+ProgressCallback = Callable[[str, float], Awaitable[None]]
+
+async def _ignore_progress(stage: str, progress: float):
+    pass
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _batched(items: list, size: int = 500) -> Iterator[list]:
+    # Keeps IN lists under SQLite's bound-parameter limit
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def iter_chunk_batches(file_path: str, file_extension: str, chunking_strategy: str, executor: Executor | None = None,
+                       batch_size: int = INGESTION_BATCH_SIZE) -> Iterator[tuple[list[dict[str, Any]], float]]:
+    """Stream a document through its chunker, yielding chunk batches with the fraction of the file read.
+    
+    Extraction and chunking are interleaved, so each batch records the time spent waiting on
+    extracted pages and counts the rest as chunking.
+    """
+    progress = 0.0
+    extracting = 0.0
+    
+    def texts() -> Iterator[tuple[str, int | None]]:
+        nonlocal progress, extracting
+        pages = iter_document_text(file_path, file_extension, executor)
+        while True:
+            started = time.perf_counter()
+            page = next(pages, None)
+            extracting += time.perf_counter() - started
+            if page is None:
+                return
+            text, page_number, progress = page
+            yield text, page_number
+    
+    def observe_batch():
+        nonlocal extracting
+        observe_stage("ingestion", "extract", extracting)
+        observe_stage("ingestion", "chunk", time.perf_counter() - batch_started - extracting)
+        extracting = 0.0
+    
+    batch = []
+    batch_started = time.perf_counter()
+    for chunk in get_streaming_chunker(chunking_strategy)(texts()):
+        chunk["content_hash"] = chunk_hash(chunk["text"])
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            observe_batch()
+            yield batch, progress
+            batch = []
+            # Time spent blocked on a full pipeline belongs to neither stage
+            batch_started = time.perf_counter()
+    if batch:
+        observe_batch()
+        yield batch, progress
+
+def _row_metadata(chunk: dict[str, Any], embedding_id: str | None) -> dict[str, Any]:
+    return {
+        **chunk.get("metadata", {}),
+        "embedding_id": embedding_id,
+        "text_length": len(chunk["text"])
+    }
+
+def _moved_chunks(chunks: list[dict[str, Any]], reused: dict[int, Any], first_index: int) -> Iterator[dict[str, Any]]:
+    """Reused chunks whose position or metadata differs in the new version"""
+    for position, row in reused.items():
+        chunk = chunks[position]
+        row_metadata = _row_metadata(chunk, row.embedding_id)
+        if row.chunk_index != first_index + position or row_metadata != row.chunk_metadata:
+            yield {
+                "row_id": row.id,
+                "chunk_id": row.embedding_id,
+                "chunk_index": first_index + position,
+                "chunk_metadata": chunk.get("metadata", {}),
+                "row_metadata": row_metadata
+            }
+
+def unchanged_result(document: Document) -> dict[str, Any]:
+    """Ingestion result for an upload identical to a stored document"""
+    chunk_count = (document.document_metadata or {}).get("chunk_count", 0)
+    return {
+        "document_id": document.id,
+        "filename": document.filename,
+        "chunk_count": chunk_count,
+        "reused_chunks": chunk_count,
+        "removed_chunks": 0,
+        "status": "unchanged"
+    }
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
 class DocumentIngestionService:
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
+    def __init__(self, embedding_service: EmbeddingService, executor: Executor | None = None):
+        self.embedding_service = embedding_service
+        self.executor = executor
+        # Two versions of one document must not be merged into it at the same time
+        self._document_locks = weakref.WeakValueDictionary()
+    
+    async def save_upload(self, source: BinaryIO, filename: str) -> tuple[str, str, int, str]:
+        """Stream an uploaded file to disk and return its path, document ID, size and content hash"""
+        loop = asyncio.get_running_loop()
+        file_path, document_id, file_size, content_hash = await loop.run_in_executor(
+            None, save_uploaded_stream, source, filename
+        )
+        # Jobs may run in another process, so the path must not depend on its working directory
+        return os.path.abspath(file_path), document_id, file_size, content_hash
+    
+    async def find_existing(self, tenant_id: str, filename: str, content_hash: str,
+                            chunking_strategy: str) -> Document | None:
+        """Find the document an upload repeats (same content) or else updates (same filename)"""
+        async with SessionLocal() as db:
+            same_tenant_and_strategy = (Document.tenant_id == tenant_id, Document.chunking_strategy == chunking_strategy)
+            document = await db.scalar(
+                select(Document).where(*same_tenant_and_strategy, Document.content_hash == content_hash).limit(1)
+            )
+            if document is None:
+                document = await db.scalar(
+                    select(Document)
+                    .where(*same_tenant_and_strategy, Document.filename == filename)
+                    .order_by(Document.created_at.desc())
+                    .limit(1)
+                )
+            return document
     
-    async def process_document(self, file_content: bytes, filename: str, chunking_strategy: str) -> dict[str, Any]:
-        """Process uploaded document"""
+    async def process_document(self, file_path: str, document_id: str, filename: str, chunking_strategy: str,
+                               file_size: int, report: ProgressCallback = _ignore_progress,
+                               tenant_id: str = DEFAULT_TENANT, content_hash: str | None = None) -> dict[str, Any]:
+        """Extract, chunk, embed and store a saved upload in a tenant's collection in bounded batches, reporting each stage.
         
-        file_path, file_id = save_uploaded_file(file_content, filename)
+        If the document already exists, this is a new version of it: chunks whose text is unchanged keep
+        their vectors, only new chunks are embedded, and chunks missing from the new version are removed.
+        """
         
         file_extension = os.path.splitext(filename)[1].lower()
+        if file_extension not in ('.pdf', '.txt'):
+            raise ValueError(f"Unsupported file type: {file_extension}")
         
-        if file_extension == '.pdf':
-            text = extract_text_from_pdf(file_path)
-        elif file_extension == '.txt':
-            text = extract_text_from_txt(file_path)
+        lock = self._document_locks.setdefault(document_id, asyncio.Lock())
+        try:
+            async with lock:
+                with stage("ingestion", "document"):
+                    result = None
+                    if content_hash is not None:
+                        result = await self._unchanged_result(tenant_id, content_hash, chunking_strategy, file_path)
+                    if result is None:
+                        result = await self._ingest(file_path, file_extension, document_id, filename, chunking_strategy,
+                                                    file_size, report, tenant_id, content_hash)
+        except Exception:
+            DOCUMENTS_TOTAL.labels("failed").inc()
+            raise
+        DOCUMENTS_TOTAL.labels(result["status"]).inc()
+        return result
+    
+    async def _unchanged_result(self, tenant_id: str, content_hash: str, chunking_strategy: str,
+                                file_path: str) -> dict[str, Any] | None:
+        """Result for a file already stored with identical content, e.g. a duplicate upload queued twice"""
+        async with SessionLocal() as db:
+            document = await db.scalar(
+                select(Document).where(
+                    Document.tenant_id == tenant_id,
+                    Document.chunking_strategy == chunking_strategy,
+                    Document.content_hash == content_hash
+                ).limit(1)
+            )
+        if document is None:
+            return None
+        if document.file_path != file_path:
+            await asyncio.to_thread(_remove_file, file_path)
+        return unchanged_result(document)
+    
+    async def _ingest(self, file_path: str, file_extension: str, document_id: str, filename: str,
+                      chunking_strategy: str, file_size: int, report: ProgressCallback, tenant_id: str,
+                      content_hash: str | None) -> dict[str, Any]:
+        async with SessionLocal() as db:
+            previous = await db.get(Document, document_id)
+        
+        # Copied into every vector's payload so searches can be scoped without a join.
+        # A new version keeps the document's original upload time, which reused vectors carry.
+        if previous is not None and previous.created_at is not None:
+            uploaded_at = previous.created_at.replace(tzinfo=timezone.utc)
         else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+            uploaded_at = datetime.now(timezone.utc)
+        document_fields = {
+            "filename": filename,
+            "chunking_strategy": chunking_strategy,
+            "uploaded_at": uploaded_at.timestamp()
+        }
         
-        chunking_fn = get_chunking_strategy(chunking_strategy)
-        chunks = chunking_fn(text)
+        loop = asyncio.get_running_loop()
+        batches = asyncio.Queue(maxsize=INGESTION_PIPELINE_DEPTH)
+        stop = threading.Event()
         
-        embedding_ids = self.embedding_service.store_embeddings(chunks, file_id)
+        def produce():
+            # Parses later pages while earlier batches are embedded and stored;
+            # the bounded queue keeps at most a few batches in memory
+            try:
+                for item in iter_chunk_batches(file_path, file_extension, chunking_strategy, self.executor):
+                    if stop.is_set():
+                        return
+                    asyncio.run_coroutine_threadsafe(batches.put(item), loop).result()
+                item = None
+            except Exception as e:
+                item = e
+            asyncio.run_coroutine_threadsafe(batches.put(item), loop).result()
+        
+        producer = loop.run_in_executor(None, produce)
+        chunk_count = 0
+        stored_count = 0
+        progress = 0.0
+        # Rows of this version (reused or new); any other row of the document belongs to the old version
+        kept_rows = set()
+        added_embedding_ids = []
+        moved_chunks = []
         
-        db = get_db()
         try:
-            document = Document(
-                id=file_id,
-                filename=filename,
-                file_path=file_path,
-                chunking_strategy=chunking_strategy,
-                document_metadata={"chunk_count": len(chunks), "file_size": len(file_content)} 
-            )
-            db.add(document)
+            while True:
+                await report("extracting", progress)
+                item = await batches.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                chunks, progress = item
+                
+                reused = {}
+                if previous is not None:
+                    await report("matching_chunks", progress)
+                    with stage("ingestion", "match_chunks"):
+                        reused = await self._match_chunks(document_id, chunks, kept_rows)
+                    moved_chunks.extend(_moved_chunks(chunks, reused, chunk_count))
+                    stored_count += len(reused)
+                    CHUNKS_TOTAL.labels("reused").inc(len(reused))
+                
+                positions = [position for position in range(len(chunks)) if position not in reused]
+                if positions:
+                    new_chunks = [chunks[position] for position in positions]
+                    chunk_indexes = [chunk_count + position for position in positions]
+                    
+                    await report("embedding", progress)
+                    with stage("ingestion", "embed"):
+                        embeddings = await self.embedding_service.embed_documents(
+                            [chunk["text"] for chunk in new_chunks], self.executor
+                        )
+                    
+                    await report("storing_vectors", progress)
+                    with stage("ingestion", "store_vectors"):
+                        embedding_ids = await self.embedding_service.store_embeddings(
+                            new_chunks, document_id, embeddings, document_fields=document_fields,
+                            tenant_id=tenant_id, chunk_indexes=chunk_indexes
+                        )
+                    added_embedding_ids.extend(embedding_id for embedding_id in embedding_ids if embedding_id is not None)
+                    
+                    await report("saving_chunks", progress)
+                    with stage("ingestion", "save_chunks"):
+                        row_ids = await self._save_chunks(document_id, new_chunks, embedding_ids, chunk_indexes, tenant_id)
+                    kept_rows.update(row_ids)
+                    stored_count += len(row_ids)
+                    CHUNKS_TOTAL.labels("embedded").inc(len(row_ids))
+                chunk_count += len(chunks)
             
-            for i, (chunk, embedding_id) in enumerate(zip(chunks, embedding_ids)):
-                chunk_record = DocumentChunk(
-                    id=str(uuid.uuid4()),
-                    document_id=file_id,
-                    chunk_text=chunk["text"][:1000],  # Store truncated text for reference
-                    chunk_index=i, 
-                    chunk_metadata={  
-                        **chunk.get("chunk_metadata", {}),
-                        "embedding_id": embedding_id,
-                        "text_length": len(chunk["text"])
-                    },
-                    embedding_id=embedding_id
+            document_metadata = {
+                "chunk_count": stored_count,
+                "failed_chunk_count": chunk_count - stored_count,
+                "file_size": file_size
+            }
+            if previous is None:
+                # The last point at which a cancelled job can stop before the document becomes visible
+                await report("saving_document", progress)
+                async with session_scope() as db:
+                    db.add(Document(
+                        id=document_id,
+                        tenant_id=tenant_id,
+                        filename=filename,
+                        file_path=file_path,
+                        content_hash=content_hash,
+                        chunking_strategy=chunking_strategy,
+                        created_at=uploaded_at.replace(tzinfo=None),
+                        document_metadata=document_metadata
+                    ))
+                removed_count = 0
+            else:
+                await report("removing_chunks", progress)
+                with stage("ingestion", "replace_version"):
+                    removed_count = await self._replace_version(
+                        previous, file_path, content_hash, document_metadata, kept_rows, moved_chunks, tenant_id
+                    )
+        except BaseException:
+            # A failed update leaves the previous version in place
+            await self._discard_chunks(document_id, tenant_id, None if previous is None else added_embedding_ids)
+            raise
+        finally:
+            stop.set()
+            # Unblock a producer waiting on a full queue so its thread can exit
+            while not producer.done():
+                while not batches.empty():
+                    batches.get_nowait()
+                await asyncio.wait({producer}, timeout=0.05)
+        
+        reused_count = stored_count - len(added_embedding_ids)
+        if previous is not None:
+            logger.info("Updated document %s: %d chunks reused, %d embedded, %d removed",
+                        document_id, reused_count, len(added_embedding_ids), removed_count)
+        
+        if stored_count < chunk_count:
+            status = "partial"
+        else:
+            status = "processed" if previous is None else "updated"
+        return {
+            "document_id": document_id,
+            "filename": filename,
+            "chunk_count": stored_count,
+            "reused_chunks": reused_count,
+            "removed_chunks": removed_count,
+            "status": status
+        }
+    
+    async def _match_chunks(self, document_id: str, chunks: list[dict[str, Any]], claimed: set[str]) -> dict[int, Any]:
+        """Pair chunks with unclaimed rows of the previous version holding the same text, by position in the batch"""
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(
+                    DocumentChunk.id, DocumentChunk.embedding_id, DocumentChunk.content_hash,
+                    DocumentChunk.chunk_index, DocumentChunk.chunk_metadata
+                )
+                .where(
+                    DocumentChunk.document_id == document_id,
+                    DocumentChunk.content_hash.in_({chunk["content_hash"] for chunk in chunks})
                 )
-                db.add(chunk_record)
+                .order_by(DocumentChunk.chunk_index)
+            )).all()
+        
+        candidates = {}
+        for row in rows:
+            if row.id not in claimed:
+                candidates.setdefault(row.content_hash, []).append(row)
+        
+        matches = {}
+        for position, chunk in enumerate(chunks):
+            # Repeated text in a document matches its earlier rows in order
+            rows = candidates.get(chunk["content_hash"])
+            if rows:
+                matches[position] = rows.pop(0)
+                claimed.add(matches[position].id)
+        return matches
+    
+    async def _replace_version(self, previous: Document, file_path: str, content_hash: str | None,
+                               document_metadata: dict[str, Any], kept_rows: set[str],
+                               moved_chunks: list[dict[str, Any]], tenant_id: str) -> int:
+        """Drop the previous version's leftover chunks, renumber reused ones and point the document at the new file"""
+        async with session_scope() as db:
+            rows = (await db.execute(
+                select(DocumentChunk.id, DocumentChunk.embedding_id).where(DocumentChunk.document_id == previous.id)
+            )).all()
+            removed = [row for row in rows if row.id not in kept_rows]
+            for batch in _batched(removed):
+                await db.execute(delete(DocumentChunk).where(DocumentChunk.id.in_([row.id for row in batch])))
             
-            db.commit()
+            if moved_chunks:
+                chunks_table = DocumentChunk.__table__
+                await db.execute(
+                    update(chunks_table)
+                    .where(chunks_table.c.id == bindparam("row_id"))
+                    .values(chunk_index=bindparam("new_index"), chunk_metadata=bindparam("new_metadata")),
+                    [
+                        {"row_id": chunk["row_id"], "new_index": chunk["chunk_index"], "new_metadata": chunk["row_metadata"]}
+                        for chunk in moved_chunks
+                    ]
+                )
             
-            return {
-                "document_id": file_id,
-                "filename": filename,
-                "chunk_count": len(chunks),
-                "status": "processed"
+            await db.execute(
+                update(Document)
+                .where(Document.id == previous.id)
+                .values(file_path=file_path, content_hash=content_hash, document_metadata=document_metadata)
+            )
+        
+        try:
+            await self.embedding_service.delete_vectors(
+                [row.embedding_id for row in removed if row.embedding_id is not None], tenant_id
+            )
+            await self.embedding_service.update_payloads(
+                {
+                    chunk["chunk_id"]: {"chunk_index": chunk["chunk_index"], "chunk_metadata": chunk["chunk_metadata"]}
+                    for chunk in moved_chunks
+                },
+                tenant_id
+            )
+        except Exception as e:
+            logger.error("Failed to update vectors for the new version of document %s: %s", previous.id, e)
+        if previous.file_path and previous.file_path != file_path:
+            await asyncio.to_thread(_remove_file, previous.file_path)
+        return len(removed)
+    
+    async def _save_chunks(self, document_id: str, chunks: list[dict[str, Any]], embedding_ids: list[str | None],
+                           chunk_indexes: list[int], tenant_id: str) -> list[str]:
+        """Save the chunks whose vectors reached Qdrant and return the IDs of the saved rows"""
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "tenant_id": tenant_id,
+                "document_id": document_id,
+                "chunk_text": chunk["text"],  # The database's only copy of the text; chunk_fts indexes it in place
+                "content_hash": chunk.get("content_hash") or chunk_hash(chunk["text"]),
+                "chunk_index": i,
+                "chunk_metadata": _row_metadata(chunk, embedding_id),
+                "embedding_id": embedding_id
             }
-            
+            for i, chunk, embedding_id in zip(chunk_indexes, chunks, embedding_ids)
+            # Rows without a vector would never be returned by search
+            if embedding_id is not None
+        ]
+        if rows:
+            # One executemany per batch instead of flushing an ORM object per chunk
+            async with session_scope() as db:
+                await db.execute(insert(DocumentChunk.__table__), rows)
+        return [row["id"] for row in rows]
+    
+    async def discard_document(self, document_id: str, tenant_id: str):
+        """Remove a stored document with its chunks and vectors, e.g. one saved while its tenant was dropped"""
+        async with session_scope() as db:
+            await db.execute(delete(Document).where(Document.id == document_id))
+        await self._discard_chunks(document_id, tenant_id)
+    
+    async def _discard_chunks(self, document_id: str, tenant_id: str, embedding_ids: list[str] | None = None):
+        """Remove the batches already stored for a document that failed part-way, or only the given chunks of it"""
+        try:
+            async with session_scope() as db:
+                if embedding_ids is None:
+                    await db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+                else:
+                    for batch in _batched(embedding_ids):
+                        await db.execute(delete(DocumentChunk).where(
+                            DocumentChunk.document_id == document_id, DocumentChunk.embedding_id.in_(batch)
+                        ))
+            if embedding_ids is None:
+                await self.embedding_service.delete_document_vectors(document_id, tenant_id)
+            else:
+                await self.embedding_service.delete_vectors(embedding_ids, tenant_id)
         except Exception as e:
-            db.rollback()
-            raise e
-        finally:
-            db.close()
\ No newline at end of file
+            logger.error("Failed to clean up partially ingested document %s: %s", document_id, e)
+    
+    async def refit_vocabulary(self) -> str:
+        """Refit the shared vocabulary over every stored chunk"""
+        async with SessionLocal() as db:
+            texts = list((await db.execute(select(DocumentChunk.chunk_text))).scalars())
+        
+        if not texts:
+            raise ValueError("No document chunks available to fit a vocabulary")
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embedding_service.refit_vocabulary, texts)
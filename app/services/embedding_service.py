@@ -1,173 +1,400 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+import logging
 import numpy as np
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-import uuid
 import os
+import uuid
 from typing import Any
-import time
-from sklearn.feature_extraction.text import TfidfVectorizer
-import re
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.database import DocumentChunk, SessionLocal
+from app.services.query_cache import LRUCache, SearchResultCache, normalize_query
+from app.services.tenants import DEFAULT_TENANT, TENANT_MAX_POINTS, TenantQuotaError, collection_name
+from app.services.vector_store import VectorStore, Point, Filters
+from app.services.vectorizer import get_vectorizer, embed_with_saved_vocabulary
+from app.utils.metrics import VECTORS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", 128))
+QDRANT_UPSERT_CONCURRENCY = int(os.getenv("QDRANT_UPSERT_CONCURRENCY", 4))
+QDRANT_UPSERT_RETRIES = int(os.getenv("QDRANT_UPSERT_RETRIES", 3))
+QDRANT_RETRY_BACKOFF = float(os.getenv("QDRANT_RETRY_BACKOFF", 0.5))
+# false keeps chunk text out of vector payloads; search reads it from SQLite for the top-k hits
+VECTOR_PAYLOAD_TEXT = os.getenv("VECTOR_PAYLOAD_TEXT", "true").lower() == "true"
+
+# Bound parameters per lookup, well under SQLite's limit
+_TEXT_LOOKUP_BATCH = 500
 
 class EmbeddingService:
-    def __init__(self):
+    def __init__(self, result_cache: SearchResultCache | None = None, max_points: int = TENANT_MAX_POINTS,
+                 payload_text: bool = VECTOR_PAYLOAD_TEXT, sessions: async_sessionmaker = SessionLocal):
         self.vector_size = 300  # Fixed size for our embeddings
-        self.vectorizer = None
-        self.vocabulary = None
+        self.vectorizer = get_vectorizer(self.vector_size)
+        self.query_embedding_cache = LRUCache(name="query_embedding")
+        self.result_cache = result_cache
+        self.max_points = max_points
+        self.payload_text = payload_text
+        self.sessions = sessions
         
-        self.qdrant_client = None
-        self._initialize_qdrant()
+        # The default tenant's store; every tenant's collection is opened from it
+        self.vector_store = None
+        self.tenant_stores = {}
+        self._tenant_lock = asyncio.Lock()
     
-    def _initialize_qdrant(self):
-        """Initialize Qdrant client with retry logic"""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                self.qdrant_client = QdrantClient(
-                    url=os.getenv("QDRANT_URL", "http://localhost:6333"),
-                    api_key=os.getenv("QDRANT_API_KEY", "")
-                )
-                
-                self.qdrant_client.get_collections()
-                print("✅ Successfully connected to Qdrant")
-                
-                self._ensure_collection_exists()
-                break
-                
-            except Exception as e:
-                print(f"❌ Qdrant connection attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    print("Retrying in 5 seconds...")
-                    time.sleep(5)
-                else:
-                    print("⚠️ Could not connect to Qdrant")
-                    self.qdrant_client = None
-    
-    def _ensure_collection_exists(self):
-        """Ensure the documents collection exists"""
-        try:
-            self.qdrant_client.get_collection("documents")
-            print("✅ Documents collection exists")
-        except Exception:
-            print("📁 Creating documents collection...")
-            self.qdrant_client.create_collection(
-                collection_name="documents",
-                vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE),
-            )
-            print("✅ Documents collection created")
-    
-    def _build_vocabulary(self, texts: list[str]):
-        """Build a simple vocabulary for embeddings"""
-        all_words = set()
-        for text in texts:
-            words = re.findall(r'\b[a-zA-Z]{3,15}\b', text.lower())
-            all_words.update(words)
-        
-        # Take top N most common words
-        word_list = list(all_words)[:self.vector_size]
-        self.vocabulary = {word: i for i, word in enumerate(word_list)}
-        print(f"✅ Built vocabulary with {len(self.vocabulary)} words")
-    
-    def generate_embeddings(self, texts: list[str]) -> list[list[float]]:
-        """Generate simple word frequency based embeddings"""
-        embeddings = []
-        
-        for text in texts:
-            embedding = [0.0] * self.vector_size
-            
-            if self.vocabulary:
-                # Word frequency based embedding
-                words = re.findall(r'\b[a-zA-Z]{3,15}\b', text.lower())
-                word_count = len(words)
-                
-                for word in words:
-                    if word in self.vocabulary:
-                        idx = self.vocabulary[word]
-                        if idx < self.vector_size:
-                            embedding[idx] += 1.0 / max(1, word_count)
-            
-            else:
-                text_lower = text.lower()
-                for i, char in enumerate(text_lower[:self.vector_size]):
-                    if i < len(embedding):
-                        embedding[i] = (ord(char) % 100) / 100.0
-            
-            # Normalize the embedding
-            norm = max(0.001, np.linalg.norm(embedding))
-            embedding = [x / norm for x in embedding]
-            embeddings.append(embedding)
-        
-        return embeddings
+    async def attach_vector_store(self, vector_store: VectorStore):
+        """Start using a vector store once its collection is ready"""
+        await vector_store.ensure_collection(self.vector_size)
+        self.tenant_stores = {DEFAULT_TENANT: vector_store}
+        self.vector_store = vector_store
+    
+    async def get_vector_store(self, tenant_id: str = DEFAULT_TENANT, create: bool = True) -> VectorStore | None:
+        """Return a tenant's own collection, creating it on first use"""
+        if self.vector_store is None:
+            return None
+        store = self.tenant_stores.get(tenant_id)
+        if store is None and create:
+            async with self._tenant_lock:
+                store = self.tenant_stores.get(tenant_id)
+                if store is None:
+                    store = self.vector_store.for_collection(collection_name(tenant_id))
+                    await store.ensure_collection(self.vector_size)
+                    self.tenant_stores[tenant_id] = store
+        return store
     
-    def store_embeddings(self, chunks: list[dict[str, Any]], document_id: str) -> list[str]:
-        """Store embeddings in Qdrant and return embedding IDs"""
-        if self.qdrant_client is None:
-            print("⚠️ Qdrant not available, skipping embedding storage")
-            return [str(uuid.uuid4()) for _ in chunks]
+    async def drop_tenant(self, tenant_id: str):
+        """Delete a tenant's whole collection in one operation"""
+        if tenant_id == DEFAULT_TENANT:
+            raise ValueError("The default tenant cannot be dropped")
+        if self.vector_store is None:
+            raise RuntimeError("Vector store not available")
+        async with self._tenant_lock:
+            store = self.tenant_stores.pop(tenant_id, None) or self.vector_store.for_collection(collection_name(tenant_id))
+            await store.drop()
+        await self._invalidate_search_cache(tenant_id)
+    
+    async def close(self):
+        for store in self.tenant_stores.values():
+            if store is not self.vector_store:
+                await store.close()
+        if self.vector_store is not None:
+            await self.vector_store.close()
+    
+    def _ensure_vocabulary(self, texts: list[str]):
+        """Fit and persist the shared vocabulary unless one already exists"""
+        self.vectorizer.reload_if_changed()
+        if not self.vectorizer.is_fitted:
+            self.vectorizer.fit(texts)
+            self.vectorizer.save()
+            logger.info("Built vocabulary %s with %d words", self.vectorizer.version, len(self.vectorizer.vocabulary))
+    
+    def refit_vocabulary(self, texts: list[str]) -> str:
+        """Refit the shared vocabulary over a corpus and return its version"""
+        self.vectorizer.fit(texts)
+        self.vectorizer.save()
+        logger.info("Refitted vocabulary %s with %d words", self.vectorizer.version, len(self.vectorizer.vocabulary))
+        return self.vectorizer.version
+    
+    def generate_embeddings(self, texts: list[str]) -> np.ndarray:
+        """Generate word frequency based embeddings as a float32 matrix"""
+        return self.vectorizer.transform(texts)
+    
+    async def embed_in_executor(self, texts: list[str]) -> np.ndarray:
+        """Generate embeddings off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.generate_embeddings, texts)
+    
+    async def embed_documents(self, texts: list[str], executor: Executor | None = None) -> np.ndarray:
+        """Embed chunk texts, fitting the shared vocabulary first if needed"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._ensure_vocabulary, texts)
         
-        texts = [chunk["text"] for chunk in chunks]
+        if isinstance(executor, ProcessPoolExecutor):
+            # Worker processes load the saved vocabulary instead of receiving it pickled
+            return await loop.run_in_executor(executor, embed_with_saved_vocabulary, texts, self.vector_size)
+        return await loop.run_in_executor(executor, self.generate_embeddings, texts)
+    
+    async def store_embeddings(self, chunks: list[dict[str, Any]], document_id: str,
+                               embeddings: np.ndarray | None = None, first_index: int = 0,
+                               document_fields: dict[str, Any] | None = None,
+                               tenant_id: str = DEFAULT_TENANT,
+                               chunk_indexes: list[int] | None = None) -> list[str | None]:
+        """Store embeddings in the tenant's collection and return each chunk's embedding ID, or None if it was not stored"""
+        vector_store = await self.get_vector_store(tenant_id)
+        if vector_store is None:
+            logger.warning("Vector store not available, skipping embedding storage")
+            return [None] * len(chunks)
         
-        if self.vocabulary is None:
-            self._build_vocabulary(texts)
+        if self.max_points > 0:
+            point_count = await vector_store.count()
+            if point_count + len(chunks) > self.max_points:
+                raise TenantQuotaError(f"Tenant {tenant_id} would exceed its quota of {self.max_points} vectors")
         
-        embeddings = self.generate_embeddings(texts)
+        if embeddings is None:
+            embeddings = await self.embed_documents([chunk["text"] for chunk in chunks])
+        version = self.vectorizer.version
         
         points = []
-        embedding_ids = []
         
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            embedding_id = str(uuid.uuid4())
-            embedding_ids.append(embedding_id)
-            
-            point = PointStruct(
-                id=embedding_id,
-                vector=embedding,
-                payload={
-                    "document_id": document_id,
-                    "chunk_index": i,
-                    "text": chunk["text"],
-                    "chunk_metadata": chunk.get("chunk_metadata", {})
-                }
-            )
-            points.append(point)
+        if chunk_indexes is None:
+            chunk_indexes = range(first_index, first_index + len(chunks))
         
-        try:
-            self.qdrant_client.upsert(
-                collection_name="documents",
-                points=points
-            )
-            print(f"✅ Stored {len(points)} embeddings in Qdrant for document {document_id}")
-        except Exception as e:
-            print(f"❌ Failed to store embeddings in Qdrant: {e}")
+        for i, chunk, embedding in zip(chunk_indexes, chunks, embeddings):
+            payload = {
+                **(document_fields or {}),
+                "document_id": document_id,
+                "chunk_index": i,
+                "chunk_metadata": chunk.get("metadata", {}),
+                "vectorizer_version": version
+            }
+            if self.payload_text:
+                payload["text"] = chunk["text"]
+            points.append({"id": str(uuid.uuid4()), "vector": embedding, "payload": payload})
+        
+        landed = await self.upsert_points(points, vector_store)
+        stored = sum(landed)
+        VECTORS_TOTAL.labels("stored").inc(stored)
+        VECTORS_TOTAL.labels("failed").inc(len(points) - stored)
+        if stored:
+            await self._invalidate_search_cache(tenant_id)
+        if stored == len(points):
+            logger.debug("Stored %d embeddings for document %s", stored, document_id)
+        else:
+            logger.error("Stored only %d of %d embeddings for document %s", stored, len(points), document_id)
+        
+        return [point["id"] if ok else None for point, ok in zip(points, landed)]
+    
+    async def upsert_points(self, points: list[Point], vector_store: VectorStore) -> list[bool]:
+        """Upsert points in concurrent batches and report which of them were stored"""
+        semaphore = asyncio.Semaphore(QDRANT_UPSERT_CONCURRENCY)
+        
+        async def upsert_batch(batch: list[Point]) -> bool:
+            async with semaphore:
+                return await self._upsert_with_retries(batch, vector_store)
         
-        return embedding_ids
+        batches = [points[i:i + QDRANT_UPSERT_BATCH_SIZE] for i in range(0, len(points), QDRANT_UPSERT_BATCH_SIZE)]
+        results = await asyncio.gather(*(upsert_batch(batch) for batch in batches))
+        return [ok for batch, ok in zip(batches, results) for _ in batch]
     
-    def search_similar(self, query: str, top_k: int = 5) -> list[dict[str, Any]]:
-        """Search for similar documents"""
-        if self.qdrant_client is None:
-            print("⚠️ Qdrant not available, returning empty results")
+    async def _upsert_with_retries(self, points: list[Point], vector_store: VectorStore) -> bool:
+        # Point IDs are fixed before the first attempt, so retrying a batch that
+        # did land after all only overwrites it
+        delay = QDRANT_RETRY_BACKOFF
+        for attempt in range(1, QDRANT_UPSERT_RETRIES + 2):
+            try:
+                await vector_store.upsert(points)
+                return True
+            except Exception as e:
+                if attempt > QDRANT_UPSERT_RETRIES:
+                    logger.error("Failed to store %d embeddings after %d attempts: %s", len(points), attempt, e)
+                    return False
+                logger.warning("Vector store upsert attempt %d failed: %s. Retrying in %.1fs", attempt, e, delay)
+                await asyncio.sleep(delay)
+                delay *= 2
+    
+    async def delete_document_vectors(self, document_id: str, tenant_id: str = DEFAULT_TENANT):
+        """Remove every point stored for a document"""
+        vector_store = await self.get_vector_store(tenant_id, create=False)
+        if vector_store is None:
+            return
+        
+        await vector_store.delete_by_document(document_id)
+        await self._invalidate_search_cache(tenant_id)
+    
+    async def update_payloads(self, payloads: dict[str, dict[str, Any]], tenant_id: str = DEFAULT_TENANT):
+        """Refresh payload fields of reused points, such as a chunk's new position in an updated document"""
+        vector_store = await self.get_vector_store(tenant_id, create=False)
+        if vector_store is None or not payloads:
+            return
+        
+        await vector_store.set_payload(payloads)
+        await self._invalidate_search_cache(tenant_id)
+    
+    async def delete_vectors(self, embedding_ids: list[str], tenant_id: str = DEFAULT_TENANT):
+        """Remove individual points, such as chunks dropped from an updated document"""
+        vector_store = await self.get_vector_store(tenant_id, create=False)
+        if vector_store is None or not embedding_ids:
+            return
+        
+        await vector_store.delete(embedding_ids)
+        VECTORS_TOTAL.labels("deleted").inc(len(embedding_ids))
+        await self._invalidate_search_cache(tenant_id)
+    
+    async def _invalidate_search_cache(self, tenant_id: str):
+        if self.result_cache is not None:
+            await self.result_cache.invalidate(tenant_id)
+    
+    def embed_query(self, query: str) -> list[float]:
+        """Embed a single query, reusing cached embeddings for repeated questions"""
+        key = (self.vectorizer.version, normalize_query(query))
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            # A single query embeds in microseconds, cheaper than an executor hop
+            embedding = self.generate_embeddings([query])[0].tolist()
+            self.query_embedding_cache.put(key, embedding)
+        return embedding
+    
+    async def search_similar(self, query: str, top_k: int = 5, filters: Filters | None = None,
+                             tenant_id: str = DEFAULT_TENANT) -> list[dict[str, Any]]:
+        """Search a tenant's documents, optionally only among points matching the payload filters"""
+        if self.vector_store is None:
+            logger.warning("Vector store not available, returning empty results")
             return []
         
         try:
-            query_embedding = self.generate_embeddings([query])[0]
+            # Searching must not create collections for tenants that never uploaded
+            vector_store = await self.get_vector_store(tenant_id, create=False)
+            if vector_store is None:
+                return []
+            self.vectorizer.reload_if_changed()
             
-            search_results = self.qdrant_client.search(
-                collection_name="documents",
-                query_vector=query_embedding,
-                limit=top_k
-            )
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key, cached = await self.result_cache.get(query, top_k, self.vectorizer.version, filters, tenant_id)
+                if cached is not None:
+                    return cached
             
-            results = []
-            for result in search_results:
-                results.append({
-                    "text": result.payload["text"],
-                    "score": result.score,
-                    "chunk_metadata": result.payload.get("chunk_metadata", {}),
-                    "document_id": result.payload["document_id"]
-                })
+            query_embedding = self.embed_query(query)
             
-            print(f"✅ Found {len(results)} similar documents for query: '{query}'")
+            search_results = await vector_store.search(query_embedding, top_k, filters)
+            results = (await self._to_results([search_results]))[0]
+            
+            logger.debug("Found %d similar documents for query %r", len(results), query)
+            if self.result_cache is not None:
+                await self.result_cache.put(cache_key, results)
             return results
             
         except Exception as e:
-            print(f"❌ Search failed: {e}")
-            return []
\ No newline at end of file
+            logger.error("Search failed: %s", e)
+            return []
+    
+    async def _to_results(self, batches: list[list[Point]]) -> list[list[dict[str, Any]]]:
+        """Turn hits into results, with one lookup for the text of every hit whose payload leaves it out"""
+        texts = await self.chunk_texts([hit["id"] for hits in batches for hit in hits if "text" not in hit["payload"]])
+        return [
+            [
+                {
+                    "id": result["id"],
+                    "text": result["payload"]["text"] if "text" in result["payload"] else texts[result["id"]],
+                    "score": result["score"],
+                    "chunk_metadata": result["payload"].get("chunk_metadata", {}),
+                    "document_id": result["payload"]["document_id"]
+                }
+                for result in hits
+                # A vector is stored just before its chunk row, so a search in between skips it
+                if "text" in result["payload"] or result["id"] in texts
+            ]
+            for hits in batches
+        ]
+    
+    async def chunk_texts(self, embedding_ids: list[str]) -> dict[str, str]:
+        """Full chunk texts by embedding ID, read from SQLite for points stored without them"""
+        texts = {}
+        for start in range(0, len(embedding_ids), _TEXT_LOOKUP_BATCH):
+            batch = embedding_ids[start:start + _TEXT_LOOKUP_BATCH]
+            async with self.sessions() as db:
+                rows = await db.execute(
+                    select(DocumentChunk.embedding_id, DocumentChunk.chunk_text).where(DocumentChunk.embedding_id.in_(batch))
+                )
+                texts.update(rows.all())
+        return texts
+    
+    async def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """Embed several queries, vectorizing all uncached ones in a single call"""
+        keys = [(self.vectorizer.version, normalize_query(query)) for query in queries]
+        embeddings = [self.query_embedding_cache.get(key) for key in keys]
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            vectors = await self.embed_in_executor([queries[indexes[0]] for indexes in missing.values()])
+            for (key, indexes), vector in zip(missing.items(), vectors):
+                embedding = vector.tolist()
+                self.query_embedding_cache.put(key, embedding)
+                for i in indexes:
+                    embeddings[i] = embedding
+        return embeddings
+    
+    async def search_similar_batch(self, queries: list[str], top_k: int = 5, filters: list[Filters | None] | None = None,
+                                   tenant_id: str = DEFAULT_TENANT) -> list[list[dict[str, Any]]]:
+        """Search a tenant's documents for many queries with one cache lookup, one embedding call and one store call"""
+        filters = filters or [None] * len(queries)
+        results = [[] for _ in queries]
+        if self.vector_store is None:
+            logger.warning("Vector store not available, returning empty results")
+            return results
+        
+        try:
+            vector_store = await self.get_vector_store(tenant_id, create=False)
+            if vector_store is None or not queries:
+                return results
+            self.vectorizer.reload_if_changed()
+            
+            keys = [None] * len(queries)
+            pending = list(range(len(queries)))
+            if self.result_cache is not None:
+                keys, cached = await self.result_cache.get_many(queries, top_k, self.vectorizer.version, filters, tenant_id)
+                pending = [i for i, hit in enumerate(cached) if hit is None]
+                for i, hit in enumerate(cached):
+                    if hit is not None:
+                        results[i] = hit
+            if not pending:
+                return results
+            
+            embeddings = await self.embed_queries([queries[i] for i in pending])
+            batches = await vector_store.search_batch(embeddings, top_k, [filters[i] for i in pending])
+            for i, search_results in zip(pending, await self._to_results(batches)):
+                results[i] = search_results
+            
+            logger.debug("Searched %d queries in one batch (%d cached)", len(pending), len(queries) - len(pending))
+            if self.result_cache is not None:
+                await self.result_cache.put_many({keys[i]: results[i] for i in pending if keys[i] is not None})
+            return results
+            
+        except Exception as e:
+            logger.error("Batch search failed: %s", e)
+            return [[] for _ in queries]
+    
+    async def reembed_stale_vectors(self, batch_size: int = 256) -> int:
+        """Re-embed points whose vectors were built with another vocabulary version"""
+        if self.vector_store is None or not self.vectorizer.is_fitted:
+            return 0
+        
+        version = self.vectorizer.version
+        updated = 0
+        
+        for tenant_id, vector_store in list(self.tenant_stores.items()):
+            try:
+                while version == self.vectorizer.version:
+                    # Re-embedded points drop out of the filter, so always read the first page
+                    records = await vector_store.scroll(batch_size, exclude={"vectorizer_version": version})
+                    if not records:
+                        break
+                    
+                    stored_texts = await self.chunk_texts(
+                        [record["id"] for record in records if "text" not in record["payload"]]
+                    )
+                    embeddings = await self.embed_in_executor([
+                        record["payload"]["text"] if "text" in record["payload"] else stored_texts.get(record["id"], "")
+                        for record in records
+                    ])
+                    landed = await self.upsert_points([
+                        {"id": record["id"], "vector": embedding, "payload": {**record["payload"], "vectorizer_version": version}}
+                        for record, embedding in zip(records, embeddings)
+                    ], vector_store)
+                    if any(landed):
+                        await self._invalidate_search_cache(tenant_id)
+                    if not all(landed):
+                        # The same stale points would come back on the next scroll
+                        break
+                    updated += len(records)
+                    VECTORS_TOTAL.labels("reembedded").inc(len(records))
+            except Exception as e:
+                logger.error("Re-embedding stale vectors for tenant %s failed: %s", tenant_id, e)
+        
+        if updated:
+            logger.info("Re-embedded %d stale vectors with vocabulary %s", updated, version)
+        return updated
@@ -0,0 +1,259 @@
+import asyncio
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+
+from sqlalchemy import select, update, func
+
+from app.models.database import DEFAULT_TENANT, SessionLocal, session_scope, Document, IngestionJob
+from app.services.document_ingestion import DocumentIngestionService, unchanged_result
+
+logger = logging.getLogger(__name__)
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 2))
+INGESTION_PROCESS_WORKERS = int(os.getenv("INGESTION_PROCESS_WORKERS", 2))
+INGESTION_MAX_PENDING = int(os.getenv("INGESTION_MAX_PENDING", 32))
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", 2))
+INGESTION_STALE_AFTER = int(os.getenv("INGESTION_STALE_AFTER", 900))
+INGESTION_STALE_SWEEP_INTERVAL = float(os.getenv("INGESTION_STALE_SWEEP_INTERVAL", 60))
+
+class QueueFullError(Exception):
+    """Raised when too many ingestion jobs are already waiting"""
+
+class JobCancelledError(Exception):
+    """Raised inside a running job whose row is no longer running, e.g. because its tenant was dropped"""
+
+def create_process_pool(workers: int = INGESTION_PROCESS_WORKERS) -> ProcessPoolExecutor | None:
+    """Process pool for CPU-bound extraction and embedding, or None to use threads"""
+    if workers <= 0:
+        return None
+    # Forking a process that runs an event loop and open sockets is unsafe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _utcnow() -> datetime:
+    # SQLite returns naive UTC timestamps for server_default=func.now()
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class IngestionQueue:
+    """SQLite-backed job queue drained by a fixed number of async workers"""
+
+    def __init__(self, ingestion_service: DocumentIngestionService, workers: int = INGESTION_WORKERS,
+                 max_pending: int = INGESTION_MAX_PENDING):
+        self.ingestion_service = ingestion_service
+        self.workers = workers
+        self.max_pending = max_pending
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    async def start(self):
+        """Requeue jobs interrupted by a previous shutdown and start the workers and the stale job sweep"""
+        await self._requeue_stale_jobs()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep_stale_jobs()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, document_id: str, filename: str, file_path: str, file_size: int,
+                      chunking_strategy: str, tenant_id: str = DEFAULT_TENANT,
+                      content_hash: str | None = None) -> IngestionJob:
+        """Record a queued job for a saved upload, refusing it when the queue is full"""
+        async with session_scope() as db:
+            pending = await db.scalar(
+                select(func.count()).select_from(IngestionJob).where(IngestionJob.status == "queued")
+            )
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} ingestion jobs are already waiting")
+
+            job = IngestionJob(
+                id=str(uuid.uuid4()),
+                tenant_id=tenant_id,
+                document_id=document_id,
+                filename=filename,
+                file_path=file_path,
+                file_size=file_size,
+                content_hash=content_hash,
+                chunking_strategy=chunking_strategy,
+                status="queued",
+                stage="queued",
+                progress=0.0,
+                stage_timings={},
+                created_at=_utcnow()
+            )
+            db.add(job)
+            await db.flush()
+            await db.refresh(job)
+
+        self._wakeup.set()
+        return job
+
+    async def record_unchanged(self, document: Document, filename: str, file_size: int,
+                               content_hash: str) -> IngestionJob:
+        """Record an upload identical to a stored document as a job that is already complete"""
+        result = unchanged_result(document)
+        async with session_scope() as db:
+            job = IngestionJob(
+                id=str(uuid.uuid4()),
+                tenant_id=document.tenant_id,
+                document_id=document.id,
+                filename=filename,
+                file_size=file_size,
+                content_hash=content_hash,
+                chunking_strategy=document.chunking_strategy,
+                status="completed",
+                stage="completed",
+                progress=1.0,
+                stage_timings={},
+                chunk_count=result["chunk_count"],
+                reused_chunk_count=result["reused_chunks"],
+                removed_chunk_count=0,
+                document_status=result["status"],
+                created_at=_utcnow()
+            )
+            db.add(job)
+            await db.flush()
+            await db.refresh(job)
+        return job
+
+    async def get_job(self, job_id: str) -> IngestionJob | None:
+        async with SessionLocal() as db:
+            return await db.get(IngestionJob, job_id)
+
+    async def _requeue_stale_jobs(self):
+        """Requeue running jobs that have not reported progress for INGESTION_STALE_AFTER seconds"""
+        cutoff = _utcnow() - timedelta(seconds=INGESTION_STALE_AFTER)
+        async with session_scope() as db:
+            requeued = await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.status == "running", IngestionJob.updated_at < cutoff)
+                .values(status="queued", stage="queued", progress=0.0, stage_timings={})
+            )
+        if requeued.rowcount:
+            logger.warning("Requeued %d ingestion jobs that stopped reporting progress", requeued.rowcount)
+            self._wakeup.set()
+
+    async def _sweep_stale_jobs(self):
+        # Running jobs report every stage of every batch, so one that goes quiet was lost with its
+        # process; a restart within INGESTION_STALE_AFTER of a crash is only caught here. Several
+        # API processes share the queue, so a job is never taken back just because this one restarted.
+        while True:
+            await asyncio.sleep(INGESTION_STALE_SWEEP_INTERVAL)
+            try:
+                await self._requeue_stale_jobs()
+            except Exception as e:
+                logger.error("Failed to requeue stale ingestion jobs: %s", e)
+
+    async def _worker(self):
+        while True:
+            job = await self._claim_next()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=INGESTION_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ingestion job %s failed: %s", job.id, e)
+
+    async def _claim_next(self) -> IngestionJob | None:
+        """Atomically move the oldest queued job to running"""
+        async with SessionLocal() as db:
+            while True:
+                job = await db.scalar(
+                    select(IngestionJob)
+                    .where(IngestionJob.status == "queued")
+                    .order_by(IngestionJob.created_at)
+                    .limit(1)
+                )
+                if job is None:
+                    return None
+
+                # Another worker (or another API process) may claim the same row
+                claimed = await db.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id == job.id, IngestionJob.status == "queued")
+                    .values(status="running")
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    return job
+
+    async def _run(self, job: IngestionJob):
+        timings = {"queued": round((_utcnow() - job.created_at).total_seconds() * 1000, 1)} if job.created_at else {}
+        current = {"stage": None, "started": time.perf_counter()}
+
+        async def report(stage: str, progress: float):
+            now = time.perf_counter()
+            if current["stage"] is not None:
+                # Stages repeat for every batch, so their time accumulates
+                elapsed = (now - current["started"]) * 1000
+                timings[current["stage"]] = round(timings.get(current["stage"], 0.0) + elapsed, 1)
+            current.update(stage=stage, started=now)
+            if not await self._update_running(job.id, stage=stage, progress=progress, stage_timings=dict(timings)):
+                raise JobCancelledError(f"Ingestion job {job.id} was cancelled")
+
+        tenant_id = job.tenant_id or DEFAULT_TENANT
+        try:
+            result = await self.ingestion_service.process_document(
+                job.file_path,
+                job.document_id,
+                job.filename,
+                job.chunking_strategy,
+                job.file_size,
+                report,
+                tenant_id,
+                job.content_hash
+            )
+        except JobCancelledError:
+            # The ingestion service has already discarded the chunks and vectors stored so far
+            logger.info("Ingestion job %s was cancelled", job.id)
+            return
+        except Exception as e:
+            with contextlib.suppress(JobCancelledError):
+                await report("failed", 1.0)
+            await self._update_running(job.id, status="failed", error=str(e))
+            raise
+
+        error = None
+        if result["status"] == "partial":
+            error = "Some chunks could not be stored in the vector store and were skipped"
+        try:
+            await report("completed", 1.0)
+            completed = await self._update_running(
+                job.id,
+                status="completed",
+                document_id=result["document_id"],
+                chunk_count=result["chunk_count"],
+                reused_chunk_count=result["reused_chunks"],
+                removed_chunk_count=result["removed_chunks"],
+                document_status=result["status"],
+                error=error
+            )
+        except JobCancelledError:
+            completed = False
+        if not completed:
+            # Cancelled while the document was being saved, after the drop removed the tenant's rows
+            logger.info("Ingestion job %s was cancelled; removing document %s", job.id, result["document_id"])
+            await self.ingestion_service.discard_document(result["document_id"], tenant_id)
+
+    async def _update_running(self, job_id: str, **values) -> bool:
+        """Update a job only while it is running, returning False once it has been cancelled"""
+        async with session_scope() as db:
+            updated = await db.execute(
+                update(IngestionJob).where(IngestionJob.id == job_id, IngestionJob.status == "running").values(**values)
+            )
+        return updated.rowcount == 1
@@ -0,0 +1,121 @@
+from datetime import date, datetime, time
+from functools import lru_cache
+import re
+
+GREETING = "greeting"
+THANKS = "thanks"
+BOOKING = "booking"
+
+# Intent words, matched against the lowercased text in a single scan. Words must stand alone,
+# so "this" is not a greeting and "notebook" is not a booking request. The lookahead holds the
+# first letters of all intent words, so every other word is rejected on one character.
+_INTENT_PATTERN = re.compile(
+    r"\b(?=[abhimst])(?:hello\b|hi\b|thank"
+    r"|(?:schedul(?:e|ed|ing)|book(?:ed|ing)?|interviews?|meetings?|appointments?)\b)"
+)
+_INTENT_WORDS = {
+    "hello": GREETING,
+    "hi": GREETING,
+    "thank": THANKS,
+    **dict.fromkeys(
+        ("schedule", "scheduled", "scheduling", "book", "booked", "booking", "interview", "interviews",
+         "meeting", "meetings", "appointment", "appointments"),
+        BOOKING
+    ),
+}
+# Every intent word without the leading boundary, so each alternative starts with a letter and the
+# regex engine jumps between candidate letters; a message it finds nothing in needs no full scan
+_INTENT_HINT = re.compile(r"hello\b|hi\b|thank|schedul|book|interview|meeting|appointment")
+_NO_INTENTS = frozenset()
+
+_NAME = r"(?-i:[A-Z][a-z]+(?:[ \t]+[A-Z][a-z]+)+)"  # two or more capitalized words, whatever the flags
+_WEEKDAY = r"(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+# "am", "a.m." or "a.m", but never a full stop after plain "am", which ends the sentence
+_MERIDIEM = r"[ap](?:\.m\.|\.?m)"
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+
+# Every entity the booking flow needs, in one alternation scanned once. Cue words are
+# case-insensitive; names must be capitalized so the match stops at the next lowercase word,
+# except right after "my name is", where two lowercase words are taken as the name. Every
+# entity starts where a word does (the lookahead skips the boundaries at word ends), and
+# numeric forms are only tried where a digit is, so most positions are rejected after a
+# character or two. Entities are ASCII, and ASCII matching halves the cost of case folding.
+_ENTITY_PATTERN = re.compile(
+    rf"""
+    \b(?=[\w.%+-])(?:
+        (?P<email>[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{{2,}})
+      | (?=\d)(?P<time>\d{{1,2}}:\d{{2}}(?:\s*{_MERIDIEM})?|\d{{1,2}}\s*{_MERIDIEM}(?![a-z]))
+      | (?P<date>(?:
+            (?=\d)(?:\d{{4}}-\d{{2}}-\d{{2}} | \d{{1,2}}/\d{{1,2}}(?:/\d{{2,4}})?
+                    | \d{{1,2}}(?:st|nd|rd|th)?\ (?:of\ )?{_MONTH}(?:\ \d{{4}})?)
+          | day\ after\ tomorrow | to(?:morrow|day|night) | next\ week | in\ \d+\ days?
+          | (?:next|this|on)\ {_WEEKDAY} | {_WEEKDAY}
+          | {_MONTH}\ \d{{1,2}}(?:st|nd|rd|th)?(?:,?\ \d{{4}})?
+        )\b)
+      | (?P<daypart>morning|afternoon)\b
+      | (?:my\ name\ is|name\ is|called)\s+(?P<cued_name>{_NAME}|[a-z]+[ \t]+[a-z]+)
+      | (?:with|for)\s+(?P<name_after>{_NAME})
+      | (?P<name_before>{_NAME})(?=\s+(?:for\ interview|at|on)\b)
+    )
+    """,
+    re.VERBOSE | re.IGNORECASE | re.ASCII
+)
+# Name patterns in order of trust, as the booking flow has always preferred them
+_NAME_GROUPS = ("cued_name", "name_after", "name_before")
+_DAYPART_TIMES = {"morning": "09:00 AM", "afternoon": "02:00 PM"}
+# dateparser reads a bare weekday as the next one to come, but not "next" or "this" before it;
+# other phrases such as "next week" it takes as they are
+_WEEKDAY_PREFIX = re.compile(rf"^(?:next|this|on)\s+(?={_WEEKDAY})")
+
+def detect_intents(text: str) -> frozenset[str]:
+    """Intents a message expresses: greeting, thanks and/or booking"""
+    lowered = text.lower()
+    # Every intent word is also a hint, so a message without one needs no scan, and the scan
+    # can start at the first hint
+    hint = _INTENT_HINT.search(lowered)
+    if hint is None:
+        return _NO_INTENTS
+    return frozenset(map(_INTENT_WORDS.__getitem__, _INTENT_PATTERN.findall(lowered, hint.start())))
+
+@lru_cache(maxsize=1024)
+def _parse_date(phrase: str, today: date) -> str | None:
+    # dateparser takes a quarter of a second to import, so only booking requests pay for it
+    import dateparser
+
+    normalized = _WEEKDAY_PREFIX.sub("", phrase.strip().lower()).replace("tonight", "today")
+    parsed = dateparser.parse(
+        normalized,
+        languages=["en"],  # skips language detection, which is slower than the parse itself
+        settings={"PREFER_DATES_FROM": "future", "RELATIVE_BASE": datetime.combine(today, time())}
+    )
+    return parsed.strftime("%Y-%m-%d") if parsed else None
+
+def resolve_date(phrase: str, now: datetime | None = None) -> str:
+    """Turn a date phrase such as "tomorrow", "on Friday" or "March 5" into YYYY-MM-DD, or return it unchanged"""
+    # Phrases resolve the same way all day, so each is parsed once per day
+    return _parse_date(phrase, (now or datetime.now()).date()) or phrase
+
+def extract_booking_info(text: str, now: datetime | None = None) -> dict[str, str]:
+    """Pull name, email, date and time out of a message in one scan"""
+    booking_info = {}
+    names = {}
+    daypart = None
+    for match in _ENTITY_PATTERN.finditer(text):
+        group = match.lastgroup
+        value = match.group(group).strip()
+        if group in _NAME_GROUPS:
+            names.setdefault(group, value if not value.islower() else value.title())
+        elif group == "daypart":
+            daypart = daypart or value.lower()
+        else:
+            booking_info.setdefault(group, value)
+
+    for group in _NAME_GROUPS:
+        if group in names:
+            booking_info["name"] = names[group]
+            break
+    if "time" not in booking_info and daypart:
+        booking_info["time"] = _DAYPART_TIMES[daypart]
+    if "date" in booking_info:
+        booking_info["date"] = resolve_date(booking_info["date"], now)
+    return booking_info
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+import json
+import logging
+import re
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.database import DEFAULT_TENANT, SessionLocal
+from app.services.vector_store import Filters
+
+logger = logging.getLogger(__name__)
+
+_term_re = re.compile(r"\w+")
+
+KEYWORD_MAX_TERMS = 32
+
+def build_match_query(query: str) -> str | None:
+    """Turn free text into an FTS5 query that matches any of its terms"""
+    terms = list(dict.fromkeys(term.lower() for term in _term_re.findall(query) if len(term) > 1))
+    if not terms:
+        return None
+    # Quoting each term keeps FTS5 operators and column filters in user input literal
+    return " OR ".join(f'"{term}"' for term in terms[:KEYWORD_MAX_TERMS])
+
+# Vector payload fields and the columns holding the same values for keyword search
+_FILTER_COLUMNS = {
+    "document_id": "document_chunks.document_id",
+    "filename": "documents.filename",
+    "chunking_strategy": "documents.chunking_strategy",
+    "uploaded_at": "documents.created_at"
+}
+_RANGE_SQL = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+# Fields ingestion adds to a chunk row's metadata that search results do not carry
+_ROW_ONLY_FIELDS = ("embedding_id", "text_length")
+
+def _sql_value(field: str, value: Any) -> Any:
+    if field == "uploaded_at":
+        # Payloads hold epoch seconds; documents.created_at holds naive UTC text
+        return datetime.fromtimestamp(value, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    return value
+
+def _filter_clauses(filters: Filters) -> tuple[list[str], dict[str, Any]]:
+    """SQL conditions and parameters for payload-style filters"""
+    clauses, params = [], {}
+    for field, value in filters.items():
+        column = _FILTER_COLUMNS.get(field)
+        if column is None:
+            raise ValueError(f"Keyword search cannot filter on {field}")
+        if isinstance(value, dict):
+            for operator, bound in value.items():
+                name = f"{field}_{operator}"
+                clauses.append(f"{column} {_RANGE_SQL[operator]} :{name}")
+                params[name] = _sql_value(field, bound)
+        elif isinstance(value, (list, tuple, set)):
+            names = [f"{field}_{i}" for i in range(len(value))]
+            clauses.append(f"{column} IN ({', '.join(':' + name for name in names)})" if names else "0")
+            params.update({name: _sql_value(field, option) for name, option in zip(names, value)})
+        else:
+            clauses.append(f"{column} = :{field}")
+            params[field] = _sql_value(field, value)
+    return clauses, params
+
+class KeywordIndex:
+    """BM25 keyword search over the chunk_fts SQLite FTS5 table, which triggers keep in step with document_chunks"""
+
+    def __init__(self, sessions: async_sessionmaker = SessionLocal):
+        self.sessions = sessions
+
+    async def search(self, query: str, top_k: int = 5, filters: Filters | None = None,
+                     tenant_id: str = DEFAULT_TENANT) -> list[dict[str, Any]]:
+        """Return a tenant's best BM25 matches in the same shape as vector search results"""
+        match = build_match_query(query)
+        if match is None:
+            return []
+
+        clauses, params = _filter_clauses(filters or {})
+        where = "".join(f" AND {clause}" for clause in clauses)
+        try:
+            async with self.sessions() as db:
+                # The tenant and document fields live on the documents row, which
+                # is written once a document's ingestion completes
+                rows = (await db.execute(
+                    text(
+                        "SELECT document_chunks.embedding_id, document_chunks.document_id, document_chunks.chunk_text, "
+                        "document_chunks.chunk_metadata, bm25(chunk_fts) AS rank FROM chunk_fts "
+                        "JOIN document_chunks ON document_chunks.rowid = chunk_fts.rowid "
+                        "JOIN documents ON documents.id = document_chunks.document_id "
+                        f"WHERE chunk_fts MATCH :match AND documents.tenant_id = :tenant_id{where} "
+                        "ORDER BY rank LIMIT :limit"
+                    ),
+                    {"match": match, "limit": top_k, "tenant_id": tenant_id, **params}
+                )).all()
+        except Exception as e:
+            logger.error("Keyword search failed: %s", e)
+            return []
+
+        # bm25() is negative, with more relevant rows further below zero
+        results = []
+        for row in rows:
+            metadata = json.loads(row.chunk_metadata) if row.chunk_metadata else {}
+            results.append({
+                "id": row.embedding_id,
+                "text": row.chunk_text,
+                "score": -row.rank,
+                "chunk_metadata": {key: value for key, value in metadata.items() if key not in _ROW_ONLY_FIELDS},
+                "document_id": row.document_id
+            })
+        return results
@@ -0,0 +1,206 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Hashable
+
+import redis.asyncio as redis
+
+from app.models.database import DEFAULT_TENANT
+from app.utils.metrics import CACHE_REQUESTS_TOTAL, timed_dependency
+
+logger = logging.getLogger(__name__)
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 300))
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+
+
+def normalize_query(query: str) -> str:
+    """Collapse case and whitespace so trivially different phrasings share a cache entry"""
+    return " ".join(query.lower().split())
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with hit/miss counters, also exported as metrics under its name"""
+
+    def __init__(self, maxsize: int = QUERY_EMBEDDING_CACHE_SIZE, name: str = "lru"):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        # Bound once, so a lookup only pays for an increment
+        self._hit_counter = CACHE_REQUESTS_TOTAL.labels(name, "hit")
+        self._miss_counter = CACHE_REQUESTS_TOTAL.labels(name, "miss")
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            self._hit_counter.inc()
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+class SearchResultCache:
+    """Redis cache of top-k search results, shared by every worker.
+
+    Keys include a per-tenant collection version stored in Redis; bumping it
+    when new vectors are stored invalidates the tenant's cached results at
+    once, and the orphaned entries simply expire.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl: int = SEARCH_CACHE_TTL, enabled: bool = SEARCH_CACHE_ENABLED):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.enabled = enabled and ttl > 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._hit_counter = CACHE_REQUESTS_TOTAL.labels("search_results", "hit")
+        self._miss_counter = CACHE_REQUESTS_TOTAL.labels("search_results", "miss")
+        self._error_counter = CACHE_REQUESTS_TOTAL.labels("search_results", "error")
+
+    async def _collection_version(self, tenant_id: str) -> str:
+        return await self.redis_client.get(f"search_cache:version:{tenant_id}") or "0"
+
+    @staticmethod
+    def _entry_key(collection_version: str, query: str, top_k: int, vectorizer_version: str | None,
+                   filters: dict[str, Any] | None, tenant_id: str) -> str:
+        scope = json.dumps(filters, sort_keys=True) if filters else ""
+        digest = hashlib.sha1(f"{normalize_query(query)}\n{scope}".encode("utf-8")).hexdigest()
+        return f"search_cache:{tenant_id}:{collection_version}:{vectorizer_version}:{top_k}:{digest}"
+
+    async def _key(self, query: str, top_k: int, vectorizer_version: str | None, filters: dict[str, Any] | None,
+                   tenant_id: str) -> str:
+        collection_version = await self._collection_version(tenant_id)
+        return self._entry_key(collection_version, query, top_k, vectorizer_version, filters, tenant_id)
+
+    @timed_dependency("redis", "search_cache_get")
+    async def get(self, query: str, top_k: int, vectorizer_version: str | None, filters: dict[str, Any] | None = None,
+                  tenant_id: str = DEFAULT_TENANT) -> tuple[str | None, list[dict[str, Any]] | None]:
+        """Return the cache key and the cached results, or None on a miss"""
+        if not self.enabled:
+            return None, None
+        try:
+            key = await self._key(query, top_k, vectorizer_version, filters, tenant_id)
+            cached = await self.redis_client.get(key)
+        except Exception as e:
+            # A cache outage should only cost latency, never fail the query
+            self.errors += 1
+            self._error_counter.inc()
+            logger.warning("Search cache unavailable: %s", e)
+            return None, None
+
+        if cached is None:
+            self.misses += 1
+            self._miss_counter.inc()
+            return key, None
+        self.hits += 1
+        self._hit_counter.inc()
+        return key, json.loads(cached)
+
+    @timed_dependency("redis", "search_cache_put")
+    async def put(self, key: str | None, results: list[dict[str, Any]]):
+        if key is None:
+            return
+        try:
+            await self.redis_client.set(key, json.dumps(results), ex=self.ttl)
+        except Exception as e:
+            self.errors += 1
+            self._error_counter.inc()
+            logger.warning("Failed to cache search results: %s", e)
+
+    @timed_dependency("redis", "search_cache_get_many")
+    async def get_many(self, queries: list[str], top_k: int, vectorizer_version: str | None,
+                       filters: list[dict[str, Any] | None], tenant_id: str = DEFAULT_TENANT
+                       ) -> tuple[list[str | None], list[list[dict[str, Any]] | None]]:
+        """Look up several queries with one version read and one MGET"""
+        misses = [None] * len(queries)
+        if not self.enabled or not queries:
+            return misses, list(misses)
+        try:
+            collection_version = await self._collection_version(tenant_id)
+            keys = [
+                self._entry_key(collection_version, query, top_k, vectorizer_version, scope, tenant_id)
+                for query, scope in zip(queries, filters)
+            ]
+            cached = await self.redis_client.mget(keys)
+        except Exception as e:
+            self.errors += 1
+            self._error_counter.inc()
+            logger.warning("Search cache unavailable: %s", e)
+            return misses, list(misses)
+
+        hits = sum(value is not None for value in cached)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        self._hit_counter.inc(hits)
+        self._miss_counter.inc(len(keys) - hits)
+        return keys, [json.loads(value) if value is not None else None for value in cached]
+
+    @timed_dependency("redis", "search_cache_put_many")
+    async def put_many(self, entries: dict[str, list[dict[str, Any]]]):
+        """Cache several result lists in one pipelined round trip"""
+        if not entries:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, results in entries.items():
+                    pipe.set(key, json.dumps(results), ex=self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            self._error_counter.inc()
+            logger.warning("Failed to cache search results: %s", e)
+
+    @timed_dependency("redis", "search_cache_invalidate")
+    async def invalidate(self, tenant_id: str = DEFAULT_TENANT):
+        """Drop every cached result for a tenant after its collection changes"""
+        if not self.enabled:
+            return
+        try:
+            await self.redis_client.incr(f"search_cache:version:{tenant_id}")
+        except Exception as e:
+            self.errors += 1
+            self._error_counter.inc()
+            logger.warning("Failed to invalidate search cache: %s", e)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -1,15 +1,21 @@
-from typing import List, Dict, Any
+from typing import AsyncIterator, Iterator, List, Dict, Any
+import asyncio
 import os
-from app.services.embedding_service import EmbeddingService
+from app.services.search_service import SearchService
+from app.services.tenants import DEFAULT_TENANT
+from app.services.vector_store import Filters
 from app.services.chat_memory import ChatMemory
-from app.models.database import get_db, InterviewBooking as InterviewBookingModel
+from app.services.intent import BOOKING, GREETING, THANKS, detect_intents, extract_booking_info
+from app.models.database import session_scope, InterviewBooking as InterviewBookingModel
+from app.utils.metrics import stage, timed_stage
 import uuid
-import re
+
+CHAT_BATCH_MAX_QUERIES = int(os.getenv("CHAT_BATCH_MAX_QUERIES", 1000))
 
 class RAGService:
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.chat_memory = ChatMemory()
+    def __init__(self, search_service: SearchService, chat_memory: ChatMemory):
+        self.search_service = search_service
+        self.chat_memory = chat_memory
     
     def format_context(self, search_results: List[Dict[str, Any]]) -> str:
         """Format search results into context string"""
@@ -23,80 +29,45 @@ class RAGService:
     
     def generate_response_simple(self, query: str, context: str, chat_history: List[Dict[str, str]]) -> str:
         """Generate simple responses based on found documents"""
+        return "".join(self.iter_response_simple(query, context, chat_history))
+    
+    def iter_response_simple(self, query: str, context: str, chat_history: List[Dict[str, str]]) -> Iterator[str]:
+        """Yield the simple response in the pieces it is built from, so it can be streamed"""
         
-        if "hello" in query.lower() or "hi" in query.lower():
-            return "Hello! I'm your document assistant. I can help you search through your uploaded documents."
+        intents = detect_intents(query)
+        if GREETING in intents:
+            yield "Hello! I'm your document assistant. I can help you search through your uploaded documents."
+            return
         
-        if "thank" in query.lower():
-            return "You're welcome! Is there anything else you'd like to know about your documents?"
+        if THANKS in intents:
+            yield "You're welcome! Is there anything else you'd like to know about your documents?"
+            return
         
         if context and "No relevant documents" not in context:
-            # Found relevant documents
+            # Found relevant documents, one excerpt per piece
             doc_count = len(context.split('[Document')) - 1
-            return f"""I found {doc_count} relevant document(s) that match your query:
-
-{context[:800]}...
-
-This information was retrieved from your uploaded documents using semantic search."""
+            yield f"I found {doc_count} relevant document(s) that match your query:\n\n"
+            excerpt = context[:800]
+            start = 0
+            while start < len(excerpt):
+                end = excerpt.find("\n\n[Document", start + 1)
+                end = len(excerpt) if end == -1 else end
+                yield excerpt[start:end]
+                start = end
+            yield "...\n\nThis information was retrieved from your uploaded documents using semantic search."
         
         else:
             # No relevant documents found
-            return "I searched through your uploaded documents but didn't find specific information to answer your question. You might want to upload relevant documents or try rephrasing your question."
+            yield "I searched through your uploaded documents but didn't find specific information to answer your question. You might want to upload relevant documents or try rephrasing your question."
     
     def extract_booking_info(self, text: str) -> Dict[str, str]:
         """Extract interview booking information using pattern matching"""
-        booking_info = {}
-        
-        # Extract name
-        name_patterns = [
-            r'(?:name is|my name is|called)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
-            r'(?:with|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
-            r'([A-Z][a-z]+\s+[A-Z][a-z]+)(?:\s+for interview|\s+at|\s+on)'
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                booking_info['name'] = match.group(1).strip()
-                break
-        
-        # Extract email
-        email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', text)
-        if email_match:
-            booking_info['email'] = email_match.group(1)
-        
-        # Extract time
-        time_match = re.search(r'(\d{1,2}:\d{2}\s*(?:AM|PM)?)', text, re.IGNORECASE)
-        if time_match:
-            booking_info['time'] = time_match.group(1)
-        elif 'morning' in text.lower():
-            booking_info['time'] = '09:00 AM'
-        elif 'afternoon' in text.lower():
-            booking_info['time'] = '02:00 PM'
-        
-        # Extract date
-        if 'tomorrow' in text.lower():
-            from datetime import datetime, timedelta
-            tomorrow = datetime.now() + timedelta(days=1)
-            booking_info['date'] = tomorrow.strftime('%Y-%m-%d')
-        elif 'monday' in text.lower():
-            booking_info['date'] = 'next Monday'
-        elif 'tuesday' in text.lower():
-            booking_info['date'] = 'next Tuesday'
-        elif 'wednesday' in text.lower():
-            booking_info['date'] = 'next Wednesday'
-        elif 'thursday' in text.lower():
-            booking_info['date'] = 'next Thursday'
-        elif 'friday' in text.lower():
-            booking_info['date'] = 'next Friday'
-        
-        return booking_info
+        return extract_booking_info(text)
     
-    def store_booking(self, booking_info: Dict[str, str], session_id: str) -> str:
+    async def store_booking(self, booking_info: Dict[str, str], session_id: str) -> str:
         """Store booking information in database"""
-        db = get_db()
-        try:
-            booking_id = str(uuid.uuid4())
+        booking_id = str(uuid.uuid4())
+        async with session_scope() as db:
             booking = InterviewBookingModel(
                 id=booking_id,
                 name=booking_info.get("name", ""),
@@ -106,44 +77,138 @@ This information was retrieved from your uploaded documents using semantic searc
                 session_id=session_id
             )
             db.add(booking)
-            db.commit()
-            return booking_id
-        except Exception as e:
-            db.rollback()
-            raise e
-        finally:
-            db.close()
+        return booking_id
     
-    def process_query(self, query: str, session_id: str) -> Dict[str, Any]:
-        """Process user query with RAG"""
-        
-        # Get chat history from Redis
-        chat_history = self.chat_memory.get_messages(session_id)
-        
-        # Search for relevant documents
-        search_results = self.embedding_service.search_similar(query, top_k=3)
-        
-        # Generate response
-        context = self.format_context(search_results)
-        response = self.generate_response_simple(query, context, chat_history)
-        
-        # Handle interview booking
+    @staticmethod
+    def memory_key(session_id: str, tenant_id: str = DEFAULT_TENANT) -> str:
+        # Session IDs are chosen by clients, so other tenants' sessions get their own namespace
+        return session_id if tenant_id == DEFAULT_TENANT else f"{tenant_id}:{session_id}"
+    
+    @staticmethod
+    def format_sources(search_results: List[Dict[str, Any]]) -> List[str]:
+        return [f"Document (relevance: {result['score']:.3f})" for result in search_results]
+    
+    async def _book_interview(self, query: str, session_id: str) -> tuple[Dict[str, str] | None, str | None, str]:
+        """Book an interview if the query asks for one, returning the booking and the confirmation to append"""
         booking_info = None
         booking_id = None
+        confirmation = ""
+        
+        if BOOKING in detect_intents(query):
+            with stage("chat", "booking"):
+                # Date resolution may import dateparser, which is too slow for the event loop
+                booking_info = await asyncio.to_thread(self.extract_booking_info, query)
+                if booking_info and booking_info.get('name') and booking_info.get('email'):
+                    booking_id = await self.store_booking(booking_info, session_id)
+                    confirmation = f"\n\n✅ Interview scheduled for {booking_info.get('name')} at {booking_info.get('time', 'a suitable time')}. Confirmation sent to {booking_info.get('email')}."
+        return booking_info, booking_id, confirmation
+    
+    async def _answer(self, query: str, session_id: str, search_results: List[Dict[str, Any]],
+                      chat_history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Build the reply to one query from its search results, booking an interview if asked to"""
+        # Generate response
+        with stage("chat", "generate"):
+            context = self.format_context(search_results)
+            response = self.generate_response_simple(query, context, chat_history)
         
-        if any(keyword in query.lower() for keyword in ['schedule', 'book', 'interview', 'meeting', 'appointment']):
-            booking_info = self.extract_booking_info(query)
-            if booking_info and booking_info.get('name') and booking_info.get('email'):
-                booking_id = self.store_booking(booking_info, session_id)
-                response += f"\n\n✅ Interview scheduled for {booking_info.get('name')} at {booking_info.get('time', 'a suitable time')}. Confirmation sent to {booking_info.get('email')}."
-        
-        # Update chat memory
-        self.chat_memory.add_message(session_id, {"role": "user", "content": query})
-        self.chat_memory.add_message(session_id, {"role": "assistant", "content": response})
+        # Handle interview booking
+        booking_info, booking_id, confirmation = await self._book_interview(query, session_id)
         
         return {
-            "response": response,
-            "sources": [f"Document (relevance: {result['score']:.3f})" for result in search_results],
+            "response": response + confirmation,
+            "sources": self.format_sources(search_results),
             "booking_info": booking_info,
             "booking_id": booking_id
-        }
\ No newline at end of file
+        }
+    
+    async def prepare_query(self, query: str, session_id: str, search_mode: str | None = None,
+                            filters: Filters | None = None, tenant_id: str = DEFAULT_TENANT) -> Dict[str, Any]:
+        """Fetch a query's chat history and search results, everything needed before its reply can start"""
+        memory_key = self.memory_key(session_id, tenant_id)
+        chat_history, search_results = await asyncio.gather(
+            timed_stage("chat", "history", self.chat_memory.get_messages(memory_key)),
+            timed_stage("chat", "search", self.search_service.search(
+                query, top_k=3, mode=search_mode, filters=filters, tenant_id=tenant_id
+            ))
+        )
+        return {
+            "query": query,
+            "session_id": session_id,
+            "memory_key": memory_key,
+            "chat_history": chat_history,
+            "search_results": search_results,
+            "sources": self.format_sources(search_results),
+            "response": "",
+            "booking_info": None,
+            "booking_id": None,
+            "complete": False
+        }
+    
+    async def stream_answer(self, prepared: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield the reply to a prepared query piece by piece, collecting it in prepared as it goes"""
+        context = self.format_context(prepared["search_results"])
+        for part in self.iter_response_simple(prepared["query"], context, prepared["chat_history"]):
+            prepared["response"] += part
+            yield part
+        
+        booking_info, booking_id, confirmation = await self._book_interview(prepared["query"], prepared["session_id"])
+        if confirmation:
+            prepared["response"] += confirmation
+            yield confirmation
+        prepared.update(booking_info=booking_info, booking_id=booking_id, complete=True)
+    
+    async def remember(self, prepared: Dict[str, Any]):
+        """Store a streamed exchange in chat memory; replies the client did not receive in full are left out"""
+        if not prepared["complete"]:
+            return
+        with stage("chat", "remember"):
+            await self.chat_memory.add_turn(prepared["memory_key"], [
+                {"role": "user", "content": prepared["query"]},
+                {"role": "assistant", "content": prepared["response"]}
+            ])
+    
+    async def process_query(self, query: str, session_id: str, search_mode: str | None = None,
+                            filters: Filters | None = None, tenant_id: str = DEFAULT_TENANT) -> Dict[str, Any]:
+        """Process user query with RAG"""
+        # Get chat history from Redis while searching for relevant documents
+        prepared = await self.prepare_query(query, session_id, search_mode, filters, tenant_id)
+        
+        result = await self._answer(query, session_id, prepared["search_results"], prepared["chat_history"])
+        
+        # Update chat memory
+        with stage("chat", "remember"):
+            await self.chat_memory.add_turn(prepared["memory_key"], [
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": result["response"]}
+            ])
+        
+        return result
+    
+    async def process_batch(self, queries: List[tuple[str, str]], search_mode: str | None = None,
+                            filters: Filters | None = None, tenant_id: str = DEFAULT_TENANT) -> List[Dict[str, Any]]:
+        """Process many (session_id, query) pairs with one history read, one batched search and one history write.
+        
+        Every query sees its session's history as it was before the batch, and results come back in order.
+        """
+        if not queries:
+            return []
+        memory_keys = [self.memory_key(session_id, tenant_id) for session_id, _ in queries]
+        texts = [query for _, query in queries]
+        
+        histories, search_batches = await asyncio.gather(
+            timed_stage("chat_batch", "history", self.chat_memory.get_many(memory_keys)),
+            timed_stage("chat_batch", "search", self.search_service.search_batch(
+                texts, top_k=3, mode=search_mode, filters=[filters] * len(texts), tenant_id=tenant_id
+            ))
+        )
+        
+        results = []
+        for (session_id, query), search_results, chat_history in zip(queries, search_batches, histories):
+            results.append(await self._answer(query, session_id, search_results, chat_history))
+        
+        with stage("chat_batch", "remember"):
+            await self.chat_memory.add_many([
+                (memory_key, [{"role": "user", "content": query}, {"role": "assistant", "content": result["response"]}])
+                for memory_key, query, result in zip(memory_keys, texts, results)
+            ])
+        return results
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import re
+import time
+from typing import Any
+
+import numpy as np
+
+from app.utils.metrics import RERANK_FALLBACKS_TOTAL, stage
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 50))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 25))
+RERANK_MAX_TOKENS = int(os.getenv("RERANK_MAX_TOKENS", 256))
+RERANK_BM25_WEIGHT = float(os.getenv("RERANK_BM25_WEIGHT", 0.5))
+RERANK_PROXIMITY_WEIGHT = float(os.getenv("RERANK_PROXIMITY_WEIGHT", 0.2))
+RERANK_FIRST_STAGE_WEIGHT = float(os.getenv("RERANK_FIRST_STAGE_WEIGHT", 0.3))
+RERANK_MMR_LAMBDA = float(os.getenv("RERANK_MMR_LAMBDA", 0.7))
+RERANK_DUPLICATE_SIMILARITY = float(os.getenv("RERANK_DUPLICATE_SIMILARITY", 0.9))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_term_re = re.compile(r"\w+")
+
+class Reranker:
+    """Second retrieval stage: reorder a search's candidates on the CPU, without a model.
+
+    Each candidate is scored by BM25 computed over the candidate set, by how close
+    together the query's terms appear in it, and by its first-stage rank. Maximal
+    marginal relevance then picks the final results, passing over candidates whose
+    terms mostly repeat an already chosen one, such as overlapping chunks. If the
+    work outlasts the latency budget, the first-stage order is kept.
+    """
+
+    def __init__(self, candidates: int = RERANK_CANDIDATES, budget_ms: float = RERANK_BUDGET_MS,
+                 max_tokens: int = RERANK_MAX_TOKENS, bm25_weight: float = RERANK_BM25_WEIGHT,
+                 proximity_weight: float = RERANK_PROXIMITY_WEIGHT,
+                 first_stage_weight: float = RERANK_FIRST_STAGE_WEIGHT, mmr_lambda: float = RERANK_MMR_LAMBDA,
+                 duplicate_similarity: float = RERANK_DUPLICATE_SIMILARITY):
+        self.candidates = candidates
+        self.budget = budget_ms / 1000
+        self.max_tokens = max_tokens
+        self.weights = (bm25_weight, proximity_weight, first_stage_weight)
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_similarity = duplicate_similarity
+
+    def rerank(self, query: str, results: list[dict[str, Any]], top_k: int) -> list[dict[str, Any]]:
+        """The best top_k of the candidates, each with its rerank_score"""
+        if len(results) < 2:
+            return results[:top_k]
+        with stage("search", "rerank"):
+            ranked = self._rank(query, results, top_k, time.perf_counter() + self.budget)
+        if ranked is None:
+            RERANK_FALLBACKS_TOTAL.inc()
+            return results[:top_k]
+        order, scores = ranked
+        return [{**results[i], "rerank_score": score} for i, score in zip(order, scores)]
+
+    def _rank(self, query: str, results: list[dict[str, Any]], top_k: int,
+              deadline: float) -> tuple[list[int], list[float]] | None:
+        """Chosen candidate indexes and their relevance, or None once the deadline has passed"""
+        count = len(results)
+        # Query terms take the first term IDs, so their columns are [:len(query_terms)]
+        query_terms = list(dict.fromkeys(term for term in _term_re.findall(query.lower()) if len(term) > 1))
+        vocabulary = {term: i for i, term in enumerate(query_terms)}
+        term_ids = []
+        lengths = np.empty(count, dtype=np.int64)
+        for i, result in enumerate(results):
+            tokens = _term_re.findall(result["text"].lower())[:self.max_tokens]
+            term_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            lengths[i] = len(tokens)
+            if time.perf_counter() > deadline:
+                return None
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        documents = np.repeat(np.arange(count), lengths)
+        positions = np.arange(len(terms)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        vocabulary_size = max(len(vocabulary), 1)
+        term_counts = np.bincount(documents * vocabulary_size + terms, minlength=count * vocabulary_size)
+        term_counts = term_counts.reshape(count, vocabulary_size).astype(np.float32)
+
+        bm25 = np.zeros(count, dtype=np.float32)
+        proximity = np.zeros(count, dtype=np.float32)
+        query_size = len(query_terms)
+        if query_size:
+            # BM25 with document frequencies taken from the candidates themselves
+            tf = term_counts[:, :query_size]
+            df = (tf > 0).sum(axis=0)
+            idf = np.log1p((count - df + 0.5) / (df + 0.5))
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1))
+            bm25 = (idf * tf * (BM25_K1 + 1) / (tf + length_norm[:, None])).sum(axis=1)
+
+            # The closest two different query terms are always neighbours among the query-term occurrences
+            matched = terms < query_size
+            matched_documents, matched_positions, matched_terms = documents[matched], positions[matched], terms[matched]
+            pairs = (matched_documents[1:] == matched_documents[:-1]) & (matched_terms[1:] != matched_terms[:-1])
+            gaps = np.full(count, np.inf)
+            np.minimum.at(gaps, matched_documents[1:][pairs], matched_positions[1:][pairs] - matched_positions[:-1][pairs])
+            proximity = (1 / gaps).astype(np.float32)
+
+        bm25_weight, proximity_weight, first_stage_weight = self.weights
+        relevance = (
+            bm25_weight * bm25 / max(bm25.max(), 1e-9)
+            + proximity_weight * proximity
+            + first_stage_weight * (1 - np.arange(count) / count)
+        )
+        if time.perf_counter() > deadline:
+            return None
+
+        norms = np.linalg.norm(term_counts, axis=1, keepdims=True)
+        unit = term_counts / np.maximum(norms, 1e-9)
+        similarity = unit @ unit.T
+
+        chosen = []
+        available = np.ones(count, dtype=bool)
+        redundancy = np.zeros(count, dtype=np.float32)
+        for _ in range(min(top_k, count)):
+            if time.perf_counter() > deadline:
+                return None
+            # Near-duplicates of a chosen candidate are only taken once nothing else is left
+            eligible = available & (redundancy < self.duplicate_similarity)
+            if not eligible.any():
+                eligible = available
+            marginal = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(np.where(eligible, marginal, -np.inf)))
+            chosen.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, similarity[best])
+        return chosen, relevance[chosen].tolist()
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timezone
+import os
+from typing import Any
+
+from app.services.embedding_service import EmbeddingService
+from app.services.keyword_index import KeywordIndex
+from app.services.reranker import Reranker
+from app.services.tenants import DEFAULT_TENANT
+from app.services.vector_store import Filters
+
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")  # vector, keyword or hybrid
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+def reciprocal_rank_fusion(result_lists: list[list[dict[str, Any]]], top_k: int, k: int = RRF_K) -> list[dict[str, Any]]:
+    """Merge ranked lists by summing 1 / (k + rank) for every list a chunk appears in"""
+    fused = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = result.get("id") or (result["document_id"], result["text"])
+            entry = fused.setdefault(key, {**result, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda result: result["score"], reverse=True)[:top_k]
+
+def _timestamp(moment: datetime) -> float:
+    # Naive datetimes are taken as UTC, like the stored upload times
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+def payload_filters(document_ids: list[str] | None = None, filename: str | None = None,
+                    chunking_strategy: str | None = None, uploaded_after: datetime | None = None,
+                    uploaded_before: datetime | None = None) -> Filters | None:
+    """Translate search scope options into payload filters understood by the stores and the keyword index"""
+    filters = {}
+    if document_ids is not None:
+        filters["document_id"] = list(document_ids)
+    if filename is not None:
+        filters["filename"] = filename
+    if chunking_strategy is not None:
+        filters["chunking_strategy"] = chunking_strategy
+    uploaded_at = {}
+    if uploaded_after is not None:
+        uploaded_at["gte"] = _timestamp(uploaded_after)
+    if uploaded_before is not None:
+        uploaded_at["lte"] = _timestamp(uploaded_before)
+    if uploaded_at:
+        filters["uploaded_at"] = uploaded_at
+    return filters or None
+
+class SearchService:
+    """Chooses between vector, BM25 keyword and hybrid retrieval per query"""
+
+    def __init__(self, embedding_service: EmbeddingService, keyword_index: KeywordIndex,
+                 reranker: Reranker | None = None):
+        self.embedding_service = embedding_service
+        self.keyword_index = keyword_index
+        self.reranker = reranker
+
+    async def search(self, query: str, top_k: int = 5, mode: str | None = None,
+                     filters: Filters | None = None, tenant_id: str = DEFAULT_TENANT) -> list[dict[str, Any]]:
+        if self.reranker is None:
+            return await self._retrieve(query, top_k, mode, filters, tenant_id)
+        # The reranker's work is bounded by its latency budget, so it runs on the event loop
+        candidates = await self._retrieve(query, max(top_k, self.reranker.candidates), mode, filters, tenant_id)
+        return self.reranker.rerank(query, candidates, top_k)
+
+    async def search_batch(self, queries: list[str], top_k: int = 5, mode: str | None = None,
+                           filters: list[Filters | None] | None = None,
+                           tenant_id: str = DEFAULT_TENANT) -> list[list[dict[str, Any]]]:
+        """Search for many queries at once; vector searches share one embedding call and one store call"""
+        if self.reranker is None:
+            return await self._retrieve_batch(queries, top_k, mode, filters, tenant_id)
+        batches = await self._retrieve_batch(queries, max(top_k, self.reranker.candidates), mode, filters, tenant_id)
+        # A batch can hold up to CHAT_BATCH_MAX_QUERIES budgets' worth of reranking, too long to hold the event loop
+        return await asyncio.to_thread(lambda: [
+            self.reranker.rerank(query, candidates, top_k) for query, candidates in zip(queries, batches)
+        ])
+
+    async def _retrieve(self, query: str, top_k: int, mode: str | None, filters: Filters | None,
+                        tenant_id: str) -> list[dict[str, Any]]:
+        mode = mode or SEARCH_MODE
+        if mode == "keyword":
+            return await self.keyword_index.search(query, top_k, filters, tenant_id)
+        if mode == "hybrid":
+            # Both searches fetch a deeper candidate list so fusion can promote
+            # chunks that rank well in one and only moderately in the other
+            candidates = max(top_k, HYBRID_CANDIDATES)
+            vector_results, keyword_results = await asyncio.gather(
+                self.embedding_service.search_similar(query, candidates, filters, tenant_id),
+                self.keyword_index.search(query, candidates, filters, tenant_id)
+            )
+            return reciprocal_rank_fusion([vector_results, keyword_results], top_k)
+        return await self.embedding_service.search_similar(query, top_k, filters, tenant_id)
+
+    async def _retrieve_batch(self, queries: list[str], top_k: int, mode: str | None,
+                              filters: list[Filters | None] | None, tenant_id: str) -> list[list[dict[str, Any]]]:
+        mode = mode or SEARCH_MODE
+        filters = filters or [None] * len(queries)
+
+        async def keyword_searches(limit: int) -> list[list[dict[str, Any]]]:
+            return list(await asyncio.gather(*(
+                self.keyword_index.search(query, limit, scope, tenant_id) for query, scope in zip(queries, filters)
+            )))
+
+        if mode == "keyword":
+            return await keyword_searches(top_k)
+        if mode == "hybrid":
+            candidates = max(top_k, HYBRID_CANDIDATES)
+            vector_batches, keyword_batches = await asyncio.gather(
+                self.embedding_service.search_similar_batch(queries, candidates, filters, tenant_id),
+                keyword_searches(candidates)
+            )
+            return [
+                reciprocal_rank_fusion([vector_results, keyword_results], top_k)
+                for vector_results, keyword_results in zip(vector_batches, keyword_batches)
+            ]
+        return await self.embedding_service.search_similar_batch(queries, top_k, filters, tenant_id)
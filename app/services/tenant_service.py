@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import os
+from typing import Any
+
+from sqlalchemy import select, update, delete, func
+
+from app.models.database import SessionLocal, session_scope, Document, DocumentChunk, IngestionJob
+from app.services.embedding_service import EmbeddingService
+from app.services.tenants import DEFAULT_TENANT, IngestionRateLimiter, TenantQuotaError, collection_name
+
+logger = logging.getLogger(__name__)
+
+class TenantService:
+    """Per-tenant quotas, usage reporting and teardown"""
+
+    def __init__(self, embedding_service: EmbeddingService, rate_limiter: IngestionRateLimiter):
+        self.embedding_service = embedding_service
+        self.rate_limiter = rate_limiter
+
+    async def check_upload(self, tenant_id: str, file_size: int):
+        """Reject an upload when the tenant is over its upload rate or already at its vector quota"""
+        max_points = self.embedding_service.max_points
+        if max_points > 0:
+            # A tenant without a collection has no vectors; checking must not create one
+            vector_store = await self.embedding_service.get_vector_store(tenant_id, create=False)
+            if vector_store is not None and await vector_store.count() >= max_points:
+                raise TenantQuotaError(f"Tenant {tenant_id} has reached its quota of {max_points} vectors")
+        await self.rate_limiter.acquire(tenant_id, file_size)
+
+    async def known_tenants(self) -> list[str]:
+        async with SessionLocal() as db:
+            return list((await db.execute(select(Document.tenant_id).distinct())).scalars())
+
+    async def open_collections(self):
+        """Open every tenant's collection so background re-embedding covers them all"""
+        for tenant_id in await self.known_tenants():
+            await self.embedding_service.get_vector_store(tenant_id)
+
+    async def usage(self, tenant_id: str) -> dict[str, Any]:
+        async with SessionLocal() as db:
+            documents = await db.scalar(select(func.count()).select_from(Document).where(Document.tenant_id == tenant_id))
+            chunks = await db.scalar(
+                select(func.count()).select_from(DocumentChunk).where(DocumentChunk.tenant_id == tenant_id)
+            )
+        vectors = None
+        if tenant_id in self.embedding_service.tenant_stores:
+            vectors = await self.embedding_service.tenant_stores[tenant_id].count()
+        return {
+            "tenant_id": tenant_id,
+            "collection": collection_name(tenant_id),
+            "documents": documents,
+            "chunks": chunks,
+            "vectors": vectors,
+            "max_vectors": self.embedding_service.max_points or None
+        }
+
+    async def drop(self, tenant_id: str) -> dict[str, Any]:
+        """Delete a tenant's collection, rows, keyword postings, queued and running jobs and uploaded files"""
+        if tenant_id == DEFAULT_TENANT:
+            # Its collection is the one the embedding service opened at startup and keeps using
+            raise ValueError("The default tenant cannot be dropped")
+        async with session_scope() as db:
+            # Pending jobs would otherwise recreate the collection after it is dropped; a running
+            # job sees its row is no longer running at its next stage and discards what it stored
+            pending = (IngestionJob.tenant_id == tenant_id, IngestionJob.status.in_(("queued", "running")))
+            cancelled = (await db.execute(select(IngestionJob.file_path).where(*pending))).scalars().all()
+            await db.execute(
+                update(IngestionJob).where(*pending).values(status="failed", stage="failed", error="Tenant was dropped")
+            )
+            file_paths = (await db.execute(select(Document.file_path).where(Document.tenant_id == tenant_id))).scalars().all()
+            chunks = await db.execute(delete(DocumentChunk).where(DocumentChunk.tenant_id == tenant_id))
+            documents = await db.execute(delete(Document).where(Document.tenant_id == tenant_id))
+
+        await self.embedding_service.drop_tenant(tenant_id)
+        await asyncio.to_thread(_remove_files, [*cancelled, *file_paths])
+        logger.info("Dropped tenant %s: %d documents, %d chunks", tenant_id, documents.rowcount, chunks.rowcount)
+        return {
+            "tenant_id": tenant_id,
+            "documents": documents.rowcount,
+            "chunks": chunks.rowcount,
+            "cancelled_jobs": len(cancelled)
+        }
+
+def _remove_files(paths: list[str | None]):
+    for path in paths:
+        try:
+            if path:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
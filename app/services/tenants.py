@@ -0,0 +1,70 @@
+import os
+import re
+
+import redis.asyncio as redis
+
+from app.models.database import DEFAULT_TENANT
+from app.services.vector_store import COLLECTION_NAME
+from app.utils.metrics import dependency
+
+TENANT_MAX_POINTS = int(os.getenv("TENANT_MAX_POINTS", 0))  # 0 disables the quota
+TENANT_UPLOADS_PER_MINUTE = int(os.getenv("TENANT_UPLOADS_PER_MINUTE", 0))
+TENANT_UPLOAD_BYTES_PER_MINUTE = int(os.getenv("TENANT_UPLOAD_BYTES_PER_MINUTE", 0))
+
+_tenant_id_re = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class TenantQuotaError(Exception):
+    """Raised when a tenant is over its point or ingestion-rate quota"""
+
+    def __init__(self, message: str, retry_after: int | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def validate_tenant_id(tenant_id: str) -> str:
+    # Tenant IDs become part of collection names and directory names
+    if not _tenant_id_re.match(tenant_id):
+        raise ValueError("Tenant ID must be 1-64 letters, digits, '-' or '_'")
+    return tenant_id
+
+def collection_name(tenant_id: str) -> str:
+    """The default tenant keeps the original collection, so existing vectors stay in place"""
+    if tenant_id == DEFAULT_TENANT:
+        return COLLECTION_NAME
+    return f"{COLLECTION_NAME}_{tenant_id}"
+
+class IngestionRateLimiter:
+    """Per-tenant fixed-window limits on uploads and uploaded bytes per minute, shared through Redis"""
+
+    def __init__(self, redis_client: redis.Redis, uploads_per_minute: int = TENANT_UPLOADS_PER_MINUTE,
+                 bytes_per_minute: int = TENANT_UPLOAD_BYTES_PER_MINUTE):
+        self.redis_client = redis_client
+        self.uploads_per_minute = uploads_per_minute
+        self.bytes_per_minute = bytes_per_minute
+
+    async def acquire(self, tenant_id: str, file_size: int):
+        """Count an upload against the tenant's current window, raising if it goes over a limit"""
+        if self.uploads_per_minute <= 0 and self.bytes_per_minute <= 0:
+            return
+
+        uploads_key = f"tenant_rate:{tenant_id}:uploads"
+        bytes_key = f"tenant_rate:{tenant_id}:bytes"
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            # SET NX starts a window with its expiry; INCR keeps the existing TTL
+            pipe.set(uploads_key, 0, ex=60, nx=True)
+            pipe.set(bytes_key, 0, ex=60, nx=True)
+            pipe.incr(uploads_key)
+            pipe.incrby(bytes_key, file_size)
+            pipe.ttl(uploads_key)
+            with dependency("redis", "rate_limit"):
+                _, _, uploads, uploaded_bytes, ttl = await pipe.execute()
+
+        over_uploads = 0 < self.uploads_per_minute < uploads
+        over_bytes = 0 < self.bytes_per_minute < uploaded_bytes
+        if over_uploads or over_bytes:
+            # A rejected upload should not use up the window
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.decr(uploads_key)
+                pipe.decrby(bytes_key, file_size)
+                await pipe.execute()
+            limit = f"{self.uploads_per_minute} uploads" if over_uploads else f"{self.bytes_per_minute} bytes"
+            raise TenantQuotaError(f"Tenant {tenant_id} is limited to {limit} per minute", retry_after=max(1, ttl))
@@ -0,0 +1,816 @@
+import asyncio
+from functools import cached_property
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+from typing import Any, Iterable, TYPE_CHECKING
+
+import numpy as np
+
+from app.utils.metrics import timed_dependency
+
+# qdrant_client takes seconds to import, so it is only loaded inside the
+# Qdrant store's methods once a client exists
+if TYPE_CHECKING:
+    from qdrant_client import AsyncQdrantClient
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant")
+COLLECTION_NAME = "documents"
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vector_store")
+LOCAL_VECTOR_INDEX = os.getenv("LOCAL_VECTOR_INDEX", "exact")  # exact, ivf or hnsw
+LOCAL_ANN_MIN_VECTORS = int(os.getenv("LOCAL_ANN_MIN_VECTORS", 20000))
+LOCAL_IVF_PROBES = int(os.getenv("LOCAL_IVF_PROBES", 8))
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")  # none, scalar (int8) or product (Qdrant only)
+VECTOR_ON_DISK = os.getenv("VECTOR_ON_DISK", "false").lower() == "true"
+QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "true").lower() == "true"
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", 2.0))
+
+# Rows decoded from int8 at a time, which bounds the float32 scratch space of a quantized scan
+_QUANTIZED_BLOCK = 16384
+
+# Points are dicts with "id", "vector" and "payload"; search hits add a "score".
+# Filters map payload fields to a value they must equal, a list of values they
+# must equal one of, or a range such as {"gte": 1, "lt": 2}.
+Point = dict[str, Any]
+Filters = dict[str, Any]
+
+# Payload fields searches and deletes filter on, indexed by both stores
+INDEXED_PAYLOAD_FIELDS = {
+    "vectorizer_version": "keyword",
+    "document_id": "keyword",
+    "filename": "keyword",
+    "chunking_strategy": "keyword",
+    "uploaded_at": "float"
+}
+_RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+def _in_range(value: Any, bounds: dict[str, Any]) -> bool:
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    return (("gt" not in bounds or value > bounds["gt"]) and ("gte" not in bounds or value >= bounds["gte"])
+            and ("lt" not in bounds or value < bounds["lt"]) and ("lte" not in bounds or value <= bounds["lte"]))
+
+class VectorStore:
+    """Interface shared by the Qdrant and in-process vector stores"""
+
+    def for_collection(self, collection_name: str) -> "VectorStore":
+        """A store of the same kind for another collection, sharing this one's connection"""
+        raise NotImplementedError
+
+    async def ensure_collection(self, vector_size: int):
+        raise NotImplementedError
+
+    async def upsert(self, points: list[Point]):
+        """Insert or replace points, raising if they were not stored"""
+        raise NotImplementedError
+
+    async def search(self, vector: Iterable[float], limit: int, filters: Filters | None = None) -> list[Point]:
+        """Return the closest points by cosine similarity, best first"""
+        raise NotImplementedError
+
+    async def search_batch(self, vectors: Iterable[Iterable[float]], limit: int,
+                           filters: list[Filters | None] | None = None) -> list[list[Point]]:
+        """Run several searches in one call, returning one result list per vector in order"""
+        vectors = list(vectors)
+        filters = filters or [None] * len(vectors)
+        return [await self.search(vector, limit, scope) for vector, scope in zip(vectors, filters)]
+
+    async def scroll(self, limit: int, exclude: Filters | None = None) -> list[Point]:
+        """Return up to limit points (without vectors) that match none of the exclude conditions"""
+        raise NotImplementedError
+
+    async def set_payload(self, payloads: dict[str, dict[str, Any]]):
+        """Merge fields into the payloads of existing points, keyed by point ID"""
+        raise NotImplementedError
+
+    async def delete(self, point_ids: list[str]):
+        raise NotImplementedError
+
+    async def delete_by_document(self, document_id: str):
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    async def drop(self):
+        """Delete the whole collection"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class QdrantVectorStore(VectorStore):
+    """Vector store backed by a Qdrant collection.
+
+    New collections can quantize their vectors (int8 scalar or product codes kept in
+    RAM) and keep the original vectors and payloads on disk; searches then rank by
+    the codes and rescore the best candidates with the original vectors.
+    """
+
+    def __init__(self, client: "AsyncQdrantClient", collection_name: str = COLLECTION_NAME, owns_client: bool = True,
+                 quantization: str = VECTOR_QUANTIZATION, on_disk: bool = VECTOR_ON_DISK):
+        if quantization not in ("none", "scalar", "product"):
+            raise ValueError(f"Unknown vector quantization: {quantization}")
+        self.client = client
+        self.collection_name = collection_name
+        self.owns_client = owns_client
+        self.quantization = quantization
+        self.on_disk = on_disk
+
+    def for_collection(self, collection_name: str) -> "QdrantVectorStore":
+        return QdrantVectorStore(self.client, collection_name, owns_client=False,
+                                 quantization=self.quantization, on_disk=self.on_disk)
+
+    def _quantization_config(self):
+        from qdrant_client import models
+
+        if self.quantization == "scalar":
+            # A quarter of the float32 size; the quantile keeps outliers from stretching the int8 range
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "product":
+            return models.ProductQuantization(
+                product=models.ProductQuantizationConfig(compression=models.CompressionRatio.X16, always_ram=True)
+            )
+        return None
+
+    @cached_property
+    def _search_params(self):
+        from qdrant_client import models
+
+        if self.quantization == "none":
+            return None
+        return models.SearchParams(quantization=models.QuantizationSearchParams(
+            rescore=QUANTIZATION_RESCORE, oversampling=QUANTIZATION_OVERSAMPLING
+        ))
+
+    @staticmethod
+    def _filter(must: Filters | None = None, must_not: Filters | None = None):
+        from qdrant_client import models
+
+        def condition(key: str, value: Any):
+            if isinstance(value, dict):
+                return models.FieldCondition(key=key, range=models.Range(**value))
+            if isinstance(value, (list, tuple, set)):
+                return models.FieldCondition(key=key, match=models.MatchAny(any=list(value)))
+            return models.FieldCondition(key=key, match=models.MatchValue(value=value))
+
+        def conditions(filters: Filters | None):
+            return [condition(key, value) for key, value in (filters or {}).items()] or None
+
+        if not must and not must_not:
+            return None
+        return models.Filter(must=conditions(must), must_not=conditions(must_not))
+
+    async def ensure_collection(self, vector_size: int):
+        """Ensure the documents collection exists; storage settings apply when it is created"""
+        from qdrant_client import models
+
+        try:
+            await self.client.get_collection(self.collection_name)
+            logger.debug("Collection %s exists", self.collection_name)
+        except Exception:
+            logger.info("Creating collection %s", self.collection_name)
+            await self.client.create_collection(
+                collection_name=self.collection_name,
+                # None leaves the server's defaults in place
+                vectors_config=models.VectorParams(
+                    size=vector_size, distance=models.Distance.COSINE, on_disk=self.on_disk or None
+                ),
+                on_disk_payload=self.on_disk or None,
+                quantization_config=self._quantization_config()
+            )
+            logger.info("Created collection %s", self.collection_name)
+
+        # Lets filtered searches, stale-vector scans and document deletes skip non-matching points
+        schemas = {"keyword": models.PayloadSchemaType.KEYWORD, "float": models.PayloadSchemaType.FLOAT}
+        for field_name, schema in INDEXED_PAYLOAD_FIELDS.items():
+            await self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=schemas[schema]
+            )
+
+    @timed_dependency("qdrant", "upsert")
+    async def upsert(self, points: list[Point]):
+        from qdrant_client import models
+
+        await self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                models.PointStruct(id=point["id"], vector=np.asarray(point["vector"]).tolist(), payload=point["payload"])
+                for point in points
+            ],
+            wait=True
+        )
+
+    @timed_dependency("qdrant", "search")
+    async def search(self, vector: Iterable[float], limit: int, filters: Filters | None = None) -> list[Point]:
+        results = await self.client.search(
+            collection_name=self.collection_name,
+            query_vector=np.asarray(vector).tolist(),
+            query_filter=self._filter(must=filters),
+            search_params=self._search_params,
+            limit=limit
+        )
+        return [{"id": result.id, "score": result.score, "payload": result.payload} for result in results]
+
+    @timed_dependency("qdrant", "search_batch")
+    async def search_batch(self, vectors: Iterable[Iterable[float]], limit: int,
+                           filters: list[Filters | None] | None = None) -> list[list[Point]]:
+        from qdrant_client import models
+
+        vectors = list(vectors)
+        if not vectors:
+            return []
+        filters = filters or [None] * len(vectors)
+        batches = await self.client.search_batch(
+            collection_name=self.collection_name,
+            requests=[
+                models.SearchRequest(
+                    vector=np.asarray(vector).tolist(), filter=self._filter(must=scope), params=self._search_params,
+                    limit=limit, with_payload=True
+                )
+                for vector, scope in zip(vectors, filters)
+            ]
+        )
+        return [
+            [{"id": result.id, "score": result.score, "payload": result.payload} for result in results]
+            for results in batches
+        ]
+
+    @timed_dependency("qdrant", "scroll")
+    async def scroll(self, limit: int, exclude: Filters | None = None) -> list[Point]:
+        records, _ = await self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=self._filter(must_not=exclude),
+            limit=limit,
+            with_payload=True,
+            with_vectors=False
+        )
+        return [{"id": record.id, "payload": record.payload} for record in records]
+
+    @timed_dependency("qdrant", "set_payload")
+    async def set_payload(self, payloads: dict[str, dict[str, Any]]):
+        from qdrant_client import models
+
+        if not payloads:
+            return
+        await self.client.batch_update_points(
+            collection_name=self.collection_name,
+            update_operations=[
+                models.SetPayloadOperation(set_payload=models.SetPayload(payload=payload, points=[point_id]))
+                for point_id, payload in payloads.items()
+            ]
+        )
+
+    @timed_dependency("qdrant", "delete")
+    async def delete(self, point_ids: list[str]):
+        from qdrant_client import models
+
+        await self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=point_ids)
+        )
+
+    @timed_dependency("qdrant", "delete_by_document")
+    async def delete_by_document(self, document_id: str):
+        from qdrant_client import models
+
+        await self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=self._filter(must={"document_id": document_id}))
+        )
+
+    @timed_dependency("qdrant", "count")
+    async def count(self) -> int:
+        return (await self.client.count(collection_name=self.collection_name, exact=True)).count
+
+    async def drop(self):
+        await self.client.delete_collection(self.collection_name)
+
+    async def close(self):
+        if self.owns_client:
+            await self.client.close()
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """int8 codes and per-vector scales, mapping each vector's largest component to 127"""
+    scales = np.maximum(np.abs(vectors).max(axis=-1), 1e-12) / 127
+    codes = np.rint(vectors / scales[..., None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest finite scores, best first"""
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return candidates[np.isfinite(scores[candidates])]
+
+class _IVFIndex:
+    """Inverted-file index: k-means centroids over the vectors, probing the closest lists at query time"""
+
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray, capacity: int, iterations: int = 10, seed: int = 0):
+        self.trained_count = len(rows)
+        nlist = int(np.clip(4 * np.sqrt(len(rows)), 16, 4096))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(rows), size=min(len(rows), nlist * 64), replace=False)]
+
+        # Spherical k-means: centroids stay unit length so a dot product ranks them
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self.centroids = centroids
+        self.assignment = np.full(capacity, -1, dtype=np.int32)
+        self.add(vectors, rows)
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray, batch_size: int = 65536):
+        for start in range(0, len(rows), batch_size):
+            batch = vectors[start:start + batch_size]
+            self.assignment[rows[start:start + batch_size]] = np.argmax(batch @ self.centroids.T, axis=1)
+
+    def resize(self, capacity: int):
+        assignment = np.full(capacity, -1, dtype=np.int32)
+        assignment[:self.assignment.size] = self.assignment
+        self.assignment = assignment
+
+    def candidates(self, query: np.ndarray, count: int, probes: int) -> np.ndarray:
+        probes = min(probes, len(self.centroids))
+        probed = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        return np.flatnonzero(np.isin(self.assignment[:count], probed))
+
+class _HNSWIndex:
+    """Graph index from the optional hnswlib package"""
+
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray, capacity: int):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise RuntimeError("LOCAL_VECTOR_INDEX=hnsw requires the hnswlib package") from e
+
+        self.index = hnswlib.Index(space="ip", dim=vectors.shape[1])
+        self.index.init_index(max_elements=capacity, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        self.index.set_ef(HNSW_EF_SEARCH)
+        self.trained_count = len(rows)
+        self.deleted = set()
+        self.add(vectors, rows)
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray):
+        if len(rows):
+            # Adding a reused row's label replaces its deleted element and unmarks it
+            self.index.add_items(vectors, rows)
+            self.deleted.difference_update(rows.tolist())
+
+    def delete(self, row: int):
+        self.index.mark_deleted(row)
+        self.deleted.add(row)
+
+    def resize(self, capacity: int):
+        self.index.resize_index(capacity)
+
+    def search(self, query: np.ndarray, limit: int) -> tuple[np.ndarray, np.ndarray]:
+        limit = min(limit, self.index.get_current_count() - len(self.deleted))
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self.index.set_ef(max(HNSW_EF_SEARCH, limit))
+        labels, distances = self.index.knn_query(query, k=limit)
+        # The "ip" space reports 1 - inner product as the distance
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store over a memory-mapped float32 matrix.
+
+    Search is an exact NumPy top-k, optionally replaced by an IVF or HNSW index
+    once the store holds LOCAL_ANN_MIN_VECTORS points. Vectors live in a raw
+    float32 file that grows by doubling; rows freed by deletes are taken by later
+    inserts, so the file and scans stay the size of the most points ever held at
+    once, however often documents are replaced. Ids and payloads are kept in an
+    append-only JSON log that is replayed on load. With scalar quantization,
+    exact and IVF searches scan int8 codes held in memory and only read the
+    float32 rows of the best candidates to rescore them.
+    """
+
+    def __init__(self, path: str = os.path.join(LOCAL_VECTOR_STORE_PATH, COLLECTION_NAME), index: str = LOCAL_VECTOR_INDEX,
+                 ann_min_vectors: int = LOCAL_ANN_MIN_VECTORS, ivf_probes: int = LOCAL_IVF_PROBES,
+                 quantization: str = VECTOR_QUANTIZATION, rescore: bool = QUANTIZATION_RESCORE,
+                 oversampling: float = QUANTIZATION_OVERSAMPLING):
+        if index not in ("exact", "ivf", "hnsw"):
+            raise ValueError(f"Unknown local vector index: {index}")
+        if quantization not in ("none", "scalar"):
+            raise ValueError(f"The local vector store does not support {quantization} quantization")
+        self.path = path
+        self.index_type = index
+        self.ann_min_vectors = ann_min_vectors
+        self.ivf_probes = ivf_probes
+        self.quantization = quantization
+        self.rescore = rescore
+        self.oversampling = oversampling
+        self._lock = threading.RLock()
+        self._log = None
+        self._reset()
+
+    def _reset(self):
+        self.dim = None
+        self._capacity = 0
+        self._count = 0
+        self._vectors = None
+        self._codes = None
+        self._scales = None
+        self._live = np.zeros(0, dtype=bool)
+        self._free_rows = set()  # deleted rows below _count, for new points to take
+        self._ids = []
+        self._payloads = []
+        self._rows = {}
+        self._field_index = {}
+        self._ann = None
+
+    def for_collection(self, collection_name: str) -> "LocalVectorStore":
+        # Collections are sibling directories under LOCAL_VECTOR_STORE_PATH
+        path = os.path.join(os.path.dirname(self.path), collection_name)
+        return LocalVectorStore(path, self.index_type, self.ann_min_vectors, self.ivf_probes,
+                                self.quantization, self.rescore, self.oversampling)
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.path, "points.jsonl")
+
+    async def ensure_collection(self, vector_size: int):
+        await asyncio.to_thread(self.open, vector_size)
+
+    def open(self, vector_size: int):
+        """Create the store directory or load the points persisted in it"""
+        with self._lock:
+            if self.dim is not None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            meta_path = os.path.join(self.path, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                if meta["dim"] != vector_size:
+                    raise ValueError(f"Local vector store has dimension {meta['dim']}, expected {vector_size}")
+            else:
+                with open(meta_path, "w") as f:
+                    json.dump({"dim": vector_size}, f)
+            self.dim = vector_size
+
+            existing = os.path.getsize(self._vectors_path) // (4 * vector_size) if os.path.exists(self._vectors_path) else 0
+            self._resize(max(1024, existing))
+            entries = self._replay_log()
+            if entries > max(1000, 2 * len(self._rows)):
+                self._rewrite_log()
+            if self._codes is not None:
+                for start in range(0, self._count, _QUANTIZED_BLOCK):
+                    block = slice(start, min(start + _QUANTIZED_BLOCK, self._count))
+                    self._codes[block], self._scales[block] = _quantize(np.asarray(self._vectors[block]))
+            self._log = open(self._log_path, "a", encoding="utf-8")
+            logger.info("Local vector store loaded %d points from %s", len(self._rows), self.path)
+
+    def _replay_log(self) -> int:
+        entries = 0
+        if not os.path.exists(self._log_path):
+            return entries
+        good = 0  # offset just past the last complete entry
+        with open(self._log_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a torn final line from a crash mid-write
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                good += len(line)
+                entries += 1
+                if entry["op"] == "upsert":
+                    self._set_row(entry["row"], entry["id"], entry["payload"])
+                else:
+                    self._delete_row(self._rows.get(entry["id"]))
+            size = f.seek(0, os.SEEK_END)
+        if size > good:
+            # Appending after the torn bytes would hide every later entry from the next replay
+            logger.warning("Discarding %d bytes of a torn entry at the end of %s", size - good, self._log_path)
+            with open(self._log_path, "r+b") as f:
+                f.truncate(good)
+        return entries
+
+    def _rewrite_log(self):
+        """Replace the log with one entry per live point once updates and deletes dominate it"""
+        tmp_path = f"{self._log_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row in np.flatnonzero(self._live[:self._count]).tolist():
+                f.write(json.dumps({"op": "upsert", "id": self._ids[row], "row": row, "payload": self._payloads[row]}) + "\n")
+        os.replace(tmp_path, self._log_path)
+
+    def _resize(self, capacity: int):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        if self.quantization == "scalar":
+            codes = np.zeros((capacity, self.dim), dtype=np.int8)
+            scales = np.zeros(capacity, dtype=np.float32)
+            if self._codes is not None:
+                codes[:len(self._codes)] = self._codes
+                scales[:len(self._scales)] = self._scales
+            self._codes, self._scales = codes, scales
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._live.size] = self._live
+        self._live = live
+        missing = capacity - len(self._ids)
+        self._ids.extend([None] * missing)
+        self._payloads.extend([None] * missing)
+        if self._ann is not None:
+            self._ann.resize(capacity)
+        self._capacity = capacity
+
+    def _set_row(self, row: int, point_id: str, payload: dict[str, Any]):
+        if row >= self._capacity:
+            self._resize(max(row + 1, 2 * self._capacity))
+        if self._live[row]:
+            self._unindex(row)
+        self._ids[row] = point_id
+        self._payloads[row] = payload
+        self._rows[point_id] = row
+        self._live[row] = True
+        self._free_rows.discard(row)
+        self._count = max(self._count, row + 1)
+        for field, values in self._field_index.items():
+            value = payload.get(field)
+            if isinstance(value, (str, int, float, bool)):
+                values.setdefault(value, set()).add(row)
+
+    def _unindex(self, row: int):
+        payload = self._payloads[row]
+        for field, values in self._field_index.items():
+            rows = values.get(payload.get(field))
+            if rows is not None:
+                rows.discard(row)
+
+    def _delete_row(self, row: int | None):
+        if row is None or not self._live[row]:
+            return
+        self._unindex(row)
+        del self._rows[self._ids[row]]
+        self._ids[row] = None
+        self._payloads[row] = None
+        self._live[row] = False
+        self._free_rows.add(row)
+        if isinstance(self._ann, _HNSWIndex):
+            self._ann.delete(row)
+
+    def _rows_matching(self, field: str, value: Any) -> set[int]:
+        if field not in self._field_index:
+            values = {}
+            for row in np.flatnonzero(self._live[:self._count]):
+                field_value = self._payloads[row].get(field)
+                if isinstance(field_value, (str, int, float, bool)):
+                    values.setdefault(field_value, set()).add(int(row))
+            self._field_index[field] = values
+        values = self._field_index[field]
+
+        if isinstance(value, dict):
+            unknown = set(value) - set(_RANGE_OPERATORS)
+            if unknown:
+                raise ValueError(f"Unknown range operators: {sorted(unknown)}")
+            # One entry per distinct value, e.g. one upload time per document
+            return set().union(*(rows for field_value, rows in values.items() if _in_range(field_value, value)))
+        if isinstance(value, (list, tuple, set)):
+            return set().union(*(values.get(option, set()) for option in value))
+        return values.get(value, set())
+
+    @timed_dependency("local_vector_store", "upsert")
+    async def upsert(self, points: list[Point]):
+        await asyncio.to_thread(self._upsert, points)
+
+    def _upsert(self, points: list[Point]):
+        with self._lock:
+            vectors = _normalize(np.stack([np.asarray(point["vector"], dtype=np.float32) for point in points]))
+            rows = []
+            for point in points:
+                row = self._rows.get(point["id"])
+                if row is None:
+                    # The delete that freed a row is already logged, so a crash before this
+                    # point's entry is written leaves the row deleted on replay
+                    row = self._free_rows.pop() if self._free_rows else self._count
+                self._set_row(row, point["id"], point["payload"])
+                rows.append(row)
+            rows = np.asarray(rows)
+            self._vectors[rows] = vectors
+            self._vectors.flush()
+            if self._codes is not None:
+                self._codes[rows], self._scales[rows] = _quantize(vectors)
+
+            # Vectors are durable before the log references them
+            for point, row in zip(points, rows):
+                self._log.write(json.dumps({"op": "upsert", "id": point["id"], "row": int(row), "payload": point["payload"]}) + "\n")
+            self._log.flush()
+
+            if self._ann is not None:
+                self._ann.add(vectors, rows)
+
+    @timed_dependency("local_vector_store", "search")
+    async def search(self, vector: Iterable[float], limit: int, filters: Filters | None = None) -> list[Point]:
+        return await asyncio.to_thread(self._search, vector, limit, filters)
+
+    def _search(self, vector: Iterable[float], limit: int, filters: Filters | None = None) -> list[Point]:
+        with self._lock:
+            query = _normalize(np.asarray(vector, dtype=np.float32))
+
+            if filters:
+                # Filtered searches score the matching rows exactly; payload
+                # filters are usually selective (one document, one tenant)
+                rows = None
+                for field, value in filters.items():
+                    matching = self._rows_matching(field, value)
+                    rows = matching if rows is None else rows & matching
+                rows = np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+                rows, scores = self._rank(query[None], rows, limit)[0]
+            else:
+                ann = self._approximate_index()
+                if isinstance(ann, _HNSWIndex):
+                    rows, scores = ann.search(query, limit)
+                else:
+                    rows = None
+                    if isinstance(ann, _IVFIndex):
+                        rows = ann.candidates(query, self._count, self.ivf_probes)
+                        rows = rows[self._live[rows]]
+                    rows, scores = self._rank(query[None], rows, limit)[0]
+
+            return [
+                {"id": self._ids[row], "score": float(score), "payload": self._payloads[row]}
+                for row, score in zip(rows.tolist(), scores.tolist())
+            ]
+
+    @timed_dependency("local_vector_store", "search_batch")
+    async def search_batch(self, vectors: Iterable[Iterable[float]], limit: int,
+                           filters: list[Filters | None] | None = None) -> list[list[Point]]:
+        return await asyncio.to_thread(self._search_batch, vectors, limit, filters)
+
+    def _search_batch(self, vectors: Iterable[Iterable[float]], limit: int,
+                      filters: list[Filters | None] | None = None) -> list[list[Point]]:
+        vectors = list(vectors)
+        filters = filters or [None] * len(vectors)
+        with self._lock:
+            count = self._count
+            unfiltered = [i for i, scope in enumerate(filters) if not scope]
+            results = [None] * len(vectors)
+            if len(unfiltered) > 1 and count and self._approximate_index() is None:
+                # Exact unfiltered searches share one matrix product over the stored vectors
+                queries = _normalize(np.asarray([vectors[i] for i in unfiltered], dtype=np.float32))
+                for i, (rows, scores) in zip(unfiltered, self._rank(queries, None, limit)):
+                    results[i] = [
+                        {"id": self._ids[row], "score": float(score), "payload": self._payloads[row]}
+                        for row, score in zip(rows.tolist(), scores.tolist())
+                    ]
+            for i, result in enumerate(results):
+                if result is None:
+                    results[i] = self._search(vectors[i], limit, filters[i])
+            return results
+
+    def _rank(self, queries: np.ndarray, rows: np.ndarray | None,
+              limit: int) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Best rows and their scores for each query, among the given rows or else every live row"""
+        count = self._count
+        quantized = self._codes is not None
+        if rows is None:
+            rows = np.arange(count)
+            # Scoring every row and masking deleted ones beats gathering the live rows
+            scores = self._quantized_scores(queries, None) if quantized else np.asarray(queries @ self._vectors[:count].T)
+            scores[:, ~self._live[:count]] = -np.inf
+        else:
+            scores = self._quantized_scores(queries, rows) if quantized else queries @ self._vectors[rows].T
+
+        ranked = []
+        for query, row_scores in zip(queries, scores):
+            if quantized and self.rescore:
+                # Only the candidates' float32 rows are read, so the vector file can stay on disk
+                candidates = np.sort(rows[_top_k(row_scores, math.ceil(limit * self.oversampling))])
+                row_scores = self._vectors[candidates] @ query
+                order = _top_k(row_scores, limit)
+                ranked.append((candidates[order], row_scores[order]))
+            else:
+                order = _top_k(row_scores, limit)
+                ranked.append((rows[order], row_scores[order]))
+        return ranked
+
+    def _quantized_scores(self, queries: np.ndarray, rows: np.ndarray | None) -> np.ndarray:
+        """Approximate scores from the int8 codes, for every stored row or the given ones"""
+        count = self._count if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, _QUANTIZED_BLOCK):
+            block = slice(start, min(start + _QUANTIZED_BLOCK, count))
+            selected = block if rows is None else rows[block]
+            scores[:, block] = (self._codes[selected].astype(np.float32) @ queries.T).T * self._scales[selected]
+        return scores
+
+    def _approximate_index(self):
+        """Build or retrain the ANN index once the store is large enough for it to pay off"""
+        live_count = len(self._rows)
+        if self.index_type == "exact" or live_count < self.ann_min_vectors:
+            return None
+        if self._ann is None or (self.index_type == "ivf" and live_count > 2 * self._ann.trained_count):
+            rows = np.flatnonzero(self._live[:self._count])
+            vectors = np.asarray(self._vectors[rows])
+            index_class = _IVFIndex if self.index_type == "ivf" else _HNSWIndex
+            self._ann = index_class(vectors, rows, self._capacity)
+        return self._ann
+
+    @timed_dependency("local_vector_store", "scroll")
+    async def scroll(self, limit: int, exclude: Filters | None = None) -> list[Point]:
+        return await asyncio.to_thread(self._scroll, limit, exclude)
+
+    def _scroll(self, limit: int, exclude: Filters | None = None) -> list[Point]:
+        with self._lock:
+            live = self._live[:self._count].copy()
+            for field, value in (exclude or {}).items():
+                excluded = self._rows_matching(field, value)
+                if excluded:
+                    live[np.fromiter(excluded, dtype=np.int64, count=len(excluded))] = False
+            return [{"id": self._ids[row], "payload": self._payloads[row]} for row in np.flatnonzero(live)[:limit]]
+
+    @timed_dependency("local_vector_store", "set_payload")
+    async def set_payload(self, payloads: dict[str, dict[str, Any]]):
+        await asyncio.to_thread(self._set_payload, payloads)
+
+    def _set_payload(self, payloads: dict[str, dict[str, Any]]):
+        with self._lock:
+            for point_id, fields in payloads.items():
+                row = self._rows.get(point_id)
+                if row is None:
+                    continue
+                payload = {**self._payloads[row], **fields}
+                self._set_row(row, point_id, payload)
+                self._log.write(json.dumps({"op": "upsert", "id": point_id, "row": row, "payload": payload}) + "\n")
+            self._log.flush()
+
+    @timed_dependency("local_vector_store", "delete")
+    async def delete(self, point_ids: list[str]):
+        await asyncio.to_thread(self._delete_ids, point_ids)
+
+    def _delete_ids(self, point_ids: Iterable[str]):
+        with self._lock:
+            for point_id in point_ids:
+                row = self._rows.get(point_id)
+                if row is None:
+                    continue
+                self._delete_row(row)
+                self._log.write(json.dumps({"op": "delete", "id": point_id}) + "\n")
+            self._log.flush()
+
+    @timed_dependency("local_vector_store", "delete_by_document")
+    async def delete_by_document(self, document_id: str):
+        await asyncio.to_thread(self._delete_by_document, document_id)
+
+    def _delete_by_document(self, document_id: str):
+        with self._lock:
+            self._delete_ids([self._ids[row] for row in sorted(self._rows_matching("document_id", document_id))])
+
+    @timed_dependency("local_vector_store", "count")
+    async def count(self) -> int:
+        return len(self._rows)
+
+    async def drop(self):
+        await asyncio.to_thread(self._drop)
+
+    def _drop(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            shutil.rmtree(self.path, ignore_errors=True)
+            # Reopening the store starts an empty collection
+            self._reset()
+
+    async def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
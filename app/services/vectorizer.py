@@ -0,0 +1,241 @@
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from scipy.sparse import coo_matrix
+from collections import Counter
+import hashlib
+import os
+import re
+import threading
+
+TOKEN_PATTERN = r'\b[a-zA-Z]{3,15}\b'
+VOCABULARY_PATH = os.getenv("VOCABULARY_PATH", "data/vocabulary.npy")
+MAX_TOKEN_BYTES = 16
+BATCH_SIZE = 4096
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+_token_re = re.compile(TOKEN_PATTERN)
+
+# Masks keeping the first k bytes of a little-endian 8-byte word
+_BYTE_MASKS = np.array([(1 << (8 * k)) - 1 for k in range(9)], dtype=np.uint64)
+
+def _pack_tokens(buf: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack tokens of up to 16 bytes into two uint64 words plus a lookup hash"""
+    padded = np.concatenate((buf, np.zeros(MAX_TOKEN_BYTES, dtype=np.uint8)))
+    windows = as_strided(padded, shape=(buf.size + 8, 8), strides=(1, 1))
+    low = windows[starts].view("<u8").ravel() & _BYTE_MASKS[np.minimum(lengths, 8)]
+    high = windows[starts + 8].view("<u8").ravel() & _BYTE_MASKS[np.clip(lengths - 8, 0, 8)]
+    return low, high, ((low * _HASH_MULTIPLIER) ^ high) * _HASH_MULTIPLIER
+
+def _perfect_hash_table(hashes: np.ndarray) -> tuple[int, int, np.ndarray]:
+    """Find a (shift, bits) slice of the hashes that has no collisions, preferring the well-mixed high bits"""
+    for bits in range(max(8, int(hashes.size).bit_length() + 8), 33):
+        mask = np.uint64((1 << bits) - 1)
+        for shift in range(64 - bits, -1, -1):
+            buckets = (hashes >> np.uint64(shift)) & mask
+            if np.unique(buckets).size == hashes.size:
+                table = np.full(1 << bits, -1, dtype=np.int64)
+                table[buckets.astype(np.int64)] = np.arange(hashes.size)
+                return shift, bits, table
+    raise ValueError("Could not build a lookup table for the vocabulary")
+
+class _VocabularyIndex:
+    """Immutable vocabulary plus the lookup table used by the batch tokenizer"""
+
+    def __init__(self, words: list[str]):
+        self.words = words
+        self.mapping = {word: i for i, word in enumerate(words)}
+        self.version = hashlib.sha1("\n".join(words).encode("ascii")).hexdigest()[:12]
+
+        encoded = [word.encode("ascii") for word in words]
+        buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        starts = np.zeros(len(encoded), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        self.low, self.high, hashes = _pack_tokens(buf, starts, lengths)
+        shift, bits, self.table = _perfect_hash_table(hashes)
+        self.shift = np.uint64(shift)
+        self.mask = np.uint64((1 << bits) - 1)
+
+    def lookup(self, low: np.ndarray, high: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+        """Return the column of each packed token, or -1 when it is not in the vocabulary"""
+        columns = self.table[((hashes >> self.shift) & self.mask).astype(np.int64)]
+        hits = columns >= 0
+        hits[hits] = (self.low[columns[hits]] == low[hits]) & (self.high[columns[hits]] == high[hits])
+        columns[~hits] = -1
+        return columns
+
+class WordFrequencyVectorizer:
+    """Batch word-frequency embedder backed by a sparse count matrix"""
+
+    def __init__(self, vector_size: int = 300):
+        self.vector_size = vector_size
+        self._index = None
+        self._loaded_mtime = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_fitted(self) -> bool:
+        return self._index is not None
+
+    @property
+    def vocabulary(self) -> dict[str, int] | None:
+        return self._index.mapping if self._index else None
+
+    @property
+    def version(self) -> str | None:
+        return self._index.version if self._index else None
+
+    def set_vocabulary(self, words: list[str]):
+        """Use the given words as embedding dimensions, in order"""
+        self._index = _VocabularyIndex(list(words)[:self.vector_size])
+
+    def fit(self, texts: list[str]):
+        """Pick the most frequent non-stop-words of the corpus as the vocabulary"""
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        
+        counts = Counter()
+        for text in texts:
+            counts.update(_token_re.findall(text.lower()))
+        for word in ENGLISH_STOP_WORDS & counts.keys():
+            del counts[word]
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        self.set_vocabulary([word for word, _ in ranked[:self.vector_size]])
+
+    def save(self, path: str = VOCABULARY_PATH):
+        """Persist the vocabulary as a memory-mappable .npy array of words"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        words = np.array([word.encode("ascii") for word in self._index.words], dtype=f"S{MAX_TOKEN_BYTES}")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, words)
+        os.replace(tmp_path, path)
+        self._loaded_mtime = os.stat(path).st_mtime_ns
+
+    def load(self, path: str = VOCABULARY_PATH) -> bool:
+        """Load a saved vocabulary, returning False when none exists"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        words = np.load(path, mmap_mode="r")
+        self.set_vocabulary([word.decode("ascii") for word in words])
+        self._loaded_mtime = mtime
+        return True
+
+    def reload_if_changed(self, path: str = VOCABULARY_PATH) -> bool:
+        """Pick up a vocabulary saved by another worker since the last load"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._loaded_mtime:
+            return False
+        with self._lock:
+            if mtime == self._loaded_mtime:
+                return False
+            return self.load(path)
+
+    def transform(self, texts: list[str]) -> np.ndarray:
+        """Embed a batch of texts into an L2-normalized float32 matrix"""
+        embeddings = np.zeros((len(texts), self.vector_size), dtype=np.float32)
+        if not texts:
+            return embeddings
+
+        index = self._index
+        for start in range(0, len(texts), BATCH_SIZE):
+            batch = texts[start:start + BATCH_SIZE]
+            if index and index.words:
+                embeddings[start:start + len(batch)] = self._count_matrix(batch, index)
+            else:
+                embeddings[start:start + len(batch)] = self._char_code_embeddings(batch)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.maximum(norms, 0.001, out=norms)
+        embeddings /= norms
+        return embeddings
+
+    def _count_matrix(self, texts: list[str], index: _VocabularyIndex) -> np.ndarray:
+        """Count vocabulary tokens for a batch in a single pass over its bytes"""
+        encoded = [text.lower().encode("utf-8") for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        doc_starts = np.zeros(len(encoded), dtype=np.int64)
+        np.cumsum(lengths[:-1] + 1, out=doc_starts[1:])
+        buf = np.frombuffer(b"\n".join(encoded), dtype=np.uint8)
+
+        # After lower() the only ASCII letters left are a-z. Digits, "_" and
+        # non-ASCII bytes are word characters that stop a run from matching.
+        letters = np.zeros(buf.size + 2, dtype=bool)
+        letters[1:-1] = (buf >= 0x61) & (buf <= 0x7a)
+        other_word = np.zeros(buf.size + 2, dtype=bool)
+        other_word[1:-1] = ((buf >= 0x30) & (buf <= 0x39)) | (buf == 0x5f) | (buf >= 0x80)
+
+        # Token candidates are 3-15 letter runs with no word byte on either side
+        edges = np.flatnonzero(letters[1:] != letters[:-1])
+        starts, ends = edges[0::2], edges[1::2]
+        run_lengths = ends - starts
+        candidates = (run_lengths >= 3) & (run_lengths <= 15) & ~other_word[starts] & ~other_word[ends + 1]
+        token_starts = starts[candidates]
+        token_lengths = run_lengths[candidates]
+
+        columns = index.lookup(*_pack_tokens(buf, token_starts, token_lengths))
+        hits = columns >= 0
+        rows = np.searchsorted(doc_starts, token_starts[hits], side="right") - 1
+        columns = columns[hits]
+
+        # Runs containing non-ASCII bytes may still hold tokens split by
+        # non-ASCII punctuation, so those few fall back to the regex
+        high_bytes = np.flatnonzero(buf >= 0x80)
+        if high_bytes.size:
+            word_edges = np.flatnonzero((letters[1:] | other_word[1:]) != (letters[:-1] | other_word[:-1]))
+            starts, ends = word_edges[0::2], word_edges[1::2]
+            high_counts = np.searchsorted(high_bytes, ends) - np.searchsorted(high_bytes, starts)
+            extra_rows, extra_columns = [], []
+            for run in np.flatnonzero(high_counts):
+                run_text = buf[starts[run]:ends[run]].tobytes().decode("utf-8", errors="ignore")
+                row = np.searchsorted(doc_starts, starts[run], side="right") - 1
+                for word in _token_re.findall(run_text):
+                    column = index.mapping.get(word)
+                    if column is not None:
+                        extra_rows.append(row)
+                        extra_columns.append(column)
+            if extra_rows:
+                rows = np.concatenate((rows, np.array(extra_rows, dtype=np.int64)))
+                columns = np.concatenate((columns, np.array(extra_columns, dtype=np.int64)))
+
+        counts = coo_matrix(
+            (np.ones(rows.size, dtype=np.float32), (rows, columns)),
+            shape=(len(texts), self.vector_size)
+        )
+        return counts.toarray()
+
+    def _char_code_embeddings(self, texts: list[str]) -> np.ndarray:
+        """Fallback embedding from character codes when no vocabulary exists"""
+        embeddings = np.zeros((len(texts), self.vector_size), dtype=np.float32)
+        for row, text in enumerate(texts):
+            prefix = text.lower()[:self.vector_size]
+            codes = np.frombuffer(prefix.encode("utf-32-le"), dtype=np.uint32)
+            embeddings[row, :codes.size] = (codes % 100) / 100.0
+        return embeddings
+
+_shared_vectorizer = None
+_shared_lock = threading.Lock()
+
+def get_vectorizer(vector_size: int = 300) -> WordFrequencyVectorizer:
+    """Return the process-wide vectorizer, loading the saved vocabulary once"""
+    global _shared_vectorizer
+    if _shared_vectorizer is None:
+        with _shared_lock:
+            if _shared_vectorizer is None:
+                vectorizer = WordFrequencyVectorizer(vector_size)
+                vectorizer.load()
+                _shared_vectorizer = vectorizer
+    return _shared_vectorizer
+
+def embed_with_saved_vocabulary(texts: list[str], vector_size: int = 300) -> np.ndarray:
+    """Embed texts in a worker process using the vocabulary saved on disk"""
+    vectorizer = get_vectorizer(vector_size)
+    vectorizer.reload_if_changed()
+    return vectorizer.transform(texts)
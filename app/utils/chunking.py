@@ -1,74 +1,181 @@
-from typing import Any
+from bisect import bisect_right
+from typing import Any, Callable, Iterable, Iterator
+import os
 import re
 
+# Sizes and overlaps are in characters for every strategy
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 512))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 64))
+
+# Everything up to the last sentence-ending punctuation (plus closing quotes or brackets) followed
+# by whitespace; the greedy prefix backtracks from the end, so only one match object is built
+_LAST_SENTENCE_END = re.compile(r'.*[.!?]["\')\]]*(?=\s)', re.DOTALL)
+_NON_SPACE = re.compile(r'\S')
+_SPACE = re.compile(r'\s')
+
+TextBlock = tuple[str, int | None]  # text and the page it came from, if known
+# Returns the offset to end a chunk at within text[lo + 1:hi + 1], or -1 if the separator does not occur there
+Cutter = Callable[[str, int, int], int]
+# A cutter and the fraction of chunk_size a chunk must reach before that separator may end it
+Separator = tuple[Cutter, float]
+
+def _cut_before(separator: str) -> Cutter:
+    def cut(text: str, lo: int, hi: int) -> int:
+        return text.rfind(separator, lo + 1, hi + len(separator))
+    return cut
+
+def _cut_after_sentence(text: str, lo: int, hi: int) -> int:
+    match = _LAST_SENTENCE_END.match(text, lo + 1, hi + 1)
+    return match.end() if match else -1
+
+def _cut_at_space(text: str, lo: int, hi: int) -> int:
+    return max(text.rfind(" ", lo + 1, hi + 1), text.rfind("\n", lo + 1, hi + 1), text.rfind("\t", lo + 1, hi + 1))
+
+# Coarsest separator first; a chunk ends at the last occurrence of the first separator found in its window.
+# Paragraph and line breaks only end chunks that are at least half full, so a short heading
+# followed by a long paragraph does not become a chunk of its own.
+_FIXED_SIZE_SEPARATORS = ((_cut_at_space, 0.0),)
+_SEMANTIC_SEPARATORS = ((_cut_after_sentence, 0.0), (_cut_at_space, 0.0))
+_RECURSIVE_SEPARATORS = (
+    (_cut_before("\n\n"), 0.5),
+    (_cut_before("\n"), 0.5),
+    (_cut_after_sentence, 0.0),
+    (_cut_at_space, 0.0)
+)
+
+def iter_chunks(blocks: Iterable[TextBlock], chunk_size: int, chunk_overlap: int,
+                separators: tuple[Separator, ...]) -> Iterator[dict[str, Any]]:
+    """Cut a stream of text blocks into chunks of at most chunk_size characters.
+
+    Chunks are slices of the concatenated text, with their start and end offsets into it
+    in the metadata. Leading and trailing whitespace is left out and words are never split
+    unless a single word is longer than chunk_size. Consecutive chunks share up to
+    chunk_overlap characters, starting at a word boundary.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if not 0 <= chunk_overlap < chunk_size:
+        raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+
+    blocks = iter(blocks)
+    buffer = ""  # text from offset base onwards
+    base = 0
+    start = 0  # offset at which the next chunk may begin
+    covered = 0  # end offset of the previous chunk; each chunk must extend past it
+    page_offsets, pages = [], []  # offset at which each block with a known page begins
+    exhausted = False
+
+    while True:
+        # Buffer one character past the window, to see whether it ends inside a word
+        while not exhausted and base + len(buffer) <= start + chunk_size:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+                break
+            text, page = block
+            if page is not None:
+                page_offsets.append(base + len(buffer))
+                pages.append(page)
+            # Text before the next chunk is dropped only here, so the buffer stays about one block long
+            buffer = buffer[start - base:] + text
+            base = start
+
+        lo = start - base
+        word = _NON_SPACE.search(buffer, lo)
+        if word is None:
+            if exhausted:
+                return
+            start = base + len(buffer)
+            continue
+        if word.start() > lo:
+            start = base + word.start()
+            continue
+
+        hi = lo + chunk_size
+        last = hi >= len(buffer)
+        if last:
+            end = len(buffer)
+        else:
+            end = hi
+            for cutter, fill in separators:
+                floor = max(lo + int(chunk_size * fill), covered - base)
+                cut = cutter(buffer, floor, hi)
+                if cut > floor:
+                    end = cut
+                    break
+        while buffer[end - 1].isspace():
+            end -= 1
+        if base + end <= covered:
+            # Nothing past the previous chunk fits before the cut, e.g. a long word follows a paragraph
+            # break, so the next chunk starts after the previous one instead of overlapping it
+            start = covered
+            continue
+
+        metadata = {"start_offset": base + lo, "end_offset": base + end}
+        if pages:
+            metadata["page_start"] = pages[max(0, bisect_right(page_offsets, base + lo) - 1)]
+            metadata["page_end"] = pages[max(0, bisect_right(page_offsets, base + end - 1) - 1)]
+        yield {"text": buffer[lo:end], "metadata": metadata}
+
+        if last:
+            return
+        covered = base + end
+        next_start = end
+        if chunk_overlap:
+            next_start = max(end - chunk_overlap, lo + 1)
+            if not buffer[next_start - 1].isspace():
+                space = _SPACE.search(buffer, next_start, end)
+                next_start = space.start() if space else end
+        start = base + next_start
+
 class ChunkingStrategy:
     @staticmethod
-    def fixed_size_chunking(text: str, chunk_size: int = 512, chunk_overlap: int = 50) -> list[dict[str, Any]]:
+    def iter_fixed_size_chunks(blocks: Iterable[TextBlock], chunk_size: int = CHUNK_SIZE,
+                               chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[dict[str, Any]]:
+        """Fixed size chunking over a stream of text blocks, cut at the last word boundary in each window"""
+        return iter_chunks(blocks, chunk_size, chunk_overlap, _FIXED_SIZE_SEPARATORS)
+
+    @staticmethod
+    def iter_semantic_chunks(blocks: Iterable[TextBlock], chunk_size: int = CHUNK_SIZE,
+                             chunk_overlap: int = 0) -> Iterator[dict[str, Any]]:
+        """Semantic chunking over a stream of text blocks, packing whole sentences into each chunk"""
+        return iter_chunks(blocks, chunk_size, chunk_overlap, _SEMANTIC_SEPARATORS)
+
+    @staticmethod
+    def iter_recursive_chunks(blocks: Iterable[TextBlock], chunk_size: int = CHUNK_SIZE,
+                              chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[dict[str, Any]]:
+        """Paragraph-aware chunking: split at paragraphs, then lines, sentences and words as needed to fit"""
+        return iter_chunks(blocks, chunk_size, chunk_overlap, _RECURSIVE_SEPARATORS)
+
+    @staticmethod
+    def fixed_size_chunking(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> list[dict[str, Any]]:
         """Fixed size chunking strategy without LangChain"""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        
-        for word in words:
-            word_size = len(word) + 1  
-            
-            if current_size + word_size > chunk_size and current_chunk:
-                # Save current chunk
-                chunk_text = ' '.join(current_chunk)
-                chunks.append({"text": chunk_text, "metadata": {}})
-                
-                # Start new chunk with overlap
-                overlap_words = current_chunk[-chunk_overlap:] if chunk_overlap > 0 else []
-                current_chunk = overlap_words + [word]
-                current_size = sum(len(w) + 1 for w in current_chunk)
-            else:
-                current_chunk.append(word)
-                current_size += word_size
-        
-        # Add the last chunk
-        if current_chunk:
-            chunk_text = ' '.join(current_chunk)
-            chunks.append({"text": chunk_text, "metadata": {}})
-        
-        return chunks
-    
+        return list(ChunkingStrategy.iter_fixed_size_chunks([(text, None)], chunk_size, chunk_overlap))
+
     @staticmethod
-    def semantic_chunking(text: str, chunk_size: int = 512) -> list[dict[str, Any]]:
+    def semantic_chunking(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = 0) -> list[dict[str, Any]]:
         """Semantic chunking using sentence boundaries"""
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        
-        for sentence in sentences:
-            sentence_size = len(sentence)
-            
-            if current_size + sentence_size > chunk_size and current_chunk:
-                # Save current chunk
-                chunk_text = '. '.join(current_chunk) + '.'
-                chunks.append({"text": chunk_text, "metadata": {}})
-                
-                # Start new chunk
-                current_chunk = [sentence]
-                current_size = sentence_size
-            else:
-                current_chunk.append(sentence)
-                current_size += sentence_size
-        
-        # Add the last chunk
-        if current_chunk:
-            chunk_text = '. '.join(current_chunk) + '.'
-            chunks.append({"text": chunk_text, "metadata": {}})
-        
-        return chunks
+        return list(ChunkingStrategy.iter_semantic_chunks([(text, None)], chunk_size, chunk_overlap))
+
+    @staticmethod
+    def recursive_chunking(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> list[dict[str, Any]]:
+        """Paragraph-aware chunking using paragraph, line, sentence and word boundaries"""
+        return list(ChunkingStrategy.iter_recursive_chunks([(text, None)], chunk_size, chunk_overlap))
 
 def get_chunking_strategy(strategy: str):
     """Get the appropriate chunking strategy"""
     strategies = {
         "fixed_size": ChunkingStrategy.fixed_size_chunking,
-        "semantic": ChunkingStrategy.semantic_chunking
+        "semantic": ChunkingStrategy.semantic_chunking,
+        "recursive": ChunkingStrategy.recursive_chunking
+    }
+    return strategies.get(strategy, ChunkingStrategy.fixed_size_chunking)
+
+def get_streaming_chunker(strategy: str) -> Callable[[Iterable[TextBlock]], Iterator[dict[str, Any]]]:
+    """Get the streaming variant of a chunking strategy"""
+    strategies = {
+        "fixed_size": ChunkingStrategy.iter_fixed_size_chunks,
+        "semantic": ChunkingStrategy.iter_semantic_chunks,
+        "recursive": ChunkingStrategy.iter_recursive_chunks
     }
-    return strategies.get(strategy, ChunkingStrategy.fixed_size_chunking)
\ No newline at end of file
+    return strategies.get(strategy, ChunkingStrategy.iter_fixed_size_chunks)
@@ -1,19 +1,111 @@
 import PyPDF2
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+import hashlib
+import mmap
 import os
-from typing import Tuple
+from typing import BinaryIO, Iterator, Optional, Tuple
 import uuid
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file"""
+UPLOAD_DIR = "uploads"
+COPY_BUFFER_SIZE = 1024 * 1024
+TEXT_BLOCK_SIZE = 256 * 1024
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", os.getenv("INGESTION_PROCESS_WORKERS", 2)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+
+# Text, page number (None for TXT files) and the fraction of the document read so far
+DocumentBlock = Tuple[str, Optional[int], float]
+
+def count_pdf_pages(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+# Each worker process keeps the PDF it is currently extracting open, because
+# parsing the xref and page tree costs as much as extracting a dozen pages
+_open_pdf = None
+
+def _mapped_pdf_reader(file_path: str) -> PyPDF2.PdfReader:
+    global _open_pdf
+    key = (file_path, os.stat(file_path).st_mtime_ns)
+    if _open_pdf is None or _open_pdf[0] != key:
+        if _open_pdf is not None:
+            _open_pdf[1].close()
+        # Workers map the file themselves, so only the path crosses the process boundary
+        with open(file_path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        _open_pdf = (key, mapped, PyPDF2.PdfReader(mapped))
+    return _open_pdf[2]
+
+def extract_pdf_page_range(file_path: str, start: int, stop: int) -> list[str]:
+    """Extract the text of pages [start, stop) from a memory-mapped PDF"""
+    pages = _mapped_pdf_reader(file_path).pages
+    return [pages[i].extract_text() + "\n" for i in range(start, stop)]
+
+def iter_pdf_pages(file_path: str) -> Iterator[DocumentBlock]:
+    """Yield the text of each PDF page with its page number"""
     try:
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            page_count = len(pdf_reader.pages)
+            for page_number, page in enumerate(pdf_reader.pages, start=1):
+                yield page.extract_text() + "\n", page_number, page_number / page_count
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+
+def iter_pdf_pages_parallel(file_path: str, executor: Executor, workers: int = PDF_EXTRACTION_WORKERS,
+                            pages_per_task: int = PDF_PAGES_PER_TASK) -> Iterator[DocumentBlock]:
+    """Extract page ranges in parallel and yield the pages in order.
+    
+    At most workers + 1 ranges are in flight, so memory stays bounded for large files.
+    """
+    pending = deque()
+    try:
+        page_count = count_pdf_pages(file_path)
+        ranges = iter([(start, min(start + pages_per_task, page_count))
+                       for start in range(0, page_count, pages_per_task)])
+        
+        for start, stop in ranges:
+            pending.append(executor.submit(extract_pdf_page_range, file_path, start, stop))
+            if len(pending) > workers:
+                break
+        
+        page_number = 0
+        while pending:
+            texts = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(extract_pdf_page_range, file_path, *next_range))
+            for text in texts:
+                page_number += 1
+                yield text, page_number, page_number / page_count
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_txt_blocks(file_path: str, block_size: int = TEXT_BLOCK_SIZE) -> Iterator[DocumentBlock]:
+    """Yield a TXT file in fixed-size blocks with the fraction of bytes read so far"""
+    try:
+        file_size = max(1, os.path.getsize(file_path))
+        with open(file_path, 'r', encoding='utf-8') as file:
+            while block := file.read(block_size):
+                yield block, None, min(1.0, file.buffer.tell() / file_size)
+    except Exception as e:
+        raise Exception(f"Error extracting text from TXT file: {str(e)}")
+
+def iter_document_text(file_path: str, file_extension: str, executor: Optional[Executor] = None) -> Iterator[DocumentBlock]:
+    """Stream the text of a supported document without loading it whole"""
+    if file_extension == '.pdf':
+        # Threads would only contend for the GIL, so pages are split across processes only
+        if isinstance(executor, ProcessPoolExecutor) and PDF_EXTRACTION_WORKERS > 1:
+            return iter_pdf_pages_parallel(file_path, executor)
+        return iter_pdf_pages(file_path)
+    return iter_txt_blocks(file_path)
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text from PDF file"""
+    return "".join(text for text, _, _ in iter_pdf_pages(file_path))
 
 def extract_text_from_txt(file_path: str) -> str:
     """Extract text from TXT file"""
@@ -23,18 +115,37 @@ def extract_text_from_txt(file_path: str) -> str:
     except Exception as e:
         raise Exception(f"Error extracting text from TXT file: {str(e)}")
 
-def save_uploaded_file(file_content: bytes, filename: str) -> Tuple[str, str]:
-    """Save uploaded file and return file path"""
+def _new_upload_path(filename: str) -> Tuple[str, str]:
     file_id = str(uuid.uuid4())
     file_extension = os.path.splitext(filename)[1].lower()
-    upload_dir = "uploads"
     
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
+    if not os.path.exists(UPLOAD_DIR):
+        os.makedirs(UPLOAD_DIR)
     
-    file_path = os.path.join(upload_dir, f"{file_id}{file_extension}")
+    return os.path.join(UPLOAD_DIR, f"{file_id}{file_extension}"), file_id
+
+def save_uploaded_file(file_content: bytes, filename: str) -> Tuple[str, str]:
+    """Save uploaded file and return file path"""
+    file_path, file_id = _new_upload_path(filename)
     
     with open(file_path, 'wb') as f:
         f.write(file_content)
     
-    return file_path, file_id
\ No newline at end of file
+    return file_path, file_id
+
+def save_uploaded_stream(source: BinaryIO, filename: str) -> Tuple[str, str, int, str]:
+    """Copy an uploaded file object to disk in fixed-size chunks and return its path, ID, size and SHA-256"""
+    file_path, file_id = _new_upload_path(filename)
+    
+    # Hashed while copying, so identical re-uploads are recognised without a second read
+    digest = hashlib.sha256()
+    with open(file_path, 'wb') as f:
+        while True:
+            block = source.read(COPY_BUFFER_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+        file_size = f.tell()
+    
+    return file_path, file_id, file_size, digest.hexdigest()
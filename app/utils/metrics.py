@@ -0,0 +1,144 @@
+from contextlib import nullcontext
+import functools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() == "true"
+
+logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+# Stages range from sub-millisecond cache reads to multi-second PDF batches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent in each stage of document ingestion and chat queries",
+    ["pipeline", "stage"], buckets=LATENCY_BUCKETS
+)
+DEPENDENCY_SECONDS = Histogram(
+    "rag_dependency_seconds", "Latency of calls to the vector store, Redis and the database",
+    ["dependency", "operation"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "HTTP request latency by route template and status code",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+DOCUMENTS_TOTAL = Counter("rag_documents_ingested", "Documents ingested, by result", ["status"])
+CHUNKS_TOTAL = Counter("rag_chunks", "Chunks ingested, embedded anew or reused from a previous version", ["outcome"])
+VECTORS_TOTAL = Counter("rag_vectors", "Vectors stored, failed to store, re-embedded or deleted", ["outcome"])
+CACHE_REQUESTS_TOTAL = Counter("rag_cache_requests", "Cache requests by cache and result: hit, miss or error", ["cache", "result"])
+RERANK_FALLBACKS_TOTAL = Counter("rag_rerank_fallbacks", "Reranks that ran out of their latency budget and kept the first-stage order")
+
+# Statements are labelled by verb only, so DDL and pragmas cannot grow the label set
+_SQL_OPERATIONS = {"select", "insert", "update", "delete"}
+
+_tracer = None
+if OTEL_TRACING:
+    try:
+        from opentelemetry import propagate, trace
+        # Spans go to whichever tracer provider is configured, e.g. by opentelemetry-instrument
+        _tracer = trace.get_tracer("rag-backend")
+    except ImportError:
+        logger.warning("OTEL_TRACING is set but opentelemetry-api is not installed; tracing is disabled")
+
+_NO_SPAN = nullcontext()
+
+def span(name: str, carrier: dict[str, str] | None = None, **attributes: Any):
+    """An OpenTelemetry span when tracing is enabled, otherwise a shared no-op context.
+
+    carrier holds incoming request headers, so a trace started by the caller is continued.
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    context = propagate.extract(carrier) if carrier is not None else None
+    return _tracer.start_as_current_span(name, context=context, attributes=attributes or None)
+
+@functools.lru_cache(maxsize=None)
+def _child(histogram: Histogram, *labels: str):
+    # Label values come from code, not requests, so the cache stays small;
+    # it saves the locked lookup labels() does on every call
+    return histogram.labels(*labels)
+
+class _Timer:
+    """Observe the time spent in a with block, inside a tracing span when tracing is enabled"""
+    __slots__ = ("_histogram", "_span", "_started")
+
+    def __init__(self, histogram, span_context):
+        self._histogram = histogram
+        self._span = span_context
+
+    def __enter__(self):
+        self._span.__enter__()
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+        return self._span.__exit__(*exc_info)
+
+def observe_stage(pipeline: str, name: str, seconds: float):
+    _child(STAGE_SECONDS, pipeline, name).observe(seconds)
+
+def stage(pipeline: str, name: str) -> _Timer:
+    """Time a stage of ingestion or of a chat query, inside a span of the same name"""
+    return _Timer(_child(STAGE_SECONDS, pipeline, name), span(f"{pipeline}.{name}"))
+
+async def timed_stage(pipeline: str, name: str, awaitable: Awaitable[T]) -> T:
+    """Await one of several concurrent stages, timing it on its own"""
+    with stage(pipeline, name):
+        return await awaitable
+
+def dependency(name: str, operation: str) -> _Timer:
+    """Time a call to a backing service such as Qdrant or Redis"""
+    return _Timer(_child(DEPENDENCY_SECONDS, name, operation), span(f"{name}.{operation}"))
+
+def timed_dependency(name: str, operation: str) -> Callable:
+    """Decorate an async method whose whole call is one round trip to a backing service"""
+    def decorator(function: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs) -> T:
+            with dependency(name, operation):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instrument_engine(database_engine: AsyncEngine):
+    """Time every statement an engine executes, labelled by the database and the statement's verb"""
+    sync_engine = database_engine.sync_engine
+    name = sync_engine.dialect.name
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info["statement_started"].pop()
+        verb = statement.lstrip()[:6].lower()
+        _child(DEPENDENCY_SECONDS, name, verb if verb in _SQL_OPERATIONS else "other").observe(elapsed)
+
+    def handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("statement_started"):
+            connection.info["statement_started"].pop()
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine, "handle_error", handle_error)
+
+def latest_metrics() -> tuple[bytes, str]:
+    """Render every metric in the Prometheus text format, with its content type.
+
+    With PROMETHEUS_MULTIPROC_DIR set (several uvicorn workers), the samples of all workers are merged.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,89 @@
+"""Chat throughput in queries/sec: single-query requests vs. the batch endpoint.
+
+Runs against a live server (uvicorn app.main:app). A document is uploaded first
+so searches have something to find, then the same number of distinct questions
+is answered through POST /api/v1/chat/query (with concurrent clients) and
+through POST /api/v1/chat/query-batch. Each phase uses its own questions, so
+neither benefits from the other's cached embeddings or search results.
+
+Usage: python -m benchmarks.chat_batch_throughput --base-url http://localhost:8000 \
+           [--queries 2000] [--concurrency 16] [--batch-size 200] [--search-mode vector]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.embedding_throughput import make_chunks
+
+def make_questions(count: int, seed: int) -> list[str]:
+    """Short questions drawn from the uploaded document's vocabulary"""
+    words = make_chunks(1, chunk_size=20000)[0].split()
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(words, k=rng.randint(3, 8))) for _ in range(count)]
+
+async def upload_document(client: httpx.AsyncClient, paragraphs: int):
+    document = "\n\n".join(make_chunks(paragraphs, chunk_size=400)).encode()
+    response = await client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("chat-batch-benchmark.txt", document, "text/plain")},
+        data={"chunking_strategy": "fixed_size"}
+    )
+    response.raise_for_status()
+    if response.status_code == 202:
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await client.get(f"/api/v1/documents/jobs/{job_id}")).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.2)
+
+async def run_single(client: httpx.AsyncClient, questions: list[str], concurrency: int, search_mode: str) -> float:
+    pending = iter(enumerate(questions))
+
+    async def worker():
+        for i, question in pending:
+            response = await client.post(
+                "/api/v1/chat/query",
+                json={"message": question, "session_id": f"bench-single-{i % 100}", "search_mode": search_mode}
+            )
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+async def run_batched(client: httpx.AsyncClient, questions: list[str], batch_size: int, search_mode: str) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(questions), batch_size):
+        batch = [
+            {"session_id": f"bench-batch-{i % 100}", "message": question}
+            for i, question in enumerate(questions[start:start + batch_size], start)
+        ]
+        response = await client.post("/api/v1/chat/query-batch", json={"queries": batch, "search_mode": search_mode})
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300, limits=limits) as client:
+        await upload_document(client, args.paragraphs)
+        single = await run_single(client, make_questions(args.queries, seed=1), args.concurrency, args.search_mode)
+        batched = await run_batched(client, make_questions(args.queries, seed=2), args.batch_size, args.search_mode)
+
+    print(f"{args.queries} queries, {args.search_mode} search")
+    print(f"{'endpoint':<40} {'seconds':>8} {'queries/s':>10}")
+    print(f"{f'/chat/query ({args.concurrency} concurrent)':<40} {single:>8.2f} {args.queries / single:>10.1f}")
+    print(f"{f'/chat/query-batch ({args.batch_size} per request)':<40} {batched:>8.2f} {args.queries / batched:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--search-mode", choices=["vector", "keyword", "hybrid"], default="vector")
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
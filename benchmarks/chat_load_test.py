@@ -0,0 +1,109 @@
+"""Load test: chat latency percentiles with and without concurrent document uploads.
+
+Runs against a live server (uvicorn app.main:app). Start the server from the
+commit you want to measure and run this script against it to compare
+before/after numbers.
+
+Usage: python -m benchmarks.chat_load_test --base-url http://localhost:8000 \
+           [--chat-concurrency 16] [--uploaders 2] [--duration 20] [--upload-kb 2048]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+QUESTIONS = [
+    "What is the refund policy?",
+    "How do I configure the network settings?",
+    "Which documents mention the release schedule?",
+    "Summarize the installation steps",
+    "hello",
+]
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def make_document(size_kb: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    words = ["policy", "refund", "install", "network", "release", "schedule", "customer",
+             "support", "configure", "document", "service", "account", "update", "manual"]
+    sentences = []
+    size = 0
+    while size < size_kb * 1024:
+        sentence = " ".join(rng.choice(words) for _ in range(12)).capitalize() + ". "
+        sentences.append(sentence)
+        size += len(sentence)
+    return "".join(sentences).encode()
+
+async def chat_worker(client: httpx.AsyncClient, worker_id: int, deadline: float,
+                      latencies: list[float], errors: list[int]):
+    session_id = f"load-test-{worker_id}"
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/v1/chat/query",
+                json={"message": random.choice(QUESTIONS), "session_id": session_id}
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors.append(1)
+
+async def upload_worker(client: httpx.AsyncClient, worker_id: int, deadline: float,
+                        size_kb: int, uploads: list[float]):
+    document = make_document(size_kb, worker_id)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/v1/documents/upload",
+                files={"file": (f"load-test-{worker_id}.txt", document, "text/plain")},
+                data={"chunking_strategy": "fixed_size"}
+            )
+            response.raise_for_status()
+            uploads.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+
+async def run_phase(base_url: str, chat_concurrency: int, uploaders: int, duration: float, upload_kb: int) -> dict:
+    latencies, errors, uploads = [], [], []
+    limits = httpx.Limits(max_connections=chat_concurrency + uploaders)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+        tasks = [chat_worker(client, i, deadline, latencies, errors) for i in range(chat_concurrency)]
+        tasks += [upload_worker(client, i, deadline, upload_kb, uploads) for i in range(uploaders)]
+        await asyncio.gather(*tasks)
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "qps": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else float("nan"),
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else float("nan"),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "uploads": len(uploads),
+    }
+
+async def main(args):
+    print(f"{'phase':<16} {'reqs':>6} {'errors':>6} {'qps':>8} {'p50 ms':>8} {'p99 ms':>8} {'uploads':>8}")
+    for name, uploaders in [("chat only", 0), ("chat + uploads", args.uploaders)]:
+        result = await run_phase(args.base_url, args.chat_concurrency, uploaders, args.duration, args.upload_kb)
+        print(
+            f"{name:<16} {result['requests']:>6} {result['errors']:>6} {result['qps']:>8.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['uploads']:>8}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--chat-concurrency", type=int, default=16)
+    parser.add_argument("--uploaders", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--upload-kb", type=int, default=2048)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""Redis round trips, commands and bytes per chat turn: legacy per-message writes vs. ChatMemory.
+
+Each turn stores a question and a RAG-style answer the way the chat endpoint
+does, then the history is read back. Traffic is counted at the connection, so
+the numbers are what goes over the wire. ChatMemory sessions are compacted
+every CHAT_COMPACTION_BATCH messages, as the background ChatCompactor would, and
+that traffic is reported separately. The stored size of a long session shows the
+effect of keeping only the window and a bounded summary.
+
+Runs against the Redis at REDIS_HOST/REDIS_PORT, or an in-process fakeredis with --fake.
+
+Usage: python -m benchmarks.chat_memory_ops [--turns 200] [--fake]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import redis.asyncio as redis
+
+from app.services.chat_memory import ChatMemory
+from benchmarks.embedding_throughput import make_chunks
+
+class LegacyChatMemory:
+    """The previous ChatMemory writes: RPUSH then EXPIRE per message, ASCII-escaped JSON, no trimming"""
+
+    def __init__(self, redis_client: redis.Redis):
+        self.redis_client = redis_client
+
+    async def add_message(self, session_id: str, message: dict[str, str]):
+        key = f"chat_session:{session_id}"
+        await self.redis_client.rpush(key, json.dumps(message))
+        await self.redis_client.expire(key, 3600)
+
+    async def add_turn(self, session_id: str, messages: list[dict[str, str]]):
+        # process_query called add_message once per message
+        for message in messages:
+            await self.add_message(session_id, message)
+
+    async def get_messages(self, session_id: str, limit: int = 10) -> list[dict[str, str]]:
+        messages = await self.redis_client.lrange(f"chat_session:{session_id}", -limit, -1)
+        return [json.loads(msg) for msg in messages]
+
+def counting_client(fake: bool) -> tuple[redis.Redis, dict[str, int]]:
+    """A client whose connections tally round trips and bytes sent"""
+    traffic = {"round_trips": 0, "bytes": 0}
+    if fake:
+        import fakeredis.aioredis
+        client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    else:
+        client = redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=int(os.getenv("REDIS_PORT", 6379)),
+                             decode_responses=True)
+    pool = client.connection_pool
+
+    class CountingConnection(pool.connection_class):
+        async def send_packed_command(self, command, check_health: bool = True):
+            packed = [command] if isinstance(command, (bytes, str)) else list(command)
+            traffic["round_trips"] += 1
+            traffic["bytes"] += sum(len(part.encode() if isinstance(part, str) else part) for part in packed)
+            await super().send_packed_command(packed, check_health)
+
+    pool.connection_class = CountingConnection
+    return client, traffic
+
+def make_turns(count: int) -> list[list[dict[str, str]]]:
+    questions = make_chunks(count, chunk_size=60, seed=11)
+    excerpts = make_chunks(count, chunk_size=800, seed=12)
+    return [
+        [
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": f"I found 3 relevant document(s) that match your query:\n\n{excerpt}...\n\n"
+                                             "✅ Interview scheduled for José Müller at 10:30 AM."}
+        ]
+        for question, excerpt in zip(questions, excerpts)
+    ]
+
+async def measure(memory, client: redis.Redis, traffic: dict[str, int], turns: list[list[dict[str, str]]],
+                  compact_every: int = 0) -> dict:
+    """Write every turn to one session, compacting every compact_every turns as the background worker would"""
+    session_id = f"bench-{uuid.uuid4()}"
+    traffic.update(round_trips=0, bytes=0)
+    compaction = {"round_trips": 0, "bytes": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    for i, messages in enumerate(turns, 1):
+        await memory.add_turn(session_id, messages)
+        if compact_every and i % compact_every == 0:
+            # Compaction runs off the request path, so it is tallied separately
+            before, compaction_started = dict(traffic), time.perf_counter()
+            await memory.compact(session_id)
+            compaction["seconds"] += time.perf_counter() - compaction_started
+            compaction["round_trips"] += traffic["round_trips"] - before["round_trips"]
+            compaction["bytes"] += traffic["bytes"] - before["bytes"]
+            traffic.update(before)
+    elapsed = time.perf_counter() - started - compaction["seconds"]
+    writes = dict(traffic)
+    history = await memory.get_messages(session_id)
+
+    key, summary_key = f"chat_session:{session_id}", f"chat_summary:{session_id}"
+    stored = await client.lrange(key, 0, -1)
+    summary = await client.get(summary_key) or ""
+    await client.delete(key, summary_key)
+    return {
+        "round_trips": writes["round_trips"] / len(turns),
+        "bytes": writes["bytes"] / len(turns),
+        "ms": elapsed / len(turns) * 1000,
+        "compaction_round_trips": compaction["round_trips"] / len(turns),
+        "stored_messages": len(stored),
+        "stored_bytes": sum(len(value.encode("utf-8")) for value in stored) + len(summary.encode("utf-8")),
+        "history_bytes": len(json.dumps(history).encode("utf-8"))
+    }
+
+async def main(turn_count: int, fake: bool):
+    client, traffic = counting_client(fake)
+    turns = make_turns(turn_count)
+    memory = ChatMemory(redis_client=client)
+    rows = [
+        ("legacy add_message x2", await measure(LegacyChatMemory(client), client, traffic, turns)),
+        ("ChatMemory.add_turn", await measure(memory, client, traffic, turns, compact_every=memory.compaction_batch // 2))
+    ]
+    await client.aclose()
+
+    print(f"{turn_count} turns in one session{' (fakeredis)' if fake else ''}")
+    print(f"{'writer':<22} {'trips/turn':>10} {'bytes/turn':>10} {'ms/turn':>8} {'compaction trips/turn':>21} "
+          f"{'stored msgs':>11} {'stored bytes':>12} {'history bytes':>13}")
+    for label, row in rows:
+        print(f"{label:<22} {row['round_trips']:>10.1f} {row['bytes']:>10.0f} {row['ms']:>8.3f} "
+              f"{row['compaction_round_trips']:>21.2f} {row['stored_messages']:>11} {row['stored_bytes']:>12} "
+              f"{row['history_bytes']:>13}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--fake", action="store_true", help="use an in-process fakeredis instead of a Redis server")
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.fake))
@@ -0,0 +1,62 @@
+"""Time to first byte of /chat/query vs. the streaming /chat/query-stream endpoint.
+
+Runs against a live server (uvicorn app.main:app). For the streaming endpoint
+the first byte is the sources event; the server's own measurement from the
+Server-Timing header is reported alongside the client-side numbers.
+
+Usage: python -m benchmarks.chat_stream_ttfb --base-url http://localhost:8000 [--queries 300] [--search-mode vector]
+"""
+import argparse
+import asyncio
+import re
+import time
+
+import httpx
+
+from benchmarks.chat_batch_throughput import make_questions, upload_document
+from benchmarks.chat_load_test import percentile
+
+async def time_query(client: httpx.AsyncClient, question: str, search_mode: str) -> float:
+    started = time.perf_counter()
+    response = await client.post("/api/v1/chat/query", json={"message": question, "session_id": "bench-ttfb", "search_mode": search_mode})
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+async def time_stream(client: httpx.AsyncClient, question: str, search_mode: str) -> tuple[float, float, float]:
+    """Client TTFB, total time and the server-reported TTFB of one streamed answer"""
+    started = time.perf_counter()
+    payload = {"message": question, "session_id": "bench-ttfb-stream", "search_mode": search_mode}
+    async with client.stream("POST", "/api/v1/chat/query-stream", json=payload) as response:
+        response.raise_for_status()
+        chunks = response.aiter_raw()
+        await chunks.__anext__()
+        first_byte = time.perf_counter() - started
+        async for _ in chunks:
+            pass
+        server = float(re.search(r"ttfb;dur=([\d.]+)", response.headers["server-timing"]).group(1)) / 1000
+    return first_byte, time.perf_counter() - started, server
+
+def summary(label: str, values: list[float]):
+    print(f"{label:<34} {percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f}")
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300) as client:
+        await upload_document(client, args.paragraphs)
+        # Separate questions per endpoint, so neither is served from the other's caches
+        query_times = [await time_query(client, question, args.search_mode) for question in make_questions(args.queries, seed=3)]
+        streams = [await time_stream(client, question, args.search_mode) for question in make_questions(args.queries, seed=4)]
+
+    print(f"{args.queries} queries per endpoint, {args.search_mode} search")
+    print(f"{'measurement':<34} {'p50 ms':>8} {'p95 ms':>8}")
+    summary("/chat/query time to first byte", query_times)
+    summary("/chat/query-stream first byte", [first for first, _, _ in streams])
+    summary("/chat/query-stream server ttfb", [server for _, _, server in streams])
+    summary("/chat/query-stream complete", [total for _, total, _ in streams])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--search-mode", choices=["vector", "keyword", "hybrid"], default="vector")
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
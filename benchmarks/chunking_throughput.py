@@ -0,0 +1,58 @@
+"""Chunking throughput (MB/s and chunks/s) per strategy on a large synthetic text file.
+
+The file is streamed through iter_txt_blocks, as ingestion reads TXT uploads, so
+the numbers include block reads but not embedding or storage.
+
+Usage: python -m benchmarks.chunking_throughput [--megabytes 50] [--strategies fixed_size semantic recursive]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.utils.chunking import get_streaming_chunker
+from app.utils.file_processing import iter_txt_blocks
+from benchmarks.embedding_throughput import SYLLABLES
+
+def write_corpus(path: str, megabytes: int, seed: int = 5):
+    """Paragraphs of 2-8 sentences with some line-broken lists, about megabytes MB of text"""
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(5000)]
+    target = megabytes * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            sentences = [
+                " ".join(rng.choices(words, k=rng.randint(6, 24))).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+                for _ in range(rng.randint(2, 8))
+            ]
+            paragraph = " ".join(sentences)
+            if rng.random() < 0.15:
+                paragraph += "\n" + "\n".join(f"- {' '.join(rng.choices(words, k=5))}" for _ in range(rng.randint(2, 5)))
+            written += f.write(paragraph + "\n\n")
+
+def measure(path: str, strategy: str) -> tuple[float, int]:
+    chunker = get_streaming_chunker(strategy)
+    blocks = ((text, page) for text, page, _ in iter_txt_blocks(path))
+    started = time.perf_counter()
+    count = sum(1 for _ in chunker(blocks))
+    return time.perf_counter() - started, count
+
+def main(megabytes: int, strategies: list[str]):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "corpus.txt")
+        write_corpus(path, megabytes)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"{size_mb:.1f} MB of text")
+        print(f"{'strategy':<12} {'seconds':>8} {'MB/s':>8} {'chunks':>9} {'chunks/s':>10}")
+        for strategy in strategies:
+            elapsed, count = measure(path, strategy)
+            print(f"{strategy:<12} {elapsed:>8.2f} {size_mb / elapsed:>8.1f} {count:>9} {count / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=50)
+    parser.add_argument("--strategies", nargs="+", default=["fixed_size", "semantic", "recursive"])
+    args = parser.parse_args()
+    main(args.megabytes, args.strategies)
@@ -0,0 +1,61 @@
+"""Synthetic document generators shared by the benchmarks."""
+import random
+
+WORDS = ["policy", "refund", "install", "network", "release", "schedule", "customer", "support",
+         "configure", "document", "service", "account", "update", "manual", "warranty", "device",
+         "firmware", "battery", "interface", "security", "password", "backup", "restore", "license"]
+
+def make_sentences(count: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+            for _ in range(count)]
+
+def make_text(size_bytes: int, seed: int = 7) -> str:
+    """Plain text of roughly size_bytes made of short paragraphs"""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < size_bytes:
+        paragraph = " ".join(make_sentences(rng.randint(3, 8), seed=rng.random())) + "\n\n"
+        parts.append(paragraph)
+        size += len(paragraph)
+    return "".join(parts)
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages: int, lines_per_page: int = 45, seed: int = 7) -> bytes:
+    """A minimal multi-page PDF with one Helvetica text stream per page"""
+    sentences = make_sentences(pages * lines_per_page, seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = sentences[page * lines_per_page:(page + 1) * lines_per_page]
+        operations = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        operations += [f"({_escape(line)}) '" for line in lines]
+        operations.append("ET")
+        content = "\n".join(operations).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
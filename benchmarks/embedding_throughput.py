@@ -0,0 +1,74 @@
+"""Compare chunks/sec of the batch embedding engine against the legacy per-text loop.
+
+Usage: python -m benchmarks.embedding_throughput [--sizes 1000 10000 100000]
+"""
+import argparse
+import random
+import re
+import time
+
+import numpy as np
+
+from app.services.vectorizer import WordFrequencyVectorizer
+
+SYLLABLES = ["re", "tri", "val", "doc", "u", "ment", "vec", "tor", "search", "in", "ter",
+             "view", "sche", "dule", "chunk", "po", "li", "cy", "sup", "port", "ser", "vice"]
+
+def make_chunks(count: int, chunk_size: int = 512, seed: int = 7) -> list[str]:
+    """Generate synthetic chunks of roughly chunk_size characters"""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(3000)]
+    vocabulary += ["2024", "v1.2", "e.g.", "(see", "below)", "step-by-step"]
+    chunks = []
+    for _ in range(count):
+        words = []
+        size = 0
+        while size < chunk_size:
+            word = rng.choice(vocabulary)
+            words.append(word)
+            size += len(word) + 1
+        chunks.append(" ".join(words))
+    return chunks
+
+def legacy_embeddings(texts: list[str], vocabulary: dict[str, int], vector_size: int = 300) -> list[list[float]]:
+    """Per-text embedding loop the service used before the batch engine"""
+    embeddings = []
+    for text in texts:
+        embedding = [0.0] * vector_size
+        words = re.findall(r'\b[a-zA-Z]{3,15}\b', text.lower())
+        word_count = len(words)
+        for word in words:
+            if word in vocabulary:
+                idx = vocabulary[word]
+                if idx < vector_size:
+                    embedding[idx] += 1.0 / max(1, word_count)
+        norm = max(0.001, np.linalg.norm(embedding))
+        embeddings.append([x / norm for x in embedding])
+    return embeddings
+
+def run(sizes: list[int]):
+    vectorizer = WordFrequencyVectorizer()
+    vectorizer.fit(make_chunks(200, seed=1))
+
+    print(f"{'chunks':>8} {'legacy/s':>12} {'batch/s':>12} {'speedup':>8} {'max diff':>10}")
+    for size in sizes:
+        texts = make_chunks(size)
+
+        start = time.perf_counter()
+        legacy = legacy_embeddings(texts, vectorizer.vocabulary)
+        legacy_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = vectorizer.transform(texts)
+        batch_elapsed = time.perf_counter() - start
+
+        max_diff = float(np.abs(np.asarray(legacy, dtype=np.float32) - batch).max())
+        print(
+            f"{size:>8} {size / legacy_elapsed:>12.0f} {size / batch_elapsed:>12.0f} "
+            f"{legacy_elapsed / batch_elapsed:>7.1f}x {max_diff:>10.2e}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,95 @@
+"""Queries/sec of full-collection vector search against searches scoped by payload filters.
+
+Points are spread over many documents, each with a filename, chunking strategy
+and upload time, as ingestion stores them. Runs against the local vector store
+and, with --qdrant-url, a Qdrant server (":memory:" uses qdrant-client's local mode,
+which ignores payload indexes).
+
+Usage: python -m benchmarks.filtered_search [--vectors 200000] [--documents 2000] [--qdrant-url http://localhost:6333]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.services.vector_store import LocalVectorStore, QdrantVectorStore, VectorStore
+from benchmarks.vector_store import DIM, make_vectors
+
+def make_points(vectors: np.ndarray, documents: int) -> list[dict]:
+    per_document = max(1, len(vectors) // documents)
+    return [
+        {
+            "id": str(uuid.UUID(int=i)),
+            "vector": vector,
+            "payload": {
+                "document_id": f"doc-{i // per_document}",
+                "filename": f"report-{i // per_document % 50}.pdf",
+                "chunking_strategy": "semantic" if i // per_document % 2 else "fixed_size",
+                "uploaded_at": 1700000000.0 + 3600 * (i // per_document),
+                "text": ""
+            }
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+async def load(store: VectorStore, points: list[dict], batch_size: int = 1024):
+    await store.ensure_collection(DIM)
+    for start in range(0, len(points), batch_size):
+        await store.upsert(points[start:start + batch_size])
+
+async def measure(label: str, store: VectorStore, queries: np.ndarray, filters: dict | None, top_k: int):
+    # The local store builds a field's value index on the first query that filters on it
+    await store.search(queries[0], top_k, filters)
+    started = time.perf_counter()
+    for query in queries:
+        await store.search(query, top_k, filters)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<44} {len(queries) / elapsed:>10.0f} {elapsed / len(queries) * 1000:>9.2f}")
+
+async def run(name: str, store: VectorStore, points: list[dict], queries: np.ndarray, documents: int, top_k: int):
+    await load(store, points)
+    print(f"\n{name}: {len(points)} vectors in {documents} documents")
+    print(f"{'scope':<44} {'queries/s':>10} {'mean ms':>9}")
+    await measure("whole collection", store, queries, None, top_k)
+    await measure("one document (document_id)", store, queries, {"document_id": "doc-7"}, top_k)
+    await measure("ten documents (document_id in list)", store, queries,
+                  {"document_id": [f"doc-{i}" for i in range(0, documents, documents // 10 or 1)][:10]}, top_k)
+    await measure("one filename (~2% of points)", store, queries, {"filename": "report-3.pdf"}, top_k)
+    await measure("filename + chunking strategy", store, queries,
+                  {"filename": "report-3.pdf", "chunking_strategy": "semantic"}, top_k)
+    await measure("uploaded in the last 10% of the time range", store, queries,
+                  {"uploaded_at": {"gte": 1700000000.0 + 3600 * documents * 0.9}}, top_k)
+
+async def main(vector_count: int, documents: int, query_count: int, top_k: int, qdrant_url: str | None):
+    centres = np.random.default_rng(0).standard_normal((256, DIM)).astype(np.float32)
+    points = make_points(make_vectors(vector_count, centres), documents)
+    queries = make_vectors(query_count, centres, seed=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, index="exact")
+        await run("local exact store", store, points, queries, documents, top_k)
+        await store.close()
+
+    if qdrant_url:
+        from qdrant_client import AsyncQdrantClient
+
+        client = AsyncQdrantClient(location=qdrant_url) if qdrant_url == ":memory:" else AsyncQdrantClient(url=qdrant_url)
+        store = QdrantVectorStore(client, collection_name=f"filtered_search_benchmark_{uuid.uuid4().hex[:8]}")
+        try:
+            await run(f"qdrant {qdrant_url}", store, points, queries, documents, top_k)
+        finally:
+            await client.delete_collection(store.collection_name)
+            await client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--qdrant-url")
+    args = parser.parse_args()
+    asyncio.run(main(args.vectors, args.documents, args.queries, args.top_k, args.qdrant_url))
@@ -0,0 +1,90 @@
+"""Latency percentiles of vector, BM25 keyword and hybrid (RRF) search over a synthetic corpus.
+
+Chunks go into a temporary SQLite database (document_chunks + chunk_fts) and a
+local exact vector store, the same way ingestion writes them.
+
+Usage: python -m benchmarks.hybrid_search [--chunks 20000] [--queries 500]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import uuid
+
+# The vectorizer reloads its vocabulary from VOCABULARY_PATH, so point it away from the app's data directory
+_workdir = tempfile.TemporaryDirectory()
+os.environ["VOCABULARY_PATH"] = os.path.join(_workdir.name, "vocabulary.npy")
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.database import Base, Document, DocumentChunk, create_chunk_fts, create_database_engine
+from app.services.embedding_service import EmbeddingService
+from app.services.keyword_index import KeywordIndex
+from app.services.search_service import SearchService
+from app.services.vector_store import LocalVectorStore
+from benchmarks.embedding_throughput import make_chunks
+
+async def build(chunk_count: int) -> tuple[SearchService, list[str]]:
+    engine = create_database_engine(f"sqlite+aiosqlite:///{os.path.join(_workdir.name, 'bench.db')}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(create_chunk_fts)
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    embedding_service = EmbeddingService()
+    keyword_index = KeywordIndex(sessions)
+    await embedding_service.attach_vector_store(LocalVectorStore(os.path.join(_workdir.name, "vectors")))
+
+    texts = make_chunks(chunk_count)
+    embedding_service.refit_vocabulary(texts[:10000])
+    for start in range(0, chunk_count, 1024):
+        batch = [{"text": chunk, "metadata": {}} for chunk in texts[start:start + 1024]]
+        embedding_ids = await embedding_service.store_embeddings(batch, f"doc-{start // 1024}", first_index=start)
+        async with sessions() as db:
+            # Keyword search reads each chunk's tenant from its documents row
+            db.add(Document(id=f"doc-{start // 1024}", filename=f"doc-{start // 1024}.txt", chunking_strategy="fixed_size"))
+            await db.execute(insert(DocumentChunk.__table__), [
+                {"id": str(uuid.uuid4()), "document_id": f"doc-{start // 1024}", "chunk_text": chunk["text"],
+                 "chunk_index": start + i, "chunk_metadata": {}, "embedding_id": embedding_id}
+                for i, (chunk, embedding_id) in enumerate(zip(batch, embedding_ids))
+            ])
+            await db.commit()
+    return SearchService(embedding_service, keyword_index), texts
+
+def make_queries(texts: list[str], count: int, seed: int = 11) -> list[str]:
+    """Short queries made of words drawn from random chunks"""
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(rng.choice(texts).split(), 3)) for _ in range(count)]
+
+async def measure(search_service: SearchService, queries: list[str], mode: str, top_k: int):
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in queries:
+            started = time.perf_counter()
+            await search_service.search(query, top_k, mode)
+            latencies.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{mode:<8} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {len(queries) / (sum(latencies) / 1000):>10.0f}")
+
+async def main(chunk_count: int, query_count: int, top_k: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        search_service, texts = await build(chunk_count)
+    queries = make_queries(texts, query_count)
+    print(f"{chunk_count} chunks, {query_count} queries, top {top_k}")
+    print(f"{'mode':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries/s':>10}")
+    for mode in ("vector", "keyword", "hybrid"):
+        await measure(search_service, queries, mode, top_k)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.chunks, args.queries, args.top_k))
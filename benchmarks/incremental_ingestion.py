@@ -0,0 +1,96 @@
+"""Cost of re-uploading a document: unchanged, lightly edited, and re-ingested from scratch.
+
+Documents are ingested with DocumentIngestionService into a temporary SQLite
+database and a local vector store. An edited version re-embeds only the chunks
+whose text changed; the from-scratch row ingests the same edit as a new document,
+which is what every re-upload cost before content hashing.
+
+Usage: python -m benchmarks.incremental_ingestion [--paragraphs 4000] [--edit-fraction 0.05]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import uuid
+
+# Settings are read at import time, so point the database and vocabulary at a scratch directory first
+_workdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir.name, 'bench.db')}"
+os.environ["VOCABULARY_PATH"] = os.path.join(_workdir.name, "vocabulary.npy")
+
+from app.models.database import DEFAULT_TENANT, create_tables
+from app.services.document_ingestion import DocumentIngestionService
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_store import LocalVectorStore
+from benchmarks.embedding_throughput import make_chunks
+
+STRATEGY = "semantic"
+
+def write_version(paragraphs: list[str]) -> str:
+    path = os.path.join(_workdir.name, f"{uuid.uuid4()}.txt")
+    with open(path, "w") as f:
+        f.write("\n\n".join(f"{paragraph}." for paragraph in paragraphs))
+    return path
+
+async def upload(service: DocumentIngestionService, path: str, filename: str,
+                 deduplicate: bool = True) -> tuple[float, dict]:
+    """Time an upload the way the API handles it: hash, look up, then ingest unless unchanged"""
+    started = time.perf_counter()
+    with open(path, "rb") as source:
+        file_path, document_id, file_size, content_hash = await service.save_upload(source, filename)
+    existing = None
+    if deduplicate:
+        existing = await service.find_existing(DEFAULT_TENANT, filename, content_hash, STRATEGY)
+    else:
+        content_hash = None
+    if existing is not None and existing.content_hash == content_hash:
+        os.remove(file_path)
+        result = {"chunk_count": existing.document_metadata["chunk_count"], "reused_chunks": existing.document_metadata["chunk_count"]}
+    else:
+        if existing is not None:
+            document_id = existing.id
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = await service.process_document(
+                file_path, document_id, filename, STRATEGY, file_size, content_hash=content_hash
+            )
+    return time.perf_counter() - started, result
+
+async def main(paragraph_count: int, edit_fraction: float):
+    await create_tables()
+    embedding_service = EmbeddingService()
+    await embedding_service.attach_vector_store(LocalVectorStore(os.path.join(_workdir.name, "vectors", "documents"), index="exact"))
+    service = DocumentIngestionService(embedding_service)
+    os.chdir(_workdir.name)  # uploads/ is created relative to the working directory
+
+    paragraphs = make_chunks(paragraph_count, chunk_size=400)
+    rng = random.Random(3)
+    edited = list(paragraphs)
+    for i in rng.sample(range(paragraph_count), int(paragraph_count * edit_fraction)):
+        edited[i] = make_chunks(1, chunk_size=400, seed=rng.randrange(1 << 30))[0]
+    original_path, edited_path = write_version(paragraphs), write_version(edited)
+
+    print(f"{paragraph_count} paragraphs, {edit_fraction:.0%} edited, {STRATEGY} chunking")
+    print(f"{'upload':<34} {'seconds':>8} {'chunks':>7} {'embedded':>9}")
+    rows = [
+        ("first upload", original_path, "report.txt", True),
+        ("identical re-upload", original_path, "report.txt", True),
+        ("edited re-upload (incremental)", edited_path, "report.txt", True),
+        ("edited upload from scratch", edited_path, "report-copy.txt", False)
+    ]
+    for label, path, filename, deduplicate in rows:
+        elapsed, result = await upload(service, path, filename, deduplicate)
+        embedded = result["chunk_count"] - result.get("reused_chunks", 0)
+        print(f"{label:<34} {elapsed:>8.2f} {result['chunk_count']:>7} {embedded:>9}")
+    print(f"vectors stored: {await embedding_service.vector_store.count()}")
+    await embedding_service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=4000)
+    parser.add_argument("--edit-fraction", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.paragraphs, args.edit_fraction))
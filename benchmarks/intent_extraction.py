@@ -0,0 +1,118 @@
+"""Messages/sec of intent classification and booking extraction: legacy keyword scans vs. the compiled engine.
+
+Both run the per-message work RAGService does: classify greeting/thanks/booking,
+and extract name, email, date and time from booking requests.
+
+Usage: python -m benchmarks.intent_extraction [--messages 50000] [--rounds 5]
+"""
+import argparse
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+from app.services.intent import BOOKING, detect_intents, extract_booking_info
+
+QUESTIONS = [
+    "What is the refund policy for annual plans?",
+    "How do I configure the network settings on the gateway?",
+    "Which documents mention the release schedule for this quarter?",
+    "Summarize the installation steps in the admin manual",
+    "Is shipping included in the price of the premium tier?",
+]
+GREETINGS = ["hello", "Hi there!", "hello, anyone around?", "Thanks a lot", "thank you, that helped"]
+NAMES = ["John Smith", "Jane Doe", "Alice Brown", "Bob Lee", "Mary Ann Jones"]
+WHEN = ["tomorrow at 10:30 AM", "on Friday morning", "next monday 3pm", "on March 5th at 2:15", "2026-11-02 afternoon", "in 3 days at 9am"]
+
+def make_messages(count: int, seed: int = 21) -> list[str]:
+    """Mostly document questions, with greetings and booking requests mixed in"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.7:
+            messages.append(rng.choice(QUESTIONS))
+        elif kind < 0.85:
+            messages.append(rng.choice(GREETINGS))
+        else:
+            name = rng.choice(NAMES)
+            email = name.lower().replace(" ", ".") + "@example.com"
+            messages.append(f"Please book an interview for {name} {rng.choice(WHEN)}, email {email}")
+    return messages
+
+def legacy_extract_booking_info(text: str) -> dict[str, str]:
+    """RAGService.extract_booking_info before the intent engine"""
+    booking_info = {}
+    name_patterns = [
+        r'(?:name is|my name is|called)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'(?:with|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)',
+        r'([A-Z][a-z]+\s+[A-Z][a-z]+)(?:\s+for interview|\s+at|\s+on)'
+    ]
+    for pattern in name_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            booking_info['name'] = match.group(1).strip()
+            break
+    email_match = re.search(r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', text)
+    if email_match:
+        booking_info['email'] = email_match.group(1)
+    time_match = re.search(r'(\d{1,2}:\d{2}\s*(?:AM|PM)?)', text, re.IGNORECASE)
+    if time_match:
+        booking_info['time'] = time_match.group(1)
+    elif 'morning' in text.lower():
+        booking_info['time'] = '09:00 AM'
+    elif 'afternoon' in text.lower():
+        booking_info['time'] = '02:00 PM'
+    if 'tomorrow' in text.lower():
+        booking_info['date'] = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+    else:
+        for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday'):
+            if day in text.lower():
+                booking_info['date'] = f'next {day.capitalize()}'
+                break
+    return booking_info
+
+def legacy(message: str):
+    greeting = "hello" in message.lower() or "hi" in message.lower()
+    thanks = "thank" in message.lower()
+    if any(keyword in message.lower() for keyword in ['schedule', 'book', 'interview', 'meeting', 'appointment']):
+        legacy_extract_booking_info(message)
+    return greeting, thanks
+
+def engine(message: str):
+    intents = detect_intents(message)
+    if BOOKING in intents:
+        extract_booking_info(message)
+    return intents
+
+def measure(function, messages: list[str]) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        function(message)
+    return time.perf_counter() - started
+
+def main(count: int, rounds: int):
+    # Every message text is distinct, as in real traffic
+    messages = [f"{message} #{i}" for i, message in enumerate(make_messages(count))]
+    # dateparser imports and compiles its patterns on first use; that one-off cost is not per message
+    for message in make_messages(1000, seed=7):
+        legacy(message)
+        engine(message)
+    bookings = sum(BOOKING in detect_intents(message) for message in messages)
+    runs = [("legacy keyword scans", legacy), ("intent engine", engine)]
+    best = [float("inf")] * len(runs)
+    # Rounds alternate between implementations and the fastest round counts, so a noisy
+    # machine slows every implementation alike instead of whichever ran during the noise
+    for _ in range(rounds):
+        best = [min(elapsed, measure(function, messages)) for elapsed, (_, function) in zip(best, runs)]
+    print(f"{count} messages, {bookings} booking requests, best of {rounds} rounds")
+    print(f"{'implementation':<22} {'seconds':>8} {'messages/s':>11}")
+    for (label, _), elapsed in zip(runs, best):
+        print(f"{label:<22} {elapsed:>8.2f} {count / elapsed:>11.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    main(args.messages, args.rounds)
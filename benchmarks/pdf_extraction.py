@@ -0,0 +1,47 @@
+"""Compare sequential PDF text extraction with page ranges extracted across a process pool.
+
+Usage: python -m benchmarks.pdf_extraction [--pages 500] [--workers 1 2 4 8] [--pages-per-task 16]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app.utils.file_processing import iter_pdf_pages, iter_pdf_pages_parallel
+from benchmarks.corpus import make_pdf
+
+def run(pages: int, workers: list[int], pages_per_task: int):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(pages))
+        print(f"{pages} pages, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+        start = time.perf_counter()
+        expected = [text for text, _, _ in iter_pdf_pages(path)]
+        sequential = time.perf_counter() - start
+
+        print(f"{'mode':<14} {'pages/s':>10} {'speedup':>8}")
+        print(f"{'sequential':<14} {pages / sequential:>10.0f} {1.0:>7.2f}x")
+        for count in workers:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=count, mp_context=context) as executor:
+                # Start every worker before timing so spawn cost is excluded
+                list(executor.map(abs, range(count)))
+
+                start = time.perf_counter()
+                texts = [text for text, _, _ in iter_pdf_pages_parallel(path, executor, count, pages_per_task)]
+                elapsed = time.perf_counter() - start
+
+            assert texts == expected, "parallel extraction changed the text"
+            print(f"{f'{count} workers':<14} {pages / elapsed:>10.0f} {sequential / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+    run(args.pages, args.workers, args.pages_per_task)
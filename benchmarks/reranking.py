@@ -0,0 +1,134 @@
+"""Quality and latency of the local reranker against first-stage vector order, by candidate count and budget.
+
+Documents are cut into overlapping windows (75% overlap, like a small chunk stride),
+and some documents are uploaded twice, so first-stage results are crowded with
+near-duplicates. Each query is a phrase taken from one window; a result is relevant
+when it contains the phrase verbatim. Reported per configuration:
+
+- reachable: share of queries with a relevant chunk among the candidates, the ceiling for hit@1
+- hit@1 and MRR: is a relevant chunk first, and how high is the first one
+- redundant@k: share of results overlapping a higher-ranked result by at least half
+- rerank p50/p99 ms and the share of queries that fell back on their budget
+
+Usage: python -m benchmarks.reranking [--documents 1000] [--queries 300] [--top-k 5]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+# The vectorizer reloads its vocabulary from VOCABULARY_PATH, so point it away from the app's data directory
+_workdir = tempfile.TemporaryDirectory()
+os.environ["VOCABULARY_PATH"] = os.path.join(_workdir.name, "vocabulary.npy")
+
+import numpy as np
+
+from app.services.embedding_service import EmbeddingService
+from app.services.reranker import Reranker
+from app.services.vector_store import LocalVectorStore
+from benchmarks.embedding_throughput import make_chunks
+
+WINDOW = 80
+STRIDE = 20
+DUPLICATE_SHARE = 0.1
+
+# label, candidates, budget in ms (None: first-stage order only)
+CONFIGS = [
+    ("first stage", 0, None),
+    ("rerank 20", 20, 25.0),
+    ("rerank 50", 50, 25.0),
+    ("rerank 100", 100, 25.0),
+    ("rerank 50, 1 ms budget", 50, 1.0),
+    ("rerank 50, 0.1 ms budget", 50, 0.1),
+]
+
+def make_windows(document_count: int, seed: int = 5) -> tuple[list[tuple[str, list[str]]], dict[str, tuple[int, int]]]:
+    """Overlapping windows per document, and each window's source document and first word"""
+    rng = random.Random(seed)
+    documents, sources = [], {}
+    for number, body in enumerate(make_chunks(document_count, chunk_size=2000, seed=seed)):
+        words = body.split()
+        windows = [" ".join(words[start:start + WINDOW]) for start in range(0, len(words) - WINDOW + 1, STRIDE)]
+        sources.update((window, (number, i * STRIDE)) for i, window in enumerate(windows))
+        documents.append((f"doc-{number}", windows))
+        if rng.random() < DUPLICATE_SHARE:
+            documents.append((f"doc-{number}-copy", windows))
+    return documents, sources
+
+def make_queries(documents: list[tuple[str, list[str]]], count: int, seed: int = 13) -> list[str]:
+    """Three consecutive words from a random window"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(rng.choice(documents)[1]).split()
+        start = rng.randrange(len(words) - 3)
+        queries.append(" ".join(words[start:start + 3]))
+    return queries
+
+def redundant(results: list[dict], sources: dict[str, tuple[int, int]]) -> int:
+    """Results overlapping a higher-ranked result from the same document by at least half a window"""
+    seen, count = [], 0
+    for result in results:
+        document, start = sources[result["text"]]
+        if any(document == other and abs(start - other_start) <= WINDOW // 2 for other, other_start in seen):
+            count += 1
+        seen.append((document, start))
+    return count
+
+async def build(document_count: int) -> tuple[EmbeddingService, list[tuple[str, list[str]]], dict]:
+    documents, sources = make_windows(document_count)
+    embedding_service = EmbeddingService()
+    await embedding_service.attach_vector_store(LocalVectorStore(os.path.join(_workdir.name, "vectors"), index="exact"))
+    embedding_service.refit_vocabulary([window for _, windows in documents[:2000] for window in windows])
+    for document_id, windows in documents:
+        await embedding_service.store_embeddings([{"text": window, "metadata": {}} for window in windows], document_id)
+    return embedding_service, documents, sources
+
+def measure(label: str, candidates: int, budget_ms: float | None, queries: list[str],
+            candidate_lists: list[list[dict]], sources: dict, top_k: int):
+    reranker = Reranker(candidates=candidates, budget_ms=budget_ms) if budget_ms is not None else None
+    hits, reciprocal_ranks, redundancy, latencies, fallbacks, reachable = 0, [], 0, [], 0, 0
+    for query, results in zip(queries, candidate_lists):
+        pool = results[:max(top_k, candidates)]
+        reachable += any(f" {query} " in f" {result['text']} " for result in pool)
+        if reranker is None:
+            ranked = results[:top_k]
+        else:
+            started = time.perf_counter()
+            ranked = reranker.rerank(query, pool, top_k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            fallbacks += "rerank_score" not in ranked[0]
+        relevant = [f" {query} " in f" {result['text']} " for result in ranked]
+        hits += relevant[0]
+        reciprocal_ranks.append(1 / (relevant.index(True) + 1) if True in relevant else 0.0)
+        redundancy += redundant(ranked, sources)
+    p50, p99 = np.percentile(latencies, [50, 99]) if latencies else (0.0, 0.0)
+    print(f"{label:<26} {reachable / len(queries):>9.3f} {hits / len(queries):>6.3f} {np.mean(reciprocal_ranks):>6.3f} "
+          f"{redundancy / (len(queries) * top_k):>12.3f} {p50:>10.3f} {p99:>10.3f} {fallbacks / len(queries):>9.1%}")
+
+async def main(document_count: int, query_count: int, top_k: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        embedding_service, documents, sources = await build(document_count)
+    queries = make_queries(documents, query_count)
+    deepest = max(candidates for _, candidates, _ in CONFIGS)
+    with contextlib.redirect_stdout(io.StringIO()):
+        candidate_lists = [await embedding_service.search_similar(query, max(top_k, deepest)) for query in queries]
+
+    print(f"{len(sources)} distinct chunks in {len(documents)} documents, {query_count} queries, top {top_k}")
+    print(f"{'configuration':<26} {'reachable':>9} {'hit@1':>6} {'MRR':>6} {'redundant@' + str(top_k):>12} "
+          f"{'p50 ms':>10} {'p99 ms':>10} {'fallback':>9}")
+    for label, candidates, budget_ms in CONFIGS:
+        measure(label, candidates, budget_ms, queries, candidate_lists, sources, top_k)
+    await embedding_service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.documents, args.queries, args.top_k))
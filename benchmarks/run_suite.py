@@ -0,0 +1,248 @@
+"""End-to-end suite: ingestion MB/s and chunks/sec, chat latency percentiles and peak memory, saved as JSON.
+
+Drives the real DocumentIngestionService and RAGService in-process, with Qdrant's
+in-memory local mode standing in for the Qdrant server and fakeredis for Redis, so
+runs need no services and are repeatable. Generated TXT and PDF documents are
+uploaded the way the API saves them, then distinct questions are answered in each
+search mode. Results are written to a JSON file named after the current commit;
+pass an earlier file to --compare to see what changed.
+
+Usage: python -m benchmarks.run_suite [--txt-mb 5] [--pdf-pages 200] [--queries 300] \
+           [--modes vector keyword hybrid] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Settings are read at import time, so point the database and vocabulary at a scratch directory first
+_workdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir.name, 'bench.db')}"
+os.environ["VOCABULARY_PATH"] = os.path.join(_workdir.name, "vocabulary.npy")
+
+import fakeredis.aioredis
+import numpy as np
+from qdrant_client import AsyncQdrantClient
+
+from app.models.database import create_tables, engine
+from app.services.chat_memory import ChatMemory
+from app.services.document_ingestion import DocumentIngestionService
+from app.services.embedding_service import EmbeddingService
+from app.services.ingestion_queue import INGESTION_PROCESS_WORKERS, create_process_pool
+from app.services.keyword_index import KeywordIndex
+from app.services.query_cache import SearchResultCache
+from app.services.rag_service import RAGService
+from app.services.search_service import SearchService
+from app.services.vector_store import QdrantVectorStore
+from app.utils.metrics import STAGE_SECONDS
+from benchmarks.corpus import make_pdf, make_sentences, make_text
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SESSIONS = 16
+STRATEGY = "fixed_size"
+
+# Metric name suffixes by direction; anything else (sizes, counts) is shown without a verdict
+_HIGHER_IS_BETTER = ("mb_per_s", "chunks_per_s", "queries_per_s")
+_LOWER_IS_BETTER = ("_ms", "seconds", "rss_mb")
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_DIR)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def peak_rss_mb(who: int | None = None) -> float | None:
+    """High-water mark of resident memory so far, or None where the platform does not report it"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def make_questions(count: int, seed: int) -> list[str]:
+    """Distinct questions built from the corpus vocabulary, so no answer comes from the search cache"""
+    sentences = make_sentences(count, seed)
+    return [f"{' '.join(sentence.rstrip('.').split()[:6])} #{i}" for i, sentence in enumerate(sentences)]
+
+def stage_totals() -> dict[str, dict[str, float]]:
+    """Seconds and calls per pipeline stage, read back from the Prometheus histogram"""
+    totals = {}
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith(("_sum", "_count")):
+                key = f"{sample.labels['pipeline']}.{sample.labels['stage']}"
+                field = "seconds" if sample.name.endswith("_sum") else "calls"
+                totals.setdefault(key, {})[field] = round(sample.value, 4)
+    return dict(sorted(totals.items()))
+
+async def build(process_workers: int) -> tuple[DocumentIngestionService, RAGService, object]:
+    await create_tables()
+    # Local mode ignores payload indexes and says so on every collection it creates
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+    redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    embedding_service = EmbeddingService(SearchResultCache(redis_client))
+    await embedding_service.attach_vector_store(QdrantVectorStore(AsyncQdrantClient(":memory:")))
+    keyword_index = KeywordIndex()
+    process_pool = create_process_pool(process_workers)
+    ingestion_service = DocumentIngestionService(embedding_service, process_pool)
+    rag_service = RAGService(SearchService(embedding_service, keyword_index), ChatMemory(redis_client=redis_client))
+    return ingestion_service, rag_service, process_pool
+
+async def ingest(service: DocumentIngestionService, path: str, filename: str) -> dict:
+    """Upload one file the way the API does: stream it to disk, then extract, chunk, embed and store it"""
+    started = time.perf_counter()
+    with open(path, "rb") as source:
+        file_path, document_id, file_size, content_hash = await service.save_upload(source, filename)
+    result = await service.process_document(
+        file_path, document_id, filename, STRATEGY, file_size, content_hash=content_hash
+    )
+    elapsed = time.perf_counter() - started
+    megabytes = file_size / (1024 * 1024)
+    return {
+        "megabytes": round(megabytes, 2),
+        "chunks": result["chunk_count"],
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(megabytes / elapsed, 3),
+        "chunks_per_s": round(result["chunk_count"] / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+async def query(service: RAGService, questions: list[str], mode: str) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for i, question in enumerate(questions):
+        # Several sessions, so chat history grows the way it does for real users
+        asked = time.perf_counter()
+        await service.process_query(question, f"bench-{i % SESSIONS}", search_mode=mode)
+        latencies.append((time.perf_counter() - asked) * 1000)
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "queries": len(questions),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(max(latencies), 3),
+        "queries_per_s": round(len(questions) / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+async def run(txt_mb: float, pdf_pages: int, query_count: int, modes: list[str], process_workers: int) -> dict:
+    ingestion_service, rag_service, process_pool = await build(process_workers)
+    os.chdir(_workdir.name)  # uploads/ is created relative to the working directory
+
+    documents = {
+        "txt": ("corpus.txt", make_text(int(txt_mb * 1024 * 1024)).encode()),
+        "pdf": ("corpus.pdf", make_pdf(pdf_pages))
+    }
+    ingestion = {}
+    for kind, (filename, content) in documents.items():
+        path = os.path.join(_workdir.name, f"source-{filename}")
+        with open(path, "wb") as f:
+            f.write(content)
+        ingestion[kind] = await ingest(ingestion_service, path, filename)
+        print(f"ingest {kind:<4} {ingestion[kind]['megabytes']:>8.2f} MB {ingestion[kind]['chunks']:>8} chunks "
+              f"{ingestion[kind]['mb_per_s']:>8.2f} MB/s {ingestion[kind]['chunks_per_s']:>9.0f} chunks/s")
+
+    queries = {}
+    for seed, mode in enumerate(modes, start=100):
+        queries[mode] = await query(rag_service, make_questions(query_count, seed), mode)
+        print(f"query  {mode:<8} p50 {queries[mode]['p50_ms']:>7.2f} ms  p95 {queries[mode]['p95_ms']:>7.2f} ms  "
+              f"p99 {queries[mode]['p99_ms']:>7.2f} ms {queries[mode]['queries_per_s']:>8.0f} q/s")
+
+    if process_pool is not None:
+        await asyncio.to_thread(process_pool.shutdown)
+    await ingestion_service.embedding_service.close()
+    await engine.dispose()
+    memory = {"peak_rss_mb": peak_rss_mb()}
+    if resource is not None and process_pool is not None:
+        # Extraction workers have exited, so their high-water mark is now reported
+        memory["peak_worker_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    print(f"peak RSS {memory['peak_rss_mb']} MB" + (
+        f", largest extraction worker {memory['peak_worker_rss_mb']} MB" if "peak_worker_rss_mb" in memory else ""
+    ))
+    return {"ingestion": ingestion, "queries": queries, "memory": memory, "stages": stage_totals()}
+
+def flatten(results: dict) -> dict[str, float]:
+    """Comparable metrics as dotted names, e.g. queries.hybrid.p95_ms"""
+    flat = {}
+    for section in ("ingestion", "queries", "memory"):
+        for key, value in results.get(section, {}).items():
+            if isinstance(value, dict):
+                flat.update((f"{section}.{key}.{name}", number) for name, number in value.items()
+                            if isinstance(number, (int, float)))
+            elif isinstance(value, (int, float)):
+                flat[f"{section}.{key}"] = value
+    return flat
+
+def compare(baseline_path: str, results: dict):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline.get('commit') or baseline_path}")
+    if baseline.get("config") != results["config"]:
+        print(f"warning: the baseline ran with different settings: {baseline.get('config')}")
+    print(f"{'metric':<34} {'before':>10} {'after':>10} {'change':>8}")
+    before, after = flatten(baseline), flatten(results)
+    for name, value in after.items():
+        if name not in before or not before[name]:
+            continue
+        change = (value - before[name]) / before[name]
+        marker = ""
+        if abs(change) >= 0.05 and name.endswith(_HIGHER_IS_BETTER + _LOWER_IS_BETTER):
+            better = change > 0 if name.endswith(_HIGHER_IS_BETTER) else change < 0
+            marker = " better" if better else " worse"
+        print(f"{name:<34} {before[name]:>10.2f} {value:>10.2f} {change:>+8.1%}{marker}")
+
+def main(args: argparse.Namespace):
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "txt_mb": args.txt_mb,
+            "pdf_pages": args.pdf_pages,
+            "queries": args.queries,
+            "modes": args.modes,
+            "process_workers": args.process_workers,
+            "chunking_strategy": STRATEGY
+        }
+    }
+    results.update(asyncio.run(run(args.txt_mb, args.pdf_pages, args.queries, args.modes, args.process_workers)))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{(commit or 'unknown')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--txt-mb", type=float, default=5)
+    parser.add_argument("--pdf-pages", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=300, help="questions per search mode")
+    parser.add_argument("--modes", nargs="+", default=["vector", "keyword", "hybrid"],
+                        choices=["vector", "keyword", "hybrid"])
+    parser.add_argument("--process-workers", type=int, default=INGESTION_PROCESS_WORKERS,
+                        help="extraction processes; 0 extracts on threads")
+    parser.add_argument("--output", help="defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    main(parser.parse_args())
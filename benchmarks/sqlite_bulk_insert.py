@@ -0,0 +1,74 @@
+"""Insert DocumentChunk rows the old way (one ORM object per chunk) and with bulk Core inserts.
+
+Each mode writes to a fresh SQLite file, committing once per ingestion batch.
+
+Usage: python -m benchmarks.sqlite_bulk_insert [--rows 100000] [--batch-size 256]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.database import Base, DocumentChunk, create_database_engine
+from benchmarks.corpus import make_sentences
+
+def make_rows(count: int) -> list[dict]:
+    sentences = make_sentences(1000)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "document_id": f"doc-{i // 1000}",
+            "chunk_text": " ".join(sentences[(i + k) % len(sentences)] for k in range(4)),
+            "chunk_index": i % 1000,
+            "chunk_metadata": {"embedding_id": str(uuid.uuid4()), "text_length": 512, "page_start": i % 500},
+            "embedding_id": str(uuid.uuid4())
+        }
+        for i in range(count)
+    ]
+
+async def insert_orm(engine, rows: list[dict], batch_size: int):
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    for start in range(0, len(rows), batch_size):
+        async with sessions() as db:
+            for row in rows[start:start + batch_size]:
+                db.add(DocumentChunk(**row))
+            await db.commit()
+
+async def insert_bulk(engine, rows: list[dict], batch_size: int):
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    for start in range(0, len(rows), batch_size):
+        async with sessions() as db:
+            await db.execute(insert(DocumentChunk.__table__), rows[start:start + batch_size])
+            await db.commit()
+
+async def measure(name: str, make_engine, insert_rows, rows: list[dict], batch_size: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = make_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+        start = time.perf_counter()
+        await insert_rows(engine, rows, batch_size)
+        elapsed = time.perf_counter() - start
+        await engine.dispose()
+
+    print(f"{name:<36} {elapsed:>8.2f} {len(rows) / elapsed:>12.0f}")
+
+async def main(count: int, batch_size: int):
+    rows = make_rows(count)
+    print(f"{'mode':<36} {'seconds':>8} {'rows/s':>12}")
+    await measure("ORM add per row, default pragmas", create_async_engine, insert_orm, rows, batch_size)
+    await measure("ORM add per row, WAL + pool", create_database_engine, insert_orm, rows, batch_size)
+    await measure("Core bulk insert, WAL + pool", create_database_engine, insert_bulk, rows, batch_size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch_size))
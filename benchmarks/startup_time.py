@@ -0,0 +1,85 @@
+"""Measure cold start of the API: app import, lifespan startup and time to first response.
+
+Qdrant and Redis do not need to be running; by default Qdrant points at a
+closed port to show that startup no longer waits for it.
+
+Usage: python -m benchmarks.startup_time [--runs 5] [--qdrant-url http://127.0.0.1:9]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IN_PROCESS_PROBE = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def main():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+    return ready
+
+ready = asyncio.run(main())
+print(json.dumps({"import_s": imported - start, "lifespan_s": ready - imported}))
+"""
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_in_process(env: dict[str, str]) -> dict[str, float]:
+    """Time importing app.main and entering its lifespan in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-c", IN_PROCESS_PROBE],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_uvicorn(env: dict[str, str], timeout: float = 30.0) -> float:
+    """Time from spawning a uvicorn worker until it answers GET /"""
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("uvicorn did not start in time")
+    finally:
+        process.terminate()
+        process.wait()
+
+def run(runs: int, qdrant_url: str):
+    env = {**os.environ, "QDRANT_URL": qdrant_url}
+    probes = [measure_in_process(env) for _ in range(runs)]
+    first_responses = [measure_uvicorn(env) for _ in range(runs)]
+
+    print(f"{'metric':<28} {'median':>8} {'max':>8}")
+    for name, values in [
+        ("import app.main (s)", [p["import_s"] for p in probes]),
+        ("lifespan startup (s)", [p["lifespan_s"] for p in probes]),
+        ("uvicorn first response (s)", first_responses),
+    ]:
+        print(f"{name:<28} {statistics.median(values):>8.3f} {max(values):>8.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--qdrant-url", default="http://127.0.0.1:9")
+    args = parser.parse_args()
+    run(args.runs, args.qdrant_url)
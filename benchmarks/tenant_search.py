@@ -0,0 +1,68 @@
+"""Search latency for a small tenant as another tenant's collection grows.
+
+Each tenant gets its own local store collection, as EmbeddingService routes them.
+For comparison the same points are also kept in one shared collection, where the
+small tenant is selected with a payload filter.
+
+Usage: python -m benchmarks.tenant_search [--small 2000] [--large 10000 100000 300000]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.services.vector_store import LocalVectorStore
+from benchmarks.vector_store import DIM, make_vectors
+
+def make_points(vectors: np.ndarray, tenant_id: str, first_id: int) -> list[dict]:
+    return [
+        {"id": str(uuid.UUID(int=first_id + i)), "vector": vector, "payload": {"tenant_id": tenant_id, "document_id": "doc", "text": ""}}
+        for i, vector in enumerate(vectors)
+    ]
+
+async def load(store: LocalVectorStore, points: list[dict], batch_size: int = 4096):
+    await store.ensure_collection(DIM)
+    for start in range(0, len(points), batch_size):
+        await store.upsert(points[start:start + batch_size])
+
+async def mean_ms(store: LocalVectorStore, queries: np.ndarray, top_k: int, filters: dict | None = None) -> float:
+    await store.search(queries[0], top_k, filters)
+    started = time.perf_counter()
+    for query in queries:
+        await store.search(query, top_k, filters)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+async def main(small: int, large_sizes: list[int], query_count: int, top_k: int):
+    centres = np.random.default_rng(0).standard_normal((256, DIM)).astype(np.float32)
+    small_points = make_points(make_vectors(small, centres), "small", 0)
+    queries = make_vectors(query_count, centres, seed=1)
+
+    print(f"small tenant: {small} vectors, {query_count} queries, top {top_k}")
+    print(f"{'large tenant':>12} {'own collection ms':>18} {'shared + filter ms':>19}")
+    for large in large_sizes:
+        large_points = make_points(make_vectors(large, centres, seed=2), "large", small)
+        with tempfile.TemporaryDirectory() as directory:
+            root = LocalVectorStore(f"{directory}/documents", index="exact")
+            small_store = root.for_collection("documents_small")
+            large_store = root.for_collection("documents_large")
+            await load(small_store, small_points)
+            await load(large_store, large_points)
+            own = await mean_ms(small_store, queries, top_k)
+
+            await load(root, small_points + large_points)
+            shared = await mean_ms(root, queries, top_k, {"tenant_id": "small"})
+            for store in (small_store, large_store, root):
+                await store.close()
+        print(f"{large:>12} {own:>18.2f} {shared:>19.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--small", type=int, default=2000)
+    parser.add_argument("--large", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.small, args.large, args.queries, args.top_k))
@@ -0,0 +1,143 @@
+"""Memory and recall@k of vector storage modes: float32, int8 codes, int8 with rescoring, and payloads without text.
+
+Vectors are embeddings of synthetic chunks from the app's own vectorizer. For the
+local store, "vector RAM" is what every exact search scans: the float32 matrix, or
+the int8 codes and their scales once quantized (the float32 file then stays on disk
+and only the rescored candidates are read from it). Recall is measured against an
+exact float32 search. Payload size is the JSON each point carries, with and
+without the chunk text. With --qdrant-url the same vectors are searched in Qdrant
+collections created with each quantization mode (":memory:" ignores quantization).
+
+Usage: python -m benchmarks.vector_storage [--sizes 20000 100000] [--queries 200] [--qdrant-url http://localhost:6333]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+# The vectorizer reloads its vocabulary from VOCABULARY_PATH, so point it away from the app's data directory
+_workdir = tempfile.TemporaryDirectory()
+os.environ["VOCABULARY_PATH"] = os.path.join(_workdir.name, "vocabulary.npy")
+
+import numpy as np
+
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_store import LocalVectorStore, QdrantVectorStore, VectorStore
+from benchmarks.embedding_throughput import make_chunks
+from benchmarks.hybrid_search import make_queries
+
+# label, quantization, rescore, oversampling
+LOCAL_MODES = [
+    ("float32", "none", True, 1.0),
+    ("int8, no rescoring", "scalar", False, 1.0),
+    ("int8, rescore x1.5", "scalar", True, 1.5),
+    ("int8, rescore x2", "scalar", True, 2.0),
+    ("int8, rescore x4", "scalar", True, 4.0),
+]
+
+def make_points(vectors: np.ndarray) -> list[dict]:
+    return [
+        {
+            "id": str(uuid.UUID(int=i)),
+            "vector": vector,
+            "payload": {"document_id": f"doc-{i // 100}", "chunk_index": i % 100, "chunk_metadata": {}}
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+async def load(store: VectorStore, points: list[dict], batch_size: int = 1024):
+    await store.ensure_collection(points[0]["vector"].shape[0])
+    for start in range(0, len(points), batch_size):
+        await store.upsert(points[start:start + batch_size])
+
+def exact_scores(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return queries @ normalized.T
+
+def recall(results: list[list[dict]], scores: np.ndarray, top_k: int) -> float:
+    """Share of hits scoring at least the exact k-th best score.
+
+    Synthetic chunks share a small vocabulary, so many vectors tie; any of the tied
+    points is a correct answer, whichever one a store happens to return.
+    """
+    kth = -np.partition(-scores, top_k - 1, axis=1)[:, top_k - 1]
+    found = [
+        sum(row_scores[uuid.UUID(hit["id"]).int] >= threshold - 1e-5 for hit in hits) / top_k
+        for hits, row_scores, threshold in zip(results, scores, kth)
+    ]
+    return float(np.mean(found))
+
+async def measure_local(points: list[dict], queries: np.ndarray, scores: np.ndarray, top_k: int):
+    count, dim = len(points), points[0]["vector"].shape[0]
+    for label, quantization, rescore, oversampling in LOCAL_MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            store = LocalVectorStore(directory, index="exact", quantization=quantization,
+                                     rescore=rescore, oversampling=oversampling)
+            await load(store, points)
+            ram = count * (dim + 4) if quantization == "scalar" else count * dim * 4
+            store._search(queries[0], top_k)
+            started = time.perf_counter()
+            results = [store._search(query, top_k) for query in queries]
+            elapsed = time.perf_counter() - started
+            await store.close()
+        print(f"{count:>9} {'local ' + label:<30} {ram / 2**20:>13.1f} {len(queries) / elapsed:>10.0f} "
+              f"{recall(results, scores, top_k):>10.3f}")
+
+async def measure_qdrant(qdrant_url: str, points: list[dict], queries: np.ndarray, scores: np.ndarray, top_k: int):
+    from qdrant_client import AsyncQdrantClient
+
+    client = AsyncQdrantClient(location=qdrant_url) if qdrant_url == ":memory:" else AsyncQdrantClient(url=qdrant_url)
+    try:
+        for quantization in ("none", "scalar", "product"):
+            store = QdrantVectorStore(client, f"vector_storage_benchmark_{uuid.uuid4().hex[:8]}",
+                                      owns_client=False, quantization=quantization, on_disk=quantization != "none")
+            try:
+                await load(store, points)
+                started = time.perf_counter()
+                results = [await store.search(query, top_k) for query in queries]
+                elapsed = time.perf_counter() - started
+            finally:
+                await store.drop()
+            print(f"{len(points):>9} {'qdrant ' + quantization:<30} {'-':>13} {len(queries) / elapsed:>10.0f} "
+                  f"{recall(results, scores, top_k):>10.3f}")
+    finally:
+        await client.close()
+
+def payload_sizes(texts: list[str]):
+    """Average JSON bytes per point payload as ingestion writes it, with and without the chunk text"""
+    base = {"filename": "report.pdf", "chunking_strategy": "semantic", "uploaded_at": 1700000000.0,
+            "document_id": str(uuid.uuid4()), "chunk_index": 0, "chunk_metadata": {"chunk_index": 0},
+            "vectorizer_version": "0123456789ab"}
+    without_text = len(json.dumps(base))
+    with_text = np.mean([len(json.dumps({**base, "text": text})) for text in texts])
+    print(f"\npayload per point: {with_text:.0f} bytes with text, {without_text} bytes without "
+          f"({1 - without_text / with_text:.0%} smaller)")
+
+async def main(sizes: list[int], query_count: int, top_k: int, qdrant_url: str | None):
+    embedding_service = EmbeddingService()
+    texts = make_chunks(max(sizes), chunk_size=1000)
+    embedding_service.refit_vocabulary(texts[:10000])
+    vectors = embedding_service.generate_embeddings(texts)
+    queries = embedding_service.generate_embeddings(make_queries(texts, query_count))
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+    print(f"{'vectors':>9} {'mode':<30} {'vector RAM MB':>13} {'queries/s':>10} {'recall@' + str(top_k):>10}")
+    for size in sizes:
+        points = make_points(vectors[:size])
+        scores = exact_scores(vectors[:size], queries)
+        await measure_local(points, queries, scores, top_k)
+        if qdrant_url:
+            await measure_qdrant(qdrant_url, points, queries, scores, top_k)
+    payload_sizes(texts[:1000])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--qdrant-url")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.queries, args.top_k, args.qdrant_url))
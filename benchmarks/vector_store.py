@@ -0,0 +1,76 @@
+"""Recall@k and queries/sec of the local vector store's exact, IVF and HNSW search.
+
+Vectors are synthetic: unit-length points scattered around random cluster
+centres, which is closer to real embeddings than uniform noise. Recall is
+measured against the exact top-k of the same store.
+
+Usage: python -m benchmarks.vector_store [--sizes 10000 100000 1000000] [--indexes exact ivf hnsw]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.services.vector_store import LocalVectorStore
+
+DIM = 300
+
+def make_vectors(count: int, centres: np.ndarray, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    clusters = len(centres)
+    vectors = np.empty((count, DIM), dtype=np.float32)
+    for start in range(0, count, 65536):
+        stop = min(start + 65536, count)
+        vectors[start:stop] = centres[rng.integers(clusters, size=stop - start)]
+        vectors[start:stop] += 0.6 * rng.standard_normal((stop - start, DIM)).astype(np.float32)
+    return vectors
+
+async def load(store: LocalVectorStore, vectors: np.ndarray, batch_size: int = 4096):
+    await store.ensure_collection(DIM)
+    for start in range(0, len(vectors), batch_size):
+        await store.upsert([
+            {"id": str(uuid.UUID(int=start + i)), "vector": vector, "payload": {"document_id": f"doc-{(start + i) // 100}"}}
+            for i, vector in enumerate(vectors[start:start + batch_size])
+        ])
+
+async def measure(index: str, vectors: np.ndarray, queries: np.ndarray, truth: list[set], top_k: int) -> set:
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, index=index, ann_min_vectors=0)
+        started = time.perf_counter()
+        await load(store, vectors)
+        # The first query builds the ANN index, so it counts towards build time
+        store._search(queries[0], top_k)
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = [store._search(query, top_k) for query in queries]
+        elapsed = time.perf_counter() - started
+        await store.close()
+
+    found = [{hit["id"] for hit in hits} for hits in results]
+    recall = np.mean([len(f & t) / top_k for f, t in zip(found, truth)]) if truth else 1.0
+    print(f"{len(vectors):>9} {index:<6} {build:>9.1f} {len(queries) / elapsed:>10.0f} {recall:>10.3f}")
+    return found
+
+async def main(sizes: list[int], indexes: list[str], query_count: int, top_k: int):
+    print(f"{'vectors':>9} {'index':<6} {'build s':>9} {'queries/s':>10} {'recall@' + str(top_k):>10}")
+    for size in sizes:
+        centres = np.random.default_rng(0).standard_normal((256, DIM)).astype(np.float32)
+        vectors = make_vectors(size, centres)
+        queries = make_vectors(query_count, centres, seed=1)
+        truth = []
+        for index in ["exact"] + [index for index in indexes if index != "exact"]:
+            found = await measure(index, vectors, queries, truth, top_k)
+            truth = truth or found
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--indexes", nargs="+", default=["exact", "ivf", "hnsw"], choices=["exact", "ivf", "hnsw"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.indexes, args.queries, args.top_k))
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from app.utils.chunking import ChunkingStrategy, get_streaming_chunker
+
+STRATEGIES = ["fixed_size", "semantic", "recursive"]
+
+def uncovered(text: str, chunks: list[dict]) -> list[int]:
+    """Offsets of non-whitespace characters that no chunk contains"""
+    covered = [False] * len(text)
+    for chunk in chunks:
+        start, end = chunk["metadata"]["start_offset"], chunk["metadata"]["end_offset"]
+        assert chunk["text"] == text[start:end]
+        covered[start:end] = [True] * (end - start)
+    return [i for i, character in enumerate(text) if not character.isspace() and not covered[i]]
+
+def random_text(rng: random.Random, length: int) -> str:
+    pieces = ["a", "bb", "word", "c.", "end!", " ", " ", "\n", "\n\n", "x" * rng.randint(1, 40)]
+    return "".join(rng.choice(pieces) for _ in range(length))
+
+def test_long_word_after_paragraph_break_keeps_the_rest():
+    assert [chunk["text"] for chunk in ChunkingStrategy.fixed_size_chunking("c. aa \n\n c.", 6, 4)] == ["c. aa", "c."]
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_url_after_paragraph_break_at_default_sizes(strategy):
+    text = "Intro sentence here. " * 40 + "\n\nhttps://example.com/" + "a" * 460 + " Tail after the link. " * 30
+    chunks = list(get_streaming_chunker(strategy)([(text, None)]))
+    assert uncovered(text, chunks) == []
+    assert chunks[-1]["text"].endswith("Tail after the link.")
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_chunks_cover_the_whole_input(strategy):
+    rng = random.Random(strategy)
+    for _ in range(300):
+        text = random_text(rng, rng.randint(1, 200))
+        chunk_size = rng.randint(1, 60)
+        overlap = rng.randint(0, chunk_size - 1)
+        # Split into blocks at random points, the way pages arrive from an extractor
+        cuts = sorted(rng.sample(range(len(text) + 1), min(3, len(text) + 1)))
+        blocks = [(text[a:b], None) for a, b in zip([0] + cuts, cuts + [len(text)])]
+        chunks = list(get_streaming_chunker(strategy)(blocks, chunk_size, overlap))
+        assert uncovered(text, chunks) == [], (text, chunk_size, overlap)
+        assert all(len(chunk["text"]) <= chunk_size for chunk in chunks)
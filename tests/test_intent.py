@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+
+from app.services.intent import extract_booking_info
+
+NOW = datetime(2026, 10, 18, 12, 0)  # a Sunday
+
+@pytest.mark.parametrize("phrase, expected", [
+    ("today", "2026-10-18"),
+    ("tonight", "2026-10-18"),
+    ("tomorrow", "2026-10-19"),
+    ("day after tomorrow", "2026-10-20"),
+    ("next week", "2026-10-25"),
+    ("in 1 day", "2026-10-19"),
+    ("in 3 days", "2026-10-21"),
+    ("Friday", "2026-10-23"),
+    ("on Friday", "2026-10-23"),
+    ("this Friday", "2026-10-23"),
+    ("next Friday", "2026-10-23"),
+])
+def test_relative_dates_resolve(phrase, expected):
+    info = extract_booking_info(f"Please book an interview {phrase} at 3pm, my name is Ann Lee", NOW)
+    assert info["date"] == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("Please book an interview tomorrow at 9am.", "9am"),
+    ("Please book an interview tomorrow at 9 pm.", "9 pm"),
+    ("Please book an interview tomorrow at 10:30am.", "10:30am"),
+    ("Please book an interview tomorrow at 9 a.m.", "9 a.m."),
+    ("Please book an interview tomorrow at 9 a.m", "9 a.m"),
+])
+def test_time_leaves_the_full_stop(text, expected):
+    assert extract_booking_info(text, NOW)["time"] == expected
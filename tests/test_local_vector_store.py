@@ -0,0 +1,69 @@
+import asyncio
+import uuid
+
+import numpy as np
+
+from app.services.vector_store import LocalVectorStore
+
+DIM = 16
+
+def make_points(start: int, count: int) -> list[dict]:
+    # One-hot vectors, so each point is its own only exact match
+    return [
+        {"id": str(uuid.UUID(int=i)), "vector": np.eye(DIM, dtype=np.float32)[i], "payload": {"chunk_index": i}}
+        for i in range(start, start + count)
+    ]
+
+async def reopen(path: str) -> LocalVectorStore:
+    store = LocalVectorStore(path, index="exact")
+    await store.ensure_collection(DIM)
+    return store
+
+def test_points_written_after_a_torn_log_survive_the_next_restart(tmp_path):
+    async def run():
+        path = str(tmp_path / "vectors")
+        store = await reopen(path)
+        await store.upsert(make_points(0, 5))
+        await store.close()
+        # A crash in the middle of writing an entry leaves a partial last line
+        with open(store._log_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "upsert", "id": "torn", "ro')
+
+        store = await reopen(path)
+        assert await store.count() == 5
+        await store.upsert(make_points(5, 3))
+        await store.close()
+
+        store = await reopen(path)
+        assert await store.count() == 8
+        hits = await store.search(make_points(6, 1)[0]["vector"], 1)
+        assert hits[0]["id"] == str(uuid.UUID(int=6))
+        await store.close()
+
+    asyncio.run(run())
+
+def test_replacing_points_reuses_their_rows(tmp_path):
+    async def run():
+        path = str(tmp_path / "vectors")
+        store = await reopen(path)
+        await store.upsert(make_points(0, 8))
+        # Re-ingesting a document deletes its old chunks and stores new ones under new ids
+        for generation in range(1, 20):
+            points = make_points(0, 8)
+            for point in points:
+                point["id"] = f"{generation}-{point['id']}"
+            await store.delete([f"{generation - 1}-{point['id']}" if generation > 1 else point["id"]
+                                for point in make_points(0, 8)])
+            await store.upsert(points)
+        assert store._count == 8
+        await store.close()
+
+        store = await reopen(path)
+        assert await store.count() == 8
+        hits = await store.search(make_points(3, 1)[0]["vector"], 1)
+        assert hits[0]["id"] == f"19-{uuid.UUID(int=3)}"
+        await store.upsert(make_points(8, 1))
+        assert store._count == 9
+        await store.close()
+
+    asyncio.run(run())